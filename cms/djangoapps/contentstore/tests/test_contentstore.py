@@ -2,6 +2,7 @@
 
 import json
 import shutil
+import tarfile
 import mock
 
 from textwrap import dedent
@@ -32,7 +33,7 @@ from xmodule.modulestore.store_utilities import clone_course
 from xmodule.modulestore.store_utilities import delete_course
 from xmodule.modulestore.django import modulestore
 from xmodule.contentstore.django import contentstore, _CONTENTSTORE
-from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_exporter import export_to_xml, export_to_tar
 from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
 from xmodule.modulestore.inheritance import own_metadata
 from xmodule.contentstore.content import StaticContent
@@ -1179,6 +1180,33 @@ class ContentStoreToyCourseTest(ModuleStoreTestCase):
         # export out to a tempdir
         export_to_xml(module_store, content_store, location, root_dir, 'test_export')
 
+    def test_export_course_to_tar(self):
+        module_store = modulestore('direct')
+        content_store = contentstore()
+
+        import_from_xml(module_store, 'common/test/data/', ['toy'], static_content_store=content_store)
+        location = CourseDescriptor.id_to_location('edX/toy/2012_Fall')
+
+        root_dir = path(mkdtemp_clean())
+        with open(root_dir / 'test_export.tar.gz', 'wb') as tar_file:
+            for chunk in export_to_tar(module_store, content_store, location, 'test_export'):
+                tar_file.write(chunk)
+        tarfile.open(root_dir / 'test_export.tar.gz').extractall(root_dir)
+
+        # the tar has the same course as export_to_xml writes, assets and all
+        self.assertTrue((root_dir / 'test_export' / 'course.xml').exists())
+        self.assertTrue((root_dir / 'test_export' / 'policies' / '2012_Fall' / 'policy.json').exists())
+        self.assertEqual(
+            (root_dir / 'test_export' / 'static' / 'handouts' / 'sample_handout.txt').bytes(),
+            path('common/test/data/toy/static/handouts/sample_handout.txt').bytes()
+        )
+
+        import_from_xml(module_store, root_dir, ['test_export'], static_content_store=content_store,
+                        target_location_namespace=Location(['i4x', 'edX', 'exported', 'course', '2012_Fall', None]))
+        self.assertIsNotNone(module_store.get_item(
+            Location(['i4x', 'edX', 'exported', 'chapter', 'Overview', None])
+        ))
+
 
 @override_settings(CONTENTSTORE=TEST_DATA_CONTENTSTORE)
 class ContentStoreTest(ModuleStoreTestCase):
@@ -5,7 +5,6 @@ import tarfile
 import shutil
 import cgi
 from functools import partial
-from tempfile import mkdtemp
 from path import path
 
 from django.conf import settings
@@ -13,17 +12,16 @@ from django.http import HttpResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
 from django.core.urlresolvers import reverse
-from django.core.servers.basehttp import FileWrapper
-from django.core.files.temp import NamedTemporaryFile
 from django.views.decorators.http import require_POST, require_http_methods
 
 from mitxmako.shortcuts import render_to_response
 from cache_toolbox.core import del_cached_content
+from static_replace import clear_static_url_cache
 from auth.authz import create_all_course_groups
 
 from xmodule.modulestore.xml_importer import import_from_xml
 from xmodule.contentstore.django import contentstore
-from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_exporter import export_to_tar
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore import Location
 from xmodule.contentstore.content import StaticContent
@@ -191,6 +189,7 @@ def upload_asset(request, org, course, coursename):
     # then commit the content
     contentstore().save(content)
     del_cached_content(content.location)
+    clear_static_url_cache(location.course_id)
 
     # readback the saved content - we need the database timestamp
     readback = contentstore().find(content.location)
@@ -216,7 +215,7 @@ def remove_asset(request, org, course, name):
     This method will perform a 'soft-delete' of an asset, which is basically to
     copy the asset from the main GridFS collection and into a Trashcan
     '''
-    get_location_and_verify_access(request, org, course, name)
+    course_location = get_location_and_verify_access(request, org, course, name)
 
     location = request.POST['location']
 
@@ -256,6 +255,7 @@ def remove_asset(request, org, course, name):
     contentstore().delete(content.get_id())
     # remove from cache
     del_cached_content(content.location)
+    clear_static_url_cache(course_location.course_id)
 
     return HttpResponse()
 
@@ -347,17 +347,14 @@ def import_course(request, org, course, name):
 def generate_export_course(request, org, course, name):
     """
     This method will serialize out a course to a .tar.gz file which contains a XML-based representation of
-    the course
+    the course. The file is streamed as it's generated.
     """
     location = get_location_and_verify_access(request, org, course, name)
     course_module = modulestore().get_instance(location.course_id, location)
     loc = Location(location)
-    export_file = NamedTemporaryFile(prefix=name + '.', suffix=".tar.gz")
-
-    root_dir = path(mkdtemp())
 
     try:
-        export_to_xml(modulestore('direct'), contentstore(), loc, root_dir, name, modulestore())
+        export_chunks = export_to_tar(modulestore('direct'), contentstore(), loc, name, modulestore())
     except SerializationError, e:
         logging.exception('There was an error exporting course {0}. {1}'.format(course_module.location, unicode(e)))
 
@@ -407,18 +404,8 @@ def generate_export_course(request, org, course, name):
             })
         })
 
-    logging.debug('tar file being generated at {0}'.format(export_file.name))
-    tar_file = tarfile.open(name=export_file.name, mode='w:gz')
-    tar_file.add(root_dir / name, arcname=name)
-    tar_file.close()
-
-    # remove temp dir
-    shutil.rmtree(root_dir / name)
-
-    wrapper = FileWrapper(export_file)
-    response = HttpResponse(wrapper, content_type='application/x-tgz')
-    response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(export_file.name)
-    response['Content-Length'] = os.path.getsize(export_file.name)
+    response = HttpResponse(export_chunks, content_type='application/x-tgz')
+    response['Content-Disposition'] = 'attachment; filename=%s.tar.gz' % name
     return response
 
 
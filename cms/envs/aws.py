@@ -145,6 +145,8 @@ AWS_SECRET_ACCESS_KEY = AUTH_TOKENS["AWS_SECRET_ACCESS_KEY"]
 DATABASES = AUTH_TOKENS['DATABASES']
 MODULESTORE = AUTH_TOKENS['MODULESTORE']
 CONTENTSTORE = AUTH_TOKENS['CONTENTSTORE']
+STATIC_CONTENT_DISK_CACHE = ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE')
+TRACKING_LOG_WRITER = ENV_TOKENS.get('TRACKING_LOG_WRITER', TRACKING_LOG_WRITER)
 
 # Datadog for events!
 DATADOG_API = AUTH_TOKENS.get("DATADOG_API")
@@ -210,6 +210,15 @@ LOCALE_PATHS = (REPO_ROOT + '/conf/locale',)  # mitx/conf/locale/
 # Tracking
 TRACK_MAX_EVENT = 10000
 
+# Tracking events are written by a background thread, in batches of at most
+# BATCH_SIZE, within FLUSH_INTERVAL seconds. Once QUEUE_SIZE events are waiting
+# to be written, more are dropped. If None, events are written during requests.
+TRACKING_LOG_WRITER = {
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1,
+}
+
 # Messages
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -6,6 +6,16 @@ from request_cache.middleware import RequestCache
 
 from django.core.cache import get_cache
 
+from capa.capa_problem import TEMPLATE_CACHE
+
+
+def invalidate_problem_templates(sender, course_id, **kwargs):  # pylint: disable=W0613
+    """
+    Drop the course's parsed problems from the process' cache when it changes
+    """
+    TEMPLATE_CACHE.invalidate_group(course_id)
+
+
 CACHE = get_cache('mongo_metadata_inheritance')
 for store_name in settings.MODULESTORE:
     store = modulestore(store_name)
@@ -17,6 +27,7 @@ for store_name in settings.MODULESTORE:
 
     modulestore_update_signal = Signal(providing_args=['modulestore', 'course_id', 'location'])
     store.modulestore_update_signal = modulestore_update_signal
+    modulestore_update_signal.connect(invalidate_problem_templates)
 if hasattr(settings, 'DATADOG_API'):
     dog_http_api.api_key = settings.DATADOG_API
     dog_stats_api.start(api_key=settings.DATADOG_API, statsd=True)
@@ -0,0 +1,124 @@
+"""
+A cache of large static assets on the local disk, in front of GridFS.
+
+Assets are stored in files named by their md5, so a re-uploaded asset is
+simply a new entry, and old versions age out. The least recently used files
+are deleted when the cache grows over its maximum size in bytes.
+
+Each process keeps its own index of the files in the cache directory, which is
+rebuilt from the directory on startup. Processes that share the directory may
+delete files that another still has in its index: those are treated as misses.
+"""
+
+import logging
+import os
+import tempfile
+
+from lru import LRUCache
+
+log = logging.getLogger(__name__)
+
+
+class DiskContentCache(object):
+    """
+    An LRU cache of asset data in `directory`, holding at most `max_size` bytes.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        # digest -> size of its file
+        self._files = LRUCache(max_size, sizeof=lambda size: size, on_evict=self._evicted)
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith('.'):
+                # an incomplete download by a process that died
+                self._remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            if not self._files.set(name, size):
+                self._remove(self.path(name))
+
+    @property
+    def size(self):
+        """The total size of the cached files, in bytes"""
+        return self._files.size
+
+    def path(self, digest):
+        """
+        Return the path of the file for digest
+        """
+        return os.path.join(self.directory, digest)
+
+    def open(self, digest):
+        """
+        Return an open file with the data for digest, or None if it isn't cached
+        """
+        if self._files.get(digest) is None:
+            return None
+        try:
+            cached_file = open(self.path(digest), 'rb')
+        except IOError:
+            # deleted by another process
+            self._files.pop(digest)
+            return None
+        try:
+            # so that the least recently used files are dropped first after a restart
+            os.utime(self.path(digest), None)
+        except OSError:
+            pass
+        return cached_file
+
+    def write_through(self, digest, length, chunks):
+        """
+        Yield the chunks of data from the iterable `chunks`, saving them in the
+        cache as digest once all `length` bytes have been read.
+        """
+        fd, temp_path = tempfile.mkstemp(prefix='.', dir=self.directory)
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+                    written += len(chunk)
+                    yield chunk
+        except BaseException:
+            # including GeneratorExit, if the client went away
+            self._remove(temp_path)
+            raise
+
+        if written == length:
+            self._add(digest, temp_path, length)
+        else:
+            self._remove(temp_path)
+
+    def _add(self, digest, temp_path, size):
+        """
+        Move the complete file at temp_path into the cache as digest
+        """
+        if size > self.max_size:
+            self._remove(temp_path)
+            return
+        os.rename(temp_path, self.path(digest))
+        self._files.set(digest, size)
+
+    def _evicted(self, digest, size):
+        """
+        Delete the file of digest, once it's dropped from the cache
+        """
+        self._remove(self.path(digest))
+
+    def _remove(self, path):
+        """
+        Delete the file at path, if it still exists
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            log.debug("Couldn't delete %s from the asset cache", path)
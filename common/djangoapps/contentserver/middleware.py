@@ -1,11 +1,99 @@
+import re
+from calendar import timegm
+
+from django.conf import settings
 from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG, STREAM_DATA_CHUNK_SIZE
 from xmodule.modulestore import InvalidLocationError
 from cache_toolbox.core import get_cached_content, set_cached_content
 from xmodule.exceptions import NotFoundError
 
+from contentserver.disk_cache import DiskContentCache
+
+# Only content smaller than this is cached in memcached
+MAX_CACHED_CONTENT_SIZE = 1048576
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_DISK_CACHE = []
+
+
+def disk_cache():
+    """
+    Return the DiskContentCache for large assets configured in
+    settings.STATIC_CONTENT_DISK_CACHE, or None
+    """
+    if not _DISK_CACHE:
+        config = getattr(settings, 'STATIC_CONTENT_DISK_CACHE', None)
+        if config:
+            _DISK_CACHE.append(DiskContentCache(config['DIRECTORY'], config['MAX_SIZE']))
+        else:
+            _DISK_CACHE.append(None)
+    return _DISK_CACHE[0]
+
+
+def parse_range(range_header, length):
+    """
+    Return the (first byte, last byte) of the single byte range in the value of
+    a Range header, for content of the given length.
+
+    Returns None if the header isn't a single byte range, since those may be
+    ignored, and raises ValueError if the range can't be satisfied.
+    """
+    match = RANGE_RE.match(range_header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last `last` bytes
+        suffix_length = int(last)
+        if suffix_length == 0 or length == 0:
+            raise ValueError(range_header)
+        return max(length - suffix_length, 0), length - 1
+
+    first = int(first)
+    last = int(last) if last else length - 1
+    if first >= length:
+        raise ValueError(range_header)
+    if first > last:
+        return None
+    return first, min(last, length - 1)
+
+
+def file_chunks(data_file, first_byte, last_byte):
+    """
+    Yields the bytes of data_file from first_byte to last_byte, inclusive, and
+    closes it
+    """
+    try:
+        data_file.seek(first_byte)
+        remaining = last_byte - first_byte + 1
+        while remaining > 0:
+            chunk = data_file.read(min(remaining, STREAM_DATA_CHUNK_SIZE))
+            if len(chunk) == 0:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        data_file.close()
+
+
+def stream_chunks(content, first_byte, last_byte):
+    """
+    Yields the bytes of a StaticContentStream from first_byte to last_byte,
+    inclusive, and closes it
+    """
+    try:
+        for chunk in content.stream_data_in_range(first_byte, last_byte):
+            yield chunk
+    finally:
+        content.close()
+
 
 class StaticContentServer(object):
     def process_request(self, request):
@@ -33,28 +121,110 @@ class StaticContentServer(object):
                 # since we fetched it from DB, let's cache it going forward, but only if it's < 1MB
                 # this is because I haven't been able to find a means to stream data out of memcached
                 if content.length is not None:
-                    if content.length < 1048576:
+                    if content.length < MAX_CACHED_CONTENT_SIZE:
                         # since we've queried as a stream, let's read in the stream into memory to set in cache
-                        content = content.copy_to_in_mem()
+                        stream = content
+                        content = stream.copy_to_in_mem()
+                        stream.close()
                         set_cached_content(content)
             else:
                 # NOP here, but we may wish to add a "cache-hit" counter in the future
                 pass
 
-            # see if the last-modified at hasn't changed, if not return a 302 (Not Modified)
+            # Content cached before digests were recorded doesn't have one
+            etag = None
+            digest = getattr(content, 'content_digest', None)
+            if digest:
+                etag = '"{0}"'.format(digest)
 
-            # convert over the DB persistent last modified timestamp to a HTTP compatible
-            # timestamp, so we can simply compare the strings
-            last_modified_at_str = content.last_modified_at.strftime("%a, %d-%b-%Y %H:%M:%S GMT")
+            # see if the client has cached this content, if so then return a 304 (Not Modified)
+            last_modified_at = timegm(content.last_modified_at.utctimetuple())
+            if self.is_not_modified(request, etag, last_modified_at):
+                self.close(content)
+                response = HttpResponseNotModified()
+            else:
+                response = self.content_response(request, content, etag)
 
-            # see if the client has cached this content, if so then compare the
-            # timestamps, if they are the same then just return a 304 (Not Modified)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            response['Last-Modified'] = http_date(last_modified_at)
+            response['Accept-Ranges'] = 'bytes'
+            if etag:
+                response['ETag'] = etag
+            return response
 
-            response = HttpResponse(content.stream_data(), content_type=content.content_type)
-            response['Last-Modified'] = last_modified_at_str
+    def is_not_modified(self, request, etag, last_modified_at):
+        """
+        Return whether the copy of the content that the client has, according
+        to its conditional headers, is still current. last_modified_at is a
+        timestamp in seconds.
+        """
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            client_etags = parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+            return etag is not None and (etag.strip('"') in client_etags or '*' in client_etags)
 
-            return response
+        if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            if_modified_since = parse_http_date_safe(request.META['HTTP_IF_MODIFIED_SINCE'])
+            return if_modified_since is not None and last_modified_at <= if_modified_since
+
+        return False
+
+    def content_response(self, request, content, etag):
+        """
+        Return the response for all of the content, or the single byte range
+        of it that the request asks for
+        """
+        length = content.length
+        byte_range = None
+        if length is not None and 'HTTP_RANGE' in request.META:
+            # If-Range: only send part of the content if it's the version the client has
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if if_range is None or (etag is not None and if_range == etag):
+                try:
+                    byte_range = parse_range(request.META['HTTP_RANGE'], length)
+                except ValueError:
+                    self.close(content)
+                    response = HttpResponse(status=416)
+                    response['Content-Range'] = 'bytes */{0}'.format(length)
+                    return response
+
+        first_byte, last_byte = byte_range or (0, (length or 0) - 1)
+        response = HttpResponse(self.content_chunks(content, first_byte, last_byte), content_type=content.content_type)
+        if byte_range is not None:
+            response.status_code = 206
+            response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(first_byte, last_byte, length)
+        if length is not None:
+            response['Content-Length'] = last_byte - first_byte + 1
+        return response
+
+    def content_chunks(self, content, first_byte, last_byte):
+        """
+        Return an iterable of the bytes of content from first_byte to
+        last_byte, inclusive, from the local disk cache if it has them
+        """
+        if content.length is None:
+            return content.stream_data()
+        if not hasattr(content, 'close'):
+            # content that is cached in memory
+            return content.stream_data_in_range(first_byte, last_byte)
+
+        cache = disk_cache()
+        digest = content.content_digest
+        if cache is None or digest is None:
+            return stream_chunks(content, first_byte, last_byte)
+
+        cached_file = cache.open(digest)
+        if cached_file is not None:
+            content.close()
+            return file_chunks(cached_file, first_byte, last_byte)
+
+        chunks = stream_chunks(content, first_byte, last_byte)
+        if first_byte == 0 and last_byte == content.length - 1:
+            # save a copy of all of the content as it's being sent
+            chunks = cache.write_through(digest, content.length, chunks)
+        return chunks
+
+    def close(self, content):
+        """
+        Close the GridFS file of content, if it's streamed from the contentstore
+        """
+        if hasattr(content, 'close'):
+            content.close()
@@ -0,0 +1,130 @@
+"""
+Tests for serving byte ranges of static content, and for the disk cache of large assets
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.utils.http import http_date
+from mock import patch
+from pytz import UTC
+
+from xmodule.contentstore.content import StaticContent
+
+from .disk_cache import DiskContentCache
+from .middleware import parse_range, StaticContentServer
+
+
+class ParseRangeTest(TestCase):
+    """Test parsing Range headers"""
+
+    def test_ranges(self):
+        self.assertEqual((0, 99), parse_range('bytes=0-99', 1000))
+        self.assertEqual((500, 999), parse_range('bytes=500-', 1000))
+        self.assertEqual((900, 999), parse_range('bytes=-100', 1000))
+        self.assertEqual((0, 999), parse_range('bytes=-2000', 1000))
+        self.assertEqual((900, 999), parse_range('bytes=900-2000', 1000))
+
+    def test_ignored_ranges(self):
+        self.assertIsNone(parse_range('bytes=0-9,20-29', 1000))
+        self.assertIsNone(parse_range('bytes=9-0', 1000))
+        self.assertIsNone(parse_range('lines=0-9', 1000))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertRaises(ValueError, parse_range, 'bytes=1000-', 1000)
+        self.assertRaises(ValueError, parse_range, 'bytes=-0', 1000)
+
+
+class DiskContentCacheTest(TestCase):
+    """Test the LRU cache of assets on disk"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_write_through(self):
+        cache = DiskContentCache(self.directory, 10)
+        self.assertIsNone(cache.open('abc'))
+        self.assertEqual(['0123', '45'], list(cache.write_through('abc', 6, ['0123', '45'])))
+        self.assertEqual('012345', cache.open('abc').read())
+
+        # files that weren't sent completely aren't kept
+        chunks = cache.write_through('def', 6, ['0123', '45'])
+        chunks.next()
+        chunks.close()
+        self.assertIsNone(cache.open('def'))
+        self.assertEqual(['abc'], os.listdir(self.directory))
+
+    def test_eviction(self):
+        cache = DiskContentCache(self.directory, 10)
+        list(cache.write_through('a', 4, ['aaaa']))
+        list(cache.write_through('b', 4, ['bbbb']))
+        cache.open('a').close()
+        list(cache.write_through('c', 4, ['cccc']))
+        self.assertEqual(8, cache.size)
+        self.assertIsNone(cache.open('b'))
+        self.assertEqual(['a', 'c'], sorted(os.listdir(self.directory)))
+
+        # another process finds the files that are there
+        self.assertEqual(8, DiskContentCache(self.directory, 10).size)
+
+
+class StaticContentServerTest(TestCase):
+    """Test serving an asset, in parts, and to clients that have a copy"""
+
+    def setUp(self):
+        self.location = StaticContent.compute_location('edX', 'toy', 'asset.txt')
+        self.content = StaticContent(
+            self.location, 'asset.txt', 'text/plain', '0123456789',
+            last_modified_at=datetime(2013, 1, 1, tzinfo=UTC), length=10, content_digest='abc123'
+        )
+        patcher = patch('contentserver.middleware.get_cached_content', return_value=self.content)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = StaticContent.get_url_path_from_location(self.location)
+
+    def get(self, **headers):
+        """Return the middleware's response to a GET of the asset with headers"""
+        return StaticContentServer().process_request(RequestFactory().get(self.path, **headers))
+
+    def test_whole_content(self):
+        response = self.get()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('0123456789', ''.join(response))
+        self.assertEqual('10', response['Content-Length'])
+        self.assertEqual('"abc123"', response['ETag'])
+        self.assertEqual('bytes', response['Accept-Ranges'])
+
+    def test_range(self):
+        response = self.get(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(206, response.status_code)
+        self.assertEqual('2345', ''.join(response))
+        self.assertEqual('bytes 2-5/10', response['Content-Range'])
+        self.assertEqual('4', response['Content-Length'])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=10-')
+        self.assertEqual(416, response.status_code)
+        self.assertEqual('bytes */10', response['Content-Range'])
+
+    def test_if_none_match(self):
+        self.assertEqual(304, self.get(HTTP_IF_NONE_MATCH='"abc123"').status_code)
+        self.assertEqual(200, self.get(HTTP_IF_NONE_MATCH='"other"').status_code)
+
+    def test_if_modified_since(self):
+        last_modified = http_date(1356998400)  # 2013-01-01
+        self.assertEqual(304, self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code)
+        self.assertEqual(200, self.get(HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code)
+
+    def test_if_range(self):
+        # The range is only sent if the client has the current version
+        response = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"abc123"')
+        self.assertEqual(206, response.status_code)
+        self.assertEqual('2345', ''.join(response))
+
+        response = self.get(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('0123456789', ''.join(response))
@@ -11,6 +11,12 @@ from xmodule.contentstore.content import StaticContent
 
 log = logging.getLogger(__name__)
 
+# The most static urls remembered for one course, see resolve_static_url
+MAX_MEMOIZED_URLS_PER_COURSE = 5000
+
+# (course_id, static_asset_path or data_directory) -> {path: resolved url}
+_STATIC_URL_MEMO = {}
+
 
 def _url_replace_regex(prefix):
     """
@@ -28,6 +34,18 @@ def _url_replace_regex(prefix):
         """.format(prefix=prefix)
 
 
+def clear_static_url_cache(course_id=None):
+    """
+    Forget the resolved static urls of course_id, or of all courses
+    """
+    if course_id is None:
+        _STATIC_URL_MEMO.clear()
+        return
+    for key in _STATIC_URL_MEMO.keys():
+        if key[0] == course_id:
+            _STATIC_URL_MEMO.pop(key, None)
+
+
 def try_staticfiles_lookup(path):
     """
     Try to lookup a path in staticfiles_storage.  If it fails, return
@@ -90,6 +108,76 @@ def replace_course_urls(text, course_id):
     return re.sub(_url_replace_regex('/course/'), replace_course_url, text)
 
 
+def resolve_static_url(rest, data_directory, course_id=None, static_asset_path=''):
+    """
+    Return the url that /static/`rest` refers to, as described in
+    replace_static_urls, or None if it should be left as it is.
+
+    Looking urls up in staticfiles_storage is slow, so the urls of each
+    course are remembered (except in DEBUG, when static files come and go).
+    """
+    if settings.DEBUG or course_id is None:
+        return _resolve_static_url(rest, data_directory, course_id, static_asset_path)
+
+    memo = _STATIC_URL_MEMO.setdefault((course_id, static_asset_path or data_directory), {})
+    try:
+        return memo[rest]
+    except KeyError:
+        pass
+    url = _resolve_static_url(rest, data_directory, course_id, static_asset_path)
+    if len(memo) >= MAX_MEMOIZED_URLS_PER_COURSE:
+        memo.clear()
+    memo[rest] = url
+    return url
+
+
+def _resolve_static_url(rest, data_directory, course_id, static_asset_path):
+    """
+    Look up the url for resolve_static_url
+    """
+    # Don't mess with things that end in '?raw'
+    if rest.endswith('?raw'):
+        return None
+
+    # In debug mode, if we can find the url as is,
+    if settings.DEBUG and finders.find(rest, True):
+        return None
+    # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
+    elif (not static_asset_path) and course_id and modulestore().get_modulestore_type(course_id) != XML_MODULESTORE_TYPE:
+        # first look in the static file pipeline and see if we are trying to reference
+        # a piece of static content which is in the mitx repo (e.g. JS associated with an xmodule)
+
+        exists_in_staticfiles_storage = False
+        try:
+            exists_in_staticfiles_storage = staticfiles_storage.exists(rest)
+        except Exception as err:
+            log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
+                rest, str(err)))
+
+        if exists_in_staticfiles_storage:
+            url = staticfiles_storage.url(rest)
+        else:
+            # if not, then assume it's courseware specific content and then look in the
+            # Mongo-backed database
+            url = StaticContent.convert_legacy_static_url_with_course_id(rest, course_id)
+    # Otherwise, look the file up in staticfiles_storage, and append the data directory if needed
+    else:
+        course_path = "/".join((static_asset_path or data_directory, rest))
+
+        try:
+            if staticfiles_storage.exists(rest):
+                url = staticfiles_storage.url(rest)
+            else:
+                url = staticfiles_storage.url(course_path)
+        # And if that fails, assume that it's course content, and add manually data directory
+        except Exception as err:
+            log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
+                rest, str(err)))
+            url = "".join(['/static/', course_path])
+
+    return url
+
+
 def replace_static_urls(text, data_directory, course_id=None, static_asset_path=''):
     """
     Replace /static/$stuff urls either with their correct url as generated by collectstatic,
@@ -102,58 +190,36 @@ def replace_static_urls(text, data_directory, course_id=None, static_asset_path=
     course_id: The course identifier used to distinguish static content for this course in studio
     static_asset_path: Path for static assets, which overrides data_directory and course_namespace, if nonempty
     """
+    return replace_urls(text, data_directory, course_id, static_asset_path, course_urls=False)
 
-    def replace_static_url(match):
-        original = match.group(0)
+
+def replace_urls(text, data_directory, course_id=None, static_asset_path='',
+                 jump_to_id_base_url=None, course_urls=True):
+    """
+    Do the substitutions of replace_static_urls, replace_course_urls (if
+    course_urls and course_id are set) and replace_jump_to_id_urls (if
+    jump_to_id_base_url is set) all in one pass over text.
+    """
+    prefixes = ['/static/(?!{data_dir})'.format(data_dir=static_asset_path or data_directory)]
+    if course_urls and course_id is not None:
+        prefixes.append('/course/')
+    if jump_to_id_base_url is not None:
+        prefixes.append('/jump_to_id/')
+
+    def replace_url(match):
         prefix = match.group('prefix')
         quote = match.group('quote')
         rest = match.group('rest')
 
-        # Don't mess with things that end in '?raw'
-        if rest.endswith('?raw'):
-            return original
-
-        # In debug mode, if we can find the url as is,
-        if settings.DEBUG and finders.find(rest, True):
-            return original
-        # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
-        elif (not static_asset_path) and course_id and modulestore().get_modulestore_type(course_id) != XML_MODULESTORE_TYPE:
-            # first look in the static file pipeline and see if we are trying to reference
-            # a piece of static content which is in the mitx repo (e.g. JS associated with an xmodule)
-
-            exists_in_staticfiles_storage = False
-            try:
-                exists_in_staticfiles_storage = staticfiles_storage.exists(rest)
-            except Exception as err:
-                log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
-                    rest, str(err)))
-
-            if exists_in_staticfiles_storage:
-                url = staticfiles_storage.url(rest)
-            else:
-                # if not, then assume it's courseware specific content and then look in the
-                # Mongo-backed database
-                url = StaticContent.convert_legacy_static_url_with_course_id(rest, course_id)
-        # Otherwise, look the file up in staticfiles_storage, and append the data directory if needed
+        if prefix == '/course/':
+            url = '/courses/' + course_id + '/' + rest
+        elif prefix == '/jump_to_id/':
+            url = jump_to_id_base_url + rest
         else:
-            course_path = "/".join((static_asset_path or data_directory, rest))
-
-            try:
-                if staticfiles_storage.exists(rest):
-                    url = staticfiles_storage.url(rest)
-                else:
-                    url = staticfiles_storage.url(course_path)
-            # And if that fails, assume that it's course content, and add manually data directory
-            except Exception as err:
-                log.warning("staticfiles_storage couldn't find path {0}: {1}".format(
-                    rest, str(err)))
-                url = "".join([prefix, course_path])
+            url = resolve_static_url(rest, data_directory, course_id, static_asset_path)
+            if url is None:
+                return match.group(0)
 
         return "".join([quote, url, quote])
 
-
-    return re.sub(
-        _url_replace_regex('/static/(?!{data_dir})'.format(data_dir=static_asset_path or data_directory)),
-        replace_static_url,
-        text
-    )
+    return re.sub(_url_replace_regex('|'.join(prefixes)), replace_url, text)
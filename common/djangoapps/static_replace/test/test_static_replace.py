@@ -2,9 +2,10 @@ import re
 
 from nose.tools import assert_equals, assert_true, assert_false
 from static_replace import (replace_static_urls, replace_course_urls,
-                            _url_replace_regex)
+                            replace_jump_to_id_urls, replace_urls,
+                            clear_static_url_cache, _url_replace_regex)
 from mock import patch, Mock
-from xmodule.modulestore import Location
+from xmodule.modulestore import Location, XML_MODULESTORE_TYPE
 from xmodule.modulestore.mongo import MongoModuleStore
 from xmodule.modulestore.xml import XMLModuleStore
 
@@ -49,7 +50,7 @@ def test_storage_url_not_exists(mock_storage):
 @patch('static_replace.StaticContent')
 @patch('static_replace.modulestore')
 def test_mongo_filestore(mock_modulestore, mock_static_content):
-
+    clear_static_url_cache()
     mock_modulestore.return_value = Mock(MongoModuleStore)
     mock_static_content.convert_legacy_static_url_with_course_id.return_value = "c4x://mock_url"
 
@@ -79,6 +80,50 @@ def test_data_dir_fallback(mock_storage, mock_modulestore, mock_settings):
     assert_equals('"/static/data_dir/file.png"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY))
 
 
+@patch('static_replace.StaticContent')
+@patch('static_replace.modulestore')
+@patch('static_replace.staticfiles_storage')
+def test_static_urls_are_remembered(mock_storage, mock_modulestore, mock_static_content):
+    clear_static_url_cache()
+    mock_modulestore.return_value = Mock(MongoModuleStore)
+    mock_storage.exists.return_value = False
+    mock_static_content.convert_legacy_static_url_with_course_id.return_value = "c4x://mock_url"
+
+    for _ in range(2):
+        assert_equals('"c4x://mock_url"', replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, course_id=COURSE_ID))
+    mock_storage.exists.assert_called_once_with('file.png')
+
+    clear_static_url_cache(COURSE_ID)
+    replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, course_id=COURSE_ID)
+    assert_equals(2, mock_storage.exists.call_count)
+    clear_static_url_cache()
+
+
+@patch('static_replace.modulestore')
+@patch('static_replace.staticfiles_storage')
+def test_replace_urls(mock_storage, mock_modulestore):
+    clear_static_url_cache()
+    mock_modulestore.return_value = Mock(XMLModuleStore)
+    mock_modulestore.return_value.get_modulestore_type.return_value = XML_MODULESTORE_TYPE
+    mock_storage.exists.return_value = False
+    mock_storage.url.return_value = '/static/data_dir/file.png'
+    text = '<a href="/course/foo"/><a href="/jump_to_id/bar"/><img src="/static/file.png"/><img src="/static/file.png?raw"/>'
+
+    expected = replace_jump_to_id_urls(
+        replace_course_urls(replace_static_urls(text, DATA_DIRECTORY, COURSE_ID), COURSE_ID),
+        COURSE_ID, '/courses/org/course/run/jump_to_id/'
+    )
+    assert_equals(
+        expected,
+        replace_urls(text, DATA_DIRECTORY, COURSE_ID, jump_to_id_base_url='/courses/org/course/run/jump_to_id/')
+    )
+    assert_equals(
+        replace_course_urls(replace_static_urls(text, DATA_DIRECTORY, COURSE_ID), COURSE_ID),
+        replace_urls(text, DATA_DIRECTORY, COURSE_ID)
+    )
+    clear_static_url_cache()
+
+
 def test_raw_static_check():
     """
     Make sure replace_static_urls leaves alone things that end in '.raw'
@@ -1,10 +1,15 @@
 """Tests for student tracking"""
+import threading
+
 import mock
 
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.core.urlresolvers import reverse, NoReverseMatch
 from track.models import TrackingLog
-from track.views import user_track
+from track.views import user_track, write_events
+from track import writer
+from track.writer import BatchWriter, writer_from_settings
 from nose.plugins.skip import SkipTest
 
 
@@ -58,3 +63,89 @@ class TrackingTest(TestCase):
                 self.assertEqual(log.event, request_params["event"])
                 self.assertEqual(log.event_type, request_params["event_type"])
                 self.assertEqual(log.page, request_params["page"])
+
+
+class WriteEventsTest(TestCase):
+    """
+    Tests that one bad event doesn't stop the others from being written
+    """
+
+    def event(self, event_type, **kwargs):
+        """Return a tracking event of event_type"""
+        event = dict((field, '') for field in ['username', 'ip', 'event_source', 'event', 'agent', 'page', 'host'])
+        event.update(event_type=event_type, time='2013-07-01T12:00:00+00:00', **kwargs)
+        return event
+
+    @mock.patch.dict('django.conf.settings.MITX_FEATURES', {'ENABLE_SQL_TRACKING_LOGS': True})
+    def test_unserializable_event(self):
+        write_events([self.event('first'), self.event('bad', event=object()), self.event('last')])
+        self.assertEqual(
+            ['first', 'last'],
+            list(TrackingLog.objects.order_by('id').values_list('event_type', flat=True))
+        )
+
+    @mock.patch.dict('django.conf.settings.MITX_FEATURES', {'ENABLE_SQL_TRACKING_LOGS': True})
+    def test_bulk_create_fails(self):
+        with mock.patch.object(TrackingLog.objects, 'bulk_create', side_effect=Exception):
+            write_events([self.event('first'), self.event('bad', time='not a time'), self.event('last')])
+        self.assertEqual(
+            ['first', 'last'],
+            list(TrackingLog.objects.order_by('id').values_list('event_type', flat=True))
+        )
+
+
+class BatchWriterTest(TestCase):
+    """
+    Tests that events are written in batches on a background thread
+    """
+
+    def test_batches(self):
+        batches = []
+        writer = BatchWriter(batches.append, queue_size=10, batch_size=2, flush_interval=0.1)
+        for event in range(5):
+            writer.put(event)
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(range(5), sum(batches, []))
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+    def test_connection_closed(self):
+        writer = BatchWriter(lambda events: None, queue_size=10, batch_size=2, flush_interval=0)
+        with mock.patch('track.writer.close_connection') as close_connection:
+            writer.put('event')
+            self.assertTrue(writer.flush(5))
+        self.assertTrue(close_connection.called)
+
+    def test_full_queue(self):
+        writing = threading.Event()
+        finish = threading.Event()
+        batches = []
+
+        def write_batch(events):
+            """Hold up the writing thread until the test is ready"""
+            writing.set()
+            finish.wait(5)
+            batches.append(events)
+
+        writer = BatchWriter(write_batch, queue_size=1, batch_size=1, flush_interval=0)
+        writer.put('written')
+        writing.wait(5)
+        writer.put('queued')
+        writer.put('dropped')
+        self.assertEqual(1, writer.dropped)
+
+        finish.set()
+        self.assertTrue(writer.flush(5))
+        self.assertEqual([['written'], ['queued']], batches)
+
+    @mock.patch('track.writer.atexit')
+    @mock.patch.dict(writer._WRITERS, clear=True)
+    @override_settings(
+        TEST_WRITER={'QUEUE_SIZE': 10, 'BATCH_SIZE': 2, 'FLUSH_INTERVAL': 1},
+        NO_WRITER=None,
+    )
+    def test_writer_from_settings(self, atexit):
+        configured = writer_from_settings('TEST_WRITER', lambda events: None, 'test')
+        self.assertEqual((10, 2, 1), (configured.queue_size, configured.batch_size, configured.flush_interval))
+        self.assertIs(configured, writer_from_settings('TEST_WRITER', lambda events: None, 'test'))
+        atexit.register.assert_called_once_with(configured.flush, writer.SHUTDOWN_FLUSH_TIMEOUT)
+        self.assertIsNone(writer_from_settings('NO_WRITER', lambda events: None, 'test'))
@@ -8,10 +8,12 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.conf import settings
+from django.db import transaction
 from mitxmako.shortcuts import render_to_response
 
 from django_future.csrf import ensure_csrf_cookie
 from track.models import TrackingLog
+from track.writer import writer_from_settings
 from pytz import UTC
 
 log = logging.getLogger("tracking")
@@ -19,17 +21,62 @@ log = logging.getLogger("tracking")
 LOGFIELDS = ['username', 'ip', 'event_source', 'event_type', 'event', 'agent', 'page', 'time', 'host']
 
 
+def tracking_log_writer():
+    """
+    Return the BatchWriter configured in settings.TRACKING_LOG_WRITER, or None
+    if events should be written during the request
+    """
+    return writer_from_settings('TRACKING_LOG_WRITER', write_events, 'tracking log')
+
+
 def log_event(event):
-    """Write tracking event to log file, and optionally to TrackingLog model."""
-    event_str = json.dumps(event)
-    log.info(event_str[:settings.TRACK_MAX_EVENT])
+    """
+    Write tracking event to log file, and optionally to TrackingLog model.
+
+    If there's a tracking_log_writer, the event is written later, so it mustn't
+    be changed after it's logged.
+    """
+    writer = tracking_log_writer()
+    if writer is None:
+        write_events([event])
+    else:
+        writer.put(event)
+
+
+def write_events(events):
+    """
+    Write tracking events to the log file, and optionally insert them into the
+    TrackingLog model all at once. An event that can't be written is logged
+    and skipped, without losing the others.
+    """
+    written = []
+    for event in events:
+        try:
+            event_str = json.dumps(event)
+        except (TypeError, ValueError):
+            log.exception("Couldn't serialize tracking event %r", event)
+            continue
+        log.info(event_str[:settings.TRACK_MAX_EVENT])
+        written.append(event)
     if settings.MITX_FEATURES.get('ENABLE_SQL_TRACKING_LOGS'):
-        event['time'] = dateutil.parser.parse(event['time'])
-        tldat = TrackingLog(**dict((x, event[x]) for x in LOGFIELDS))
+        tracking_logs = []
+        for event in written:
+            try:
+                event['time'] = dateutil.parser.parse(event['time'])
+                tracking_logs.append(TrackingLog(**dict((x, event[x]) for x in LOGFIELDS)))
+            except Exception as err:
+                log.exception(err)
         try:
-            tldat.save()
+            TrackingLog.objects.bulk_create(tracking_logs)
         except Exception as err:
             log.exception(err)
+            transaction.rollback_unless_managed()
+            # Save them one at a time, so that one bad row doesn't lose the rest
+            for tracking_log in tracking_logs:
+                try:
+                    tracking_log.save()
+                except Exception as err:
+                    log.exception(err)
 
 
 def user_track(request):
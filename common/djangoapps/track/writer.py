@@ -0,0 +1,154 @@
+"""
+Writes events, such as tracking events, on a background thread, so that
+requests don't wait for the log or the database.
+
+Events are put on a bounded queue, which a thread drains in batches. If the
+queue is full, because the writes can't keep up, new events are dropped and
+counted rather than making requests wait.
+"""
+
+import atexit
+import logging
+import os
+import Queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_connection
+
+log = logging.getLogger(__name__)
+
+# Warn about dropped events once every this many
+DROP_WARNING_INTERVAL = 1000
+
+# How long to wait for queued events to be written when the process exits
+SHUTDOWN_FLUSH_TIMEOUT = 5
+
+_WRITERS = {}
+
+
+class _FlushRequest(object):
+    """
+    Put on the queue by flush: it's done once the events before it are written
+    """
+    def __init__(self):
+        self.done = threading.Event()
+
+
+def writer_from_settings(setting_name, write_batch, name):
+    """
+    Return the BatchWriter of write_batch configured by the setting named
+    setting_name, a dict of its QUEUE_SIZE, BATCH_SIZE and FLUSH_INTERVAL, or
+    None if the setting is None and events should be written right away. The
+    writer is created once, and flushed when the process exits.
+    """
+    if setting_name not in _WRITERS:
+        config = getattr(settings, setting_name, None)
+        writer = None
+        if config:
+            writer = BatchWriter(
+                write_batch,
+                queue_size=config['QUEUE_SIZE'],
+                batch_size=config['BATCH_SIZE'],
+                flush_interval=config['FLUSH_INTERVAL'],
+                name=name,
+            )
+            atexit.register(writer.flush, SHUTDOWN_FLUSH_TIMEOUT)
+        _WRITERS[setting_name] = writer
+    return _WRITERS[setting_name]
+
+
+class BatchWriter(object):
+    """
+    Passes events to `write_batch`, a function of a list of events, on a
+    background thread, in batches of at most `batch_size`. Events are written
+    at most `flush_interval` seconds after they're put, and at most
+    `queue_size` events wait to be written. `name` describes the events in
+    log messages.
+    """
+    def __init__(self, write_batch, queue_size=10000, batch_size=100, flush_interval=1,
+                 name='batched'):
+        self.write_batch = write_batch
+        self.name = name
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = Queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def put(self, event):
+        """
+        Queue event to be written, or drop it if the queue is full. Returns
+        whether the event was queued.
+        """
+        self._start()
+        try:
+            self._queue.put_nowait(event)
+        except Queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped % DROP_WARNING_INTERVAL == 1:
+                log.warning("The %s queue is full: %d events not queued so far", self.name, dropped)
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Wait for the events queued so far to be written, for at most timeout
+        seconds. Returns whether they were.
+        """
+        self._start()
+        flush_request = _FlushRequest()
+        try:
+            self._queue.put(flush_request, timeout=timeout)
+        except Queue.Full:
+            return False
+        flush_request.done.wait(timeout)
+        return flush_request.done.is_set()
+
+    def _start(self):
+        """
+        Start the writing thread, if it hasn't been started in this process
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # This process was forked: the queued events are the parent's to write.
+                self._queue = Queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run, name='BatchWriter ({0})'.format(self.name))
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        """
+        Write batches of events from the queue, forever
+        """
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while len(batch) < self.batch_size and not isinstance(batch[-1], _FlushRequest):
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.time(), 0)))
+                except Queue.Empty:
+                    break
+
+            events = [item for item in batch if not isinstance(item, _FlushRequest)]
+            if events:
+                try:
+                    self.write_batch(events)
+                except Exception:
+                    log.exception("Couldn't write %d %s events", len(events), self.name)
+                finally:
+                    # Don't hold this thread's database connection open between batches
+                    close_connection()
+            if isinstance(batch[-1], _FlushRequest):
+                batch[-1].done.set()
@@ -89,6 +89,38 @@ def replace_static_urls(get_html, data_dir, course_id=None, static_asset_path=''
     return _get_html
 
 
+def replace_urls(get_html, data_dir, course_id, static_asset_path='', jump_to_id_base_url=None):
+    """
+    Updates the supplied module with a new get_html function that does what
+    replace_static_urls, replace_course_urls and replace_jump_to_id_urls do,
+    in a single pass over the html
+    """
+    @wraps(get_html)
+    def _get_html():
+        return static_replace.replace_urls(
+            get_html(), data_dir, course_id,
+            static_asset_path=static_asset_path,
+            jump_to_id_base_url=jump_to_id_base_url
+        )
+    return _get_html
+
+
+def cache_html(get_html, cache, key):
+    """
+    Updates the supplied module with a new get_html function that returns the
+    html cached under key, if there is any, and otherwise caches the html of
+    the old get_html function there
+    """
+    @wraps(get_html)
+    def _get_html():
+        html = cache.get(key)
+        if html is None:
+            html = get_html()
+            cache.set(key, html)
+        return html
+    return _get_html
+
+
 def grade_histogram(module_id):
     ''' Print out a histogram of grades on a given problem.
         Part of staff member debug info.
@@ -1,15 +1,19 @@
 """
 Parser and evaluator for FormulaResponse and NumericalResponse
 
-Uses pyparsing to parse. Main function as of now is evaluator().
+Uses pyparsing to parse. Main function as of now is evaluator(). Parsed
+expressions are kept in an LRU cache; use compile_expression() to evaluate the
+same expression many times.
 """
 
 import math
 import operator
-import numbers
+from collections import namedtuple
+
 import numpy
 import scipy.constants
 import calcfunctions
+from lru import LRUCache
 
 from pyparsing import (
     Word, Literal, CaselessLiteral, ZeroOrMore, MatchFirst, Optional, Forward,
@@ -94,6 +98,18 @@ def lower_dict(input_dict):
 # The following few functions define evaluation actions, which are run on lists
 # of results from each parse component. They convert the strings and (previously
 # calculated) numbers into the number that component represents.
+#
+# The numbers may also be numpy arrays (of samples of the variables), in which
+# case everything is computed element-wise. So tell operators apart from
+# numbers by checking for strings, and never compare numbers to strings.
+
+def is_operand(token):
+    """
+    Return whether `token` is a (previously calculated) number or array,
+    rather than a string such as an operator or a parenthesis.
+    """
+    return not isinstance(token, basestring)
+
 
 def super_float(text):
     """
@@ -122,7 +138,7 @@ def eval_atom(parse_result):
     In the case of parenthesis, ignore them.
     """
     # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    result = next(k for k in parse_result if is_operand(k))
     return result
 
 
@@ -136,7 +152,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if is_operand(k)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -151,15 +167,20 @@ def eval_parallel(parse_result):
       out = 1 / (1/in1 + 1/in2 + ...)
     e.g. [ 1, 2 ] -> 2/3
 
-    Return NaN if there is a zero among the inputs.
+    Return NaN if there is a zero among the inputs (element-wise, for arrays).
     """
-    if len(parse_result) == 1:
-        return parse_result[0]
-    if 0 in parse_result:
-        return float('nan')
-    reciprocals = [1. / e for e in parse_result
-                   if isinstance(e, numbers.Number)]
-    return 1. / sum(reciprocals)
+    inputs = [e for e in parse_result if is_operand(e)]
+    if len(inputs) == 1:
+        return inputs[0]
+    if not any(isinstance(e, numpy.ndarray) for e in inputs):
+        if 0 in inputs:
+            return float('nan')
+        return 1. / sum(1. / e for e in inputs)
+
+    has_zero = reduce(numpy.logical_or, [numpy.equal(e, 0) for e in inputs])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        result = 1. / sum(1. / e for e in inputs)
+    return numpy.where(has_zero, float('nan'), result)
 
 
 def eval_sum(parse_result):
@@ -170,15 +191,14 @@ def eval_sum(parse_result):
 
     Allow a leading + or -.
     """
+    ops = {'+': operator.add, '-': operator.sub}
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
-            current_op = operator.add
-        elif token == '-':
-            current_op = operator.sub
-        else:
+        if is_operand(token):
             total = current_op(total, token)
+        else:
+            current_op = ops[token]
     return total
 
 
@@ -188,15 +208,14 @@ def eval_product(parse_result):
 
     [ 1, '*', 2, '/', 3 ] -> 0.66
     """
+    ops = {'*': operator.mul, '/': operator.truediv}
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
-            current_op = operator.mul
-        elif token == '/':
-            current_op = operator.truediv
-        else:
+        if is_operand(token):
             prod = current_op(prod, token)
+        else:
+            current_op = ops[token]
     return prod
 
 
@@ -221,41 +240,177 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     Evaluate an expression; that is, take a string of math and return a float.
 
     -Variables are passed as a dictionary from string to value. They must be
-     python numbers.
+     python numbers, or numpy arrays of the same shape, e.g. holding many
+     samples of each variable. With arrays, the expression is parsed once and
+     evaluated element-wise into an array; numpy then reports errors such as
+     division by zero as inf/nan values (or warnings) instead of exceptions.
     -Unary functions are passed as a dictionary from string to function.
     """
     # No need to go further.
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    return compile_expression(math_expr, case_sensitive)(variables, functions)
 
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
+CacheInfo = namedtuple('CacheInfo', 'hits, misses, maxsize, currsize')
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
-
-    return math_interpreter.reduce_tree(evaluate_actions)
+
+class ExpressionCache(object):
+    """
+    A bounded, thread-safe LRU cache of CompiledExpressions, keyed by the
+    expression string and its case sensitivity.
+
+    `hits` and `misses` count the lookups since the cache was created or
+    last cleared, so that `maxsize` can be tuned.
+    """
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._entries = LRUCache(maxsize)
+
+    @property
+    def hits(self):
+        """The number of lookups that found an expression"""
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        """The number of lookups that had to parse an expression"""
+        return self._entries.misses
+
+    def get(self, math_expr, case_sensitive):
+        """
+        Return the CompiledExpression for `math_expr`, parsing it on a miss.
+
+        Expressions which don't parse aren't cached; the ParseException is
+        raised every time.
+        """
+        key = (math_expr, case_sensitive)
+        compiled = self._entries.get(key)
+        if compiled is None:
+            # Two threads may parse the same expression, which is harmless.
+            compiled = CompiledExpression(math_expr, case_sensitive)
+            self._entries.set(key, compiled)
+        return compiled
+
+    def info(self):
+        """
+        Return a CacheInfo with the hit and miss counts and the sizes.
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """
+        Empty the cache and reset its counters.
+        """
+        self._entries.clear()
+
+
+EXPRESSION_CACHE = ExpressionCache()
+
+
+def compile_expression(math_expr, case_sensitive=False):
+    """
+    Return a CompiledExpression for `math_expr`, from EXPRESSION_CACHE.
+
+    Calling it as `compiled(variables, functions)` does the same as
+    `evaluator(variables, functions, math_expr, case_sensitive)`, but the
+    expression is only parsed once. Raise a ParseException if it doesn't parse.
+    """
+    return EXPRESSION_CACHE.get(math_expr, case_sensitive)
+
+
+def compile_action(action):
+    """
+    Turn an evaluation action (such as `eval_sum`) into one that runs once, on
+    the compiled child nodes, and returns a function of the variables and
+    functions which evaluates the node.
+    """
+    def compile_node(parse_result):
+        """
+        Return the function evaluating this node.
+        """
+        children = list(parse_result)
+
+        def evaluate_node(variables, functions):
+            """
+            Evaluate the children (leaving strings as they are), then the node.
+            """
+            return action([
+                child if isinstance(child, basestring) else child(variables, functions)
+                for child in children
+            ])
+        return evaluate_node
+    return compile_node
+
+
+class CompiledExpression(object):
+    """
+    A math expression parsed into a tree of python functions, which can be
+    evaluated many times with different variables.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse `math_expr`; raise a ParseException if it is invalid.
+        """
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+
+        # Parse the tree.
+        self.math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+        self.math_interpreter.parse_algebra()
+
+        if case_sensitive:
+            casify = lambda x: x
+        else:
+            casify = lambda x: x.lower()  # Lowercase for case insens.
+
+        def compile_number(parse_result):
+            """
+            Numbers are constant.
+            """
+            value = eval_number(parse_result)
+            return lambda variables, functions: value
+
+        def compile_variable(parse_result):
+            """
+            Look up the variable by its (casified) name.
+            """
+            name = casify(parse_result[0])
+            return lambda variables, functions: variables[name]
+
+        def compile_function(parse_result):
+            """
+            Look up the function by its (casified) name, and call it on its
+            evaluated argument.
+            """
+            name = casify(parse_result[0])
+            argument = parse_result[1]
+            return lambda variables, functions: functions[name](argument(variables, functions))
+
+        compile_actions = {
+            'number': compile_number,
+            'variable': compile_variable,
+            'function': compile_function,
+            'atom': compile_action(eval_atom),
+            'power': compile_action(eval_power),
+            'parallel': compile_action(eval_parallel),
+            'product': compile_action(eval_product),
+            'sum': compile_action(eval_sum)
+        }
+        self.evaluate_tree = self.math_interpreter.reduce_tree(compile_actions)
+
+    def __call__(self, variables, functions=None):
+        """
+        Evaluate the expression, like `evaluator` does.
+        """
+        # Get our variables together.
+        all_variables, all_functions = add_defaults(variables, functions or {}, self.case_sensitive)
+
+        # ...and check them
+        self.math_interpreter.check_variables(all_variables, all_functions)
+
+        return self.evaluate_tree(all_variables, all_functions)
 
 
 class ParseAugmenter(object):
@@ -477,6 +477,29 @@ class EvaluatorTest(unittest.TestCase):
             5
         )
 
+    def test_array_vars(self):
+        """
+        Evaluation over numpy arrays of samples, element by element
+        """
+        samples = numpy.array([0.5, 1.0, 2.0, 3.5])
+        variables = {'x': samples, 'y': samples + 1}
+
+        for expr in ['3*x-y', '-x^2+x/y', 'sin(x)*e^y', 'x||y + 2', '13']:
+            result = calc.evaluator(variables, {}, expr)
+            for index, value in enumerate(samples):
+                expected = calc.evaluator({'x': value, 'y': value + 1}, {}, expr)
+                self.assertAlmostEqual(
+                    numpy.broadcast_arrays(result, samples)[0][index], expected,
+                    msg="Failed on {0} with x={1}".format(expr, value)
+                )
+
+        # Division by zero gives inf instead of an error, and || gives nan
+        variables = {'x': numpy.array([0.0, 1.0])}
+        self.assertTrue(numpy.isinf(calc.evaluator(variables, {}, '1/x')[0]))
+        parallel = calc.evaluator(variables, {}, 'x||1')
+        self.assertTrue(numpy.isnan(parallel[0]))
+        self.assertAlmostEqual(parallel[1], 0.5)
+
     def test_variable_case_sensitivity(self):
         """
         Test the case sensitivity flag and corresponding behavior
@@ -558,3 +581,57 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class ExpressionCacheTest(unittest.TestCase):
+    """
+    Test the cache of parsed expressions, and compiled expressions
+    """
+
+    def test_compile_expression(self):
+        """
+        A compiled expression can be evaluated with different variables
+        """
+        compiled = calc.compile_expression('3*x^2 + y||1')
+        self.assertEqual(compiled({'x': 1.0, 'y': 1.0}), 3.5)
+        self.assertEqual(compiled({'x': 2.0, 'y': 1.0}, {}), 12.5)
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            compiled({'x': 2.0})
+
+        # Same as with the evaluator
+        functions = {'f': lambda x: x * 10}
+        compiled = calc.compile_expression('F(x)')
+        self.assertEqual(compiled({'x': 2}, functions), 20)
+        compiled = calc.compile_expression('F(x)', case_sensitive=True)
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'F'):
+            compiled({'x': 2}, functions)
+
+        with self.assertRaises(ParseException):
+            calc.compile_expression('1+')
+
+    def test_hits_and_misses(self):
+        """
+        Expressions are parsed once per expression and case sensitivity
+        """
+        cache = calc.ExpressionCache(maxsize=10)
+        first = cache.get('x+1', False)
+        self.assertIs(cache.get('x+1', False), first)
+        self.assertIsNot(cache.get('x+1', True), first)
+        self.assertEqual(cache.info(), calc.CacheInfo(hits=1, misses=2, maxsize=10, currsize=2))
+
+        cache.clear()
+        self.assertEqual(cache.info(), calc.CacheInfo(hits=0, misses=0, maxsize=10, currsize=0))
+
+    def test_least_recently_used(self):
+        """
+        The least recently used expression is dropped when the cache is full
+        """
+        cache = calc.ExpressionCache(maxsize=2)
+        first = cache.get('x+1', False)
+        cache.get('x+2', False)
+        cache.get('x+1', False)
+        cache.get('x+3', False)  # drops x+2
+        self.assertEqual(cache.info().currsize, 2)
+        self.assertIs(cache.get('x+1', False), first)
+        cache.get('x+2', False)
+        self.assertEqual(cache.info(), calc.CacheInfo(hits=2, misses=4, maxsize=2, currsize=2))
@@ -13,12 +13,16 @@ Main module which shows problems (of "capa" type).
 This is used by capa_module.
 '''
 
+from collections import namedtuple
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
+import threading
 
 from lxml import etree
+from lru import LRUCache
 from xml.sax.saxutils import unescape
 from copy import deepcopy
 
@@ -63,6 +67,98 @@ html_problem_semantics = [
 
 log = logging.getLogger(__name__)
 
+#-----------------------------------------------------------------------------
+# cache of parsed problems
+
+# The seed-independent part of a parsed problem: the problem text, its XML
+# tree with includes resolved and IDs assigned, and for each response in the
+# tree, (response element, Response class, input field elements).
+ProblemTemplate = namedtuple('ProblemTemplate', 'problem_text, tree, responses, size')
+
+
+class ProblemTemplateCache(object):
+    """
+    A per-process LRU cache of ProblemTemplates, keyed by problem id and a hash
+    of the problem text, so that each LoncapaProblem only has to copy the tree.
+
+    Its total size is bounded by `max_size`, in characters of serialized XML.
+    Templates can also be dropped per group (e.g. per course) when the
+    problems change.
+    """
+    def __init__(self, max_size=32 * 1024 * 1024):
+        self.max_size = max_size
+        # key -> (template, group)
+        self._templates = LRUCache(max_size, sizeof=lambda entry: entry[0].size, on_evict=self._forget)
+        self._groups = {}
+        # Guards _groups. Reentrant, because evictions caused by set() call _forget.
+        self._lock = threading.RLock()
+
+    @property
+    def size(self):
+        """The total size of the cached templates"""
+        return self._templates.size
+
+    @property
+    def hits(self):
+        """The number of lookups that found a template"""
+        return self._templates.hits
+
+    @property
+    def misses(self):
+        """The number of lookups that didn't find a template"""
+        return self._templates.misses
+
+    def get(self, key):
+        """
+        Return the template for `key`, or None.
+        """
+        entry = self._templates.get(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key, template, group=None):
+        """
+        Save `template` for `key`, evicting the least recently used templates
+        if the cache gets too big.
+        """
+        with self._lock:
+            old_entry = self._templates.pop(key)
+            if old_entry is not None:
+                self._forget(key, old_entry)
+            if self._templates.set(key, (template, group)):
+                self._groups.setdefault(group, set()).add(key)
+
+    def invalidate_group(self, group):
+        """
+        Drop all the templates saved with `group`.
+        """
+        with self._lock:
+            for key in self._groups.pop(group, ()):
+                self._templates.pop(key)
+
+    def clear(self):
+        """
+        Drop all the templates, and reset the counters.
+        """
+        with self._lock:
+            self._templates.clear()
+            self._groups.clear()
+
+    def _forget(self, key, entry):
+        """
+        Remove `key` from the group of its dropped (template, group) `entry`
+        """
+        group = entry[1]
+        with self._lock:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+
+TEMPLATE_CACHE = ProblemTemplateCache()
+
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -72,7 +168,7 @@ class LoncapaProblem(object):
     Main class for capa Problems.
     '''
 
-    def __init__(self, problem_text, id, state=None, seed=None, system=None):
+    def __init__(self, problem_text, id, state=None, seed=None, system=None, cache_group=None):
         '''
         Initializes capa Problem.
 
@@ -89,6 +185,9 @@ class LoncapaProblem(object):
                                 - 'input_state' - (dict) maps input_id to a dictionary that holds the state for that input
          - system       (ModuleSystem): ModuleSystem instance which provides OS,
                                         rendering, and user context
+         - cache_group  (string): group (e.g. course) of the problem in TEMPLATE_CACHE,
+                                  so that its parsed template can be invalidated with
+                                  the rest of the group
 
         '''
 
@@ -113,25 +212,16 @@ class LoncapaProblem(object):
         self.done = state.get('done', False)
         self.input_state = state.get('input_state', {})
 
-        # Convert startouttext and endouttext to proper <text></text>
-        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
-        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
-        self.problem_text = problem_text
-
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # Parse the problem, or copy its cached parse. This doesn't depend on the seed.
+        responses = self._load_template(problem_text, cache_group)
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        # Create the dict (self.responders) of Response instances for each question
+        # in the problem. The dict has keys = xml subtree of Response, values = Response
+        # instance. Responses may perform some in-place transformations of the tree.
+        self._preprocess_problem(self.tree, responses)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -406,12 +496,80 @@ class LoncapaProblem(object):
 
     # ======= Private Methods Below ========
 
-    def _process_includes(self):
+    def _load_template(self, problem_text, cache_group):
+        '''
+        Set self.problem_text and self.tree to a fresh copy of the problem's
+        template from TEMPLATE_CACHE, parsing the problem if it isn't cached.
+
+        Problems with <include file="..."> tags aren't cached, since the key
+        only covers the problem text, and not the files it includes.
+
+        Returns the list of (response element, Response class, input field
+        elements) in self.tree.
+        '''
+        if '<include' in problem_text:
+            template = self._parse_template(problem_text)
+        else:
+            template = self._cached_template(problem_text, cache_group)
+
+        self.problem_text = template.problem_text
+        self.tree = deepcopy(template.tree)
+
+        # Find the copies of the template's elements in self.tree
+        wanted = set()
+        for response, _, inputfields in template.responses:
+            wanted.add(response)
+            wanted.update(inputfields)
+        copies = dict(
+            (element, copy) for element, copy in zip(template.tree.iter(), self.tree.iter())
+            if element in wanted
+        )
+        return [
+            (copies[response], response_class, [copies[entry] for entry in inputfields])
+            for response, response_class, inputfields in template.responses
+        ]
+
+    def _cached_template(self, problem_text, cache_group):
+        '''
+        Return the ProblemTemplate of the problem from TEMPLATE_CACHE, parsing
+        and caching it if it isn't there.
+        '''
+        if isinstance(problem_text, unicode):
+            content_hash = hashlib.sha1(problem_text.encode('utf-8')).hexdigest()
+        else:
+            content_hash = hashlib.sha1(problem_text).hexdigest()
+        key = (self.problem_id, content_hash)
+        template = TEMPLATE_CACHE.get(key)
+        if template is None:
+            template = self._parse_template(problem_text)
+            TEMPLATE_CACHE.set(key, template, cache_group)
+        return template
+
+    def _parse_template(self, problem_text):
+        '''
+        Parse the problem into a ProblemTemplate.
+        '''
+        # Convert startouttext and endouttext to proper <text></text>
+        problem_text = re.sub(r"startouttext\s*/", "text", problem_text)
+        problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
+
+        # parse problem XML file into an element tree
+        tree = etree.XML(problem_text)
+
+        # handle any <include file="foo"> tags
+        self._process_includes(tree)
+
+        # Pre-parse the XML tree: modifies it to add ID's to responses and inputs
+        responses = self._annotate_problem(tree)
+
+        return ProblemTemplate(problem_text, tree, responses, len(etree.tostring(tree)))
+
+    def _process_includes(self, tree):
         '''
         Handle any <include file="foo"> tags by reading in the specified file and inserting it
         into our XML tree.  Fail gracefully if debugging.
         '''
-        includes = self.tree.findall('.//include')
+        includes = tree.findall('.//include')
         for inc in includes:
             filename = inc.get('file')
             if filename is not None:
@@ -632,19 +790,17 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree):  # private
+    def _annotate_problem(self, tree):  # private
         '''
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
         Annoted correctness and value
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Returns a list of (response element, Response class, input field elements)
         '''
         response_id = 1
-        self.responders = {}
+        responses = []
         for response in tree.xpath('//' + "|//".join(response_tag_dict)):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -665,9 +821,23 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            responses.append((response, response_tag_dict[response.tag], inputfields))
+
+        return responses
+
+    def _preprocess_problem(self, tree, responses):  # private
+        '''
+        Create capa Response instances for each responsetype and save as self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+
+        responses: list of (response element, Response class, input field elements)
+            in `tree`, as returned by _annotate_problem
+        '''
+        self.responders = {}
+        for response, response_class, inputfields in responses:
             # instantiate capa Response
-            responder = response_tag_dict[response.tag](response, inputfields,
-                                                        self.context, self.system)
+            responder = response_class(response, inputfields, self.context, self.system)
             # save in list in self
             self.responders[response] = responder
 
@@ -1785,6 +1785,68 @@ class FormulaResponse(LoncapaResponse):
                            samples.split('@')[1].split('#')[0].split(':')))
 
         ranges = dict(zip(variables, sranges))
+
+        correctness = self.check_formula_vectorized(expected, given, ranges, numsamples)
+        if correctness is None:
+            correctness = self.check_formula_sampled(expected, given, ranges, numsamples)
+        return correctness
+
+    def check_formula_vectorized(self, expected, given, ranges, numsamples):
+        """
+        Compare the instructor's and the student's formulas on all the samples
+        at once: each formula is parsed a single time, and evaluated on numpy
+        arrays holding the samples of each variable.
+
+        Return "correct" or "incorrect", or None if this couldn't be decided
+        here, because evaluation failed or gave an infinite or NaN value for
+        some sample. `check_formula_sampled` then has to check the formulas
+        one sample at a time, which gives the precise errors and handles
+        functions that don't work on arrays (e.g. factorial).
+        """
+        instructor_variables = self.strip_dict(dict(self.context))
+        student_variables = {}
+        for var in ranges:
+            values = numpy.array([random.uniform(*ranges[var]) for _ in range(numsamples)])
+            instructor_variables[str(var)] = values
+            student_variables[str(var)] = values
+
+        try:
+            with numpy.errstate(all='ignore'):
+                instructor_result = evaluator(
+                    instructor_variables, {},
+                    expected, case_sensitive=self.case_sensitive
+                )
+                student_result = evaluator(
+                    student_variables, {},
+                    given, case_sensitive=self.case_sensitive
+                )
+                instructor_result, student_result = numpy.broadcast_arrays(
+                    numpy.asarray(instructor_result, dtype=complex),
+                    numpy.asarray(student_result, dtype=complex)
+                )
+                if not (numpy.isfinite(instructor_result).all() and numpy.isfinite(student_result).all()):
+                    return None
+
+                # compare_with_tolerance, element-wise (no infinities here)
+                if self.tolerance.endswith('%'):
+                    tolerance = evaluator({}, {}, self.tolerance[:-1]) * 0.01
+                    tolerance = tolerance * numpy.maximum(abs(student_result), abs(instructor_result))
+                else:
+                    tolerance = evaluator({}, {}, self.tolerance)
+                correct = abs(student_result - instructor_result) <= tolerance
+        except Exception:
+            return None
+
+        if correct.all():
+            return "correct"
+        return "incorrect"
+
+    def check_formula_sampled(self, expected, given, ranges, numsamples):
+        """
+        Compare the instructor's and the student's formulas one sample at a
+        time, raising a StudentInputError if the student's formula can't be
+        evaluated.
+        """
         for _ in range(numsamples):
             instructor_variables = self.strip_dict(dict(self.context))
             student_variables = {}
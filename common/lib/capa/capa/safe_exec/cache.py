@@ -0,0 +1,87 @@
+"""A cache for the results of safe_exec, with a local tier in front of a shared cache."""
+
+import json
+import time
+
+from lru import LRUCache
+from statsd import statsd
+
+
+class SafeExecCache(object):
+    """
+    A cache for safe_exec results, with .get(key) and .set(key, value) like
+    the caches that safe_exec accepts.
+
+    Results are looked up in a bounded, in-process LRU tier first, then in
+    `shared_cache` (e.g. the django cache, shared by all the servers), if
+    any. Results bigger than `max_entry_size` characters of JSON aren't
+    cached at all; the local tier holds at most `local_max_size` characters.
+
+    The local tier stores results as JSON, so that each hit returns a fresh
+    copy that the caller is free to modify.
+
+    Sends statsd counters for hits (tagged with the tier), misses and skipped
+    oversized results, and the time it takes to serialize results.
+    """
+    def __init__(self, shared_cache=None, local_max_size=64 * 1024 * 1024, max_entry_size=512 * 1024):
+        self.shared_cache = shared_cache
+        self.local_max_size = local_max_size
+        self.max_entry_size = max_entry_size
+        self._local = LRUCache(local_max_size, sizeof=len)
+
+    @property
+    def local_size(self):
+        """The number of characters of JSON in the local tier"""
+        return self._local.size
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None.
+        """
+        data = self._local.get(key)
+        if data is not None:
+            statsd.increment('capa.safe_exec.cache.hit', tags=['tier:local'])
+            return json.loads(data)
+
+        value = None
+        if self.shared_cache is not None:
+            value = self.shared_cache.get(key)
+        if value is None:
+            statsd.increment('capa.safe_exec.cache.miss')
+            return None
+
+        statsd.increment('capa.safe_exec.cache.hit', tags=['tier:shared'])
+        data = self.serialize(value)
+        if len(data) <= self.max_entry_size:
+            self._local.set(key, data)
+        return value
+
+    def set(self, key, value, timeout=None):
+        """
+        Cache `value`, a JSON-safe object, for `key`, unless it is too big.
+        """
+        data = self.serialize(value)
+        if len(data) > self.max_entry_size:
+            statsd.increment('capa.safe_exec.cache.oversize')
+            return
+        self._local.set(key, data)
+        if self.shared_cache is not None:
+            if timeout is None:
+                self.shared_cache.set(key, value)
+            else:
+                self.shared_cache.set(key, value, timeout)
+
+    def clear_local(self):
+        """
+        Empty the local tier.
+        """
+        self._local.clear()
+
+    def serialize(self, value):
+        """
+        Return `value` as JSON, timing it.
+        """
+        start = time.time()
+        data = json.dumps(value)
+        statsd.timing('capa.safe_exec.cache.serialize_time', time.time() - start)
+        return data
@@ -0,0 +1,374 @@
+"""
+A pool of warm sandboxed Python processes for safe_exec.
+
+Starting a sandboxed Python for every execution, and importing numpy and scipy
+in it again, is most of the cost of safe_exec. Instead, a pool worker is a
+long-lived Python process, started with the same command line as CodeJail's
+sandbox (so under the same user and AppArmor profile), which imports the
+modules problems use once.  It never runs problem code itself: for each
+execution it forks a child, which sets the resource limits on itself, runs the
+code, and sends back the resulting globals.  So executions can't see or
+affect each other, or the worker.
+
+Workers are replaced after `max_uses` executions, or as soon as anything goes
+wrong with them.
+
+For development and tests, `LOCAL_COMMAND` runs the workers with the current
+Python, without any sandboxing.
+"""
+
+import json
+import logging
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from codejail.safe_exec import json_safe, SafeExecException
+
+log = logging.getLogger(__name__)
+
+# Run the pool workers without a sandbox, like codejail's not_safe_exec.
+LOCAL_COMMAND = [sys.executable, '-E', '-B']
+
+
+def sandbox_command(python_bin, user=None):
+    """
+    Return the command line that CodeJail uses to run the sandboxed Python
+    `python_bin` as `user`.
+    """
+    command = []
+    if user:
+        command.extend(['sudo', '-u', user])
+    command.extend([python_bin, '-E', '-B'])
+    return command
+
+
+# The code of a pool worker.  Its argv[1] is a JSON dict of:
+#   modules: the modules to import up front
+#   limits: the CodeJail limits, CPU and REALTIME in seconds and VMEM in bytes
+# It then reads one execution per line on stdin, a JSON dict of `code` and
+# `globals`, and writes one result per line on stdout, a JSON dict of either
+# the JSON-safe resulting `globals`, or an `error` message.
+WORKER_CODE = r'''
+import json
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+config = json.loads(sys.argv[1])
+for modname in config['modules']:
+    try:
+        __import__(modname)
+    except Exception:
+        pass
+limits = config['limits']
+
+# Keep stdin and stdout for talking to the pool, and point the executed code's
+# stdout at stderr.
+requests = os.fdopen(os.dup(0), 'r')
+results = os.fdopen(os.dup(1), 'w')
+os.dup2(2, 1)
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+
+
+def json_safe(d):
+    ok_types = (type(None), int, long, float, str, unicode, list, tuple, dict)
+    safe = {}
+    for key, value in d.iteritems():
+        if key == '__builtins__' or not isinstance(value, ok_types):
+            continue
+        try:
+            safe[key] = json.loads(json.dumps(value))
+        except Exception:
+            continue
+    return safe
+
+
+def set_limits():
+    if limits.get('CPU'):
+        cpu = int(resource.getrusage(resource.RUSAGE_SELF).ru_utime) + limits['CPU']
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    if limits.get('VMEM'):
+        # The worker's modules are already mapped: only limit what the code adds.
+        pages = int(open('/proc/self/statm').read().split()[0])
+        vmem = pages * resource.getpagesize() + limits['VMEM']
+        resource.setrlimit(resource.RLIMIT_AS, (vmem, vmem))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+
+
+def run_in_child(job, result_fd):
+    requests.close()
+    results.close()
+    output = os.fdopen(result_fd, 'w')
+    try:
+        set_limits()
+        globals_dict = job['globals']
+        exec compile(job['code'], '<jailed code>', 'exec') in globals_dict
+        result = {'globals': json_safe(globals_dict)}
+    except BaseException:
+        result = {'error': traceback.format_exc()}
+    output.write(json.dumps(result))
+    output.close()
+    os._exit(0)
+
+
+def execute(job):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        run_in_child(job, write_fd)
+    os.close(write_fd)
+
+    deadline = time.time() + limits['REALTIME'] if limits.get('REALTIME') else None
+    chunks = []
+    while True:
+        timeout = max(deadline - time.time(), 0) if deadline else None
+        ready, _, _ = select.select([read_fd], [], [], timeout)
+        if not ready:
+            os.kill(pid, signal.SIGKILL)
+            break
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+
+    try:
+        return json.loads("".join(chunks))
+    except ValueError:
+        if os.WIFSIGNALED(status):
+            return {'error': 'Killed by signal %d' % os.WTERMSIG(status)}
+        return {'error': 'Exited with status %d' % os.WEXITSTATUS(status)}
+
+
+results.write('ready\n')
+results.flush()
+while True:
+    line = requests.readline()
+    if not line:
+        break
+    results.write(json.dumps(execute(json.loads(line))) + '\n')
+    results.flush()
+'''
+
+
+class WorkerError(Exception):
+    """
+    A pool worker died, or didn't answer properly.
+    """
+    pass
+
+
+class SandboxWorker(object):
+    """
+    One warm Python process, running WORKER_CODE.
+    """
+    def __init__(self, command, modules, limits, timeout):
+        config = json.dumps({'modules': modules, 'limits': limits})
+        with open(os.devnull, 'w') as devnull:
+            self.process = subprocess.Popen(
+                command + ['-c', WORKER_CODE, config],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                cwd=tempfile.gettempdir(),
+                env={},
+            )
+        self.timeout = timeout
+        self.uses = 0
+        self._buffer = ""
+        if self._read_line(timeout) != 'ready':
+            self.kill()
+            raise WorkerError("Sandbox worker didn't start")
+
+    def execute(self, code, globals_dict):
+        """
+        Run `code` with the JSON-safe `globals_dict`, and return the result
+        dict: either `globals` or an `error`.
+        """
+        self.uses += 1
+        try:
+            self.process.stdin.write(json.dumps({'code': code, 'globals': globals_dict}) + '\n')
+            self.process.stdin.flush()
+        except IOError as err:
+            raise WorkerError("Couldn't send code to the sandbox worker: %s" % err)
+        try:
+            return json.loads(self._read_line(self.timeout))
+        except ValueError:
+            raise WorkerError("Bad result from the sandbox worker")
+
+    def kill(self):
+        """
+        Stop the worker.
+        """
+        try:
+            self.process.kill()
+            self.process.wait()
+        except OSError:
+            pass
+
+    def _read_line(self, timeout):
+        """
+        Read one line from the worker, waiting for at most `timeout` seconds.
+        """
+        deadline = time.time() + timeout
+        stdout = self.process.stdout.fileno()
+        while '\n' not in self._buffer:
+            ready, _, _ = select.select([stdout], [], [], max(deadline - time.time(), 0))
+            if not ready:
+                raise WorkerError("Timed out waiting for the sandbox worker")
+            chunk = os.read(stdout, 65536)
+            if not chunk:
+                raise WorkerError("The sandbox worker died")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split('\n', 1)
+        return line
+
+
+class SandboxPool(object):
+    """
+    Up to `size` SandboxWorkers, each running `command`, which have imported
+    `modules` up front.
+
+    `limits` are CodeJail's limits: CPU and REALTIME seconds, and VMEM bytes,
+    for each execution.  `timeout` is how long to wait for a worker to start or
+    to answer before giving up on it.
+    """
+    def __init__(self, command, modules=(), size=4, max_uses=100, limits=None, timeout=30):
+        self.command = list(command)
+        self.modules = list(modules)
+        self.size = size
+        self.max_uses = max_uses
+        self.limits = dict(limits or {})
+        self.timeout = timeout + (self.limits.get('REALTIME') or 0)
+        self._idle = []
+        self._count = 0
+        # Notified when a worker becomes idle, or is retired
+        self._changed = threading.Condition()
+        self._pid = os.getpid()
+
+    def start(self):
+        """
+        Start all the workers now, rather than on demand.
+        """
+        while True:
+            with self._changed:
+                if self._count >= self.size:
+                    return
+                self._count += 1
+            try:
+                worker = self._new_worker()
+            except Exception:
+                self._uncount()
+                raise
+            self._release(worker)
+
+    def safe_exec(self, code, globals_dict, python_path=None, slug=None):
+        """
+        Execute `code` with `globals_dict` in a pool worker, like
+        codejail.safe_exec.safe_exec: the JSON-safe part of the resulting
+        globals is put back into `globals_dict`, and a SafeExecException is
+        raised if the code fails.
+
+        `python_path` isn't supported, since the workers can't read the
+        course's files: use codejail.safe_exec.safe_exec for that.
+        """
+        if python_path:
+            raise ValueError("SandboxPool can't run code with a python_path")
+        if slug:
+            log.debug("Executing jailed code %s in a pool worker", slug)
+
+        globals_json = json_safe(globals_dict)
+        worker = self._get_worker()
+        try:
+            result = worker.execute(code, globals_json)
+        except WorkerError as err:
+            self._retire(worker)
+            raise SafeExecException("Couldn't execute jailed code: %s" % err)
+        except:
+            # The worker may be in the middle of an execution: don't reuse it.
+            self._retire(worker)
+            raise
+
+        if worker.uses >= self.max_uses:
+            self._retire(worker)
+        else:
+            self._release(worker)
+
+        if 'error' in result:
+            raise SafeExecException("Couldn't execute jailed code: %s" % result['error'])
+        globals_dict.update(result['globals'])
+
+    def shutdown(self):
+        """
+        Stop all the idle workers.
+        """
+        with self._changed:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._retire(worker)
+
+    def _get_worker(self):
+        """
+        Return an idle worker, starting one if there are fewer than `size`,
+        or else waiting for one to become idle or be retired.
+        """
+        with self._changed:
+            if os.getpid() != self._pid:
+                # This process was forked: the workers belong to the parent.
+                self._idle = []
+                self._count = 0
+                self._pid = os.getpid()
+            while not self._idle and self._count >= self.size:
+                self._changed.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._count += 1
+        try:
+            return self._new_worker()
+        except Exception:
+            self._uncount()
+            raise
+
+    def _new_worker(self):
+        """
+        Start a worker.
+        """
+        return SandboxWorker(self.command, self.modules, self.limits, self.timeout)
+
+    def _release(self, worker):
+        """
+        Make `worker` available to other executions.
+        """
+        with self._changed:
+            self._idle.append(worker)
+            self._changed.notify()
+
+    def _retire(self, worker):
+        """
+        Stop `worker`, making room for a new one.
+        """
+        try:
+            worker.kill()
+        finally:
+            self._uncount()
+
+    def _uncount(self):
+        """
+        Forget a worker that was counted, waking a thread that waits for one.
+        """
+        with self._changed:
+            self._count -= 1
+            self._changed.notify()
@@ -4,9 +4,12 @@ from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from .pool import SandboxPool
 from statsd import statsd
 
 import hashlib
+import json
+import time
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -46,6 +49,28 @@ for name, modname in ASSUMED_IMPORTS:
 
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
+# The pool of warm sandbox processes to run code in, if configured.
+POOL = None
+
+
+def configure_pool(command, size, max_uses=100, limits=None):
+    """
+    Run sandboxed code in a SandboxPool of up to `size` workers, which import
+    the ASSUMED_IMPORTS up front, and are replaced after `max_uses`
+    executions.
+
+    `command` runs the sandboxed Python: see `pool.sandbox_command`, or
+    `pool.LOCAL_COMMAND` to run without a sandbox. `limits` are CodeJail's
+    limits. A `size` of 0 turns the pool off.
+    """
+    global POOL  # pylint: disable=W0603
+    if POOL is not None:
+        POOL.shutdown()
+    POOL = None
+    if size:
+        modules = [modname for _, modname in ASSUMED_IMPORTS]
+        POOL = SandboxPool(command, modules=modules, size=size, max_uses=max_uses, limits=limits)
+
 
 def update_hash(hasher, obj):
     """
@@ -70,6 +95,23 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+def cache_key(code, globals_dict, random_seed):
+    """
+    Return the key for caching the execution of `code` with `globals_dict` and
+    `random_seed`.
+
+    The JSON-safe part of the globals is serialized with sorted keys, which
+    canonicalizes it at every level like `update_hash` would, but in C.
+    """
+    start = time.time()
+    safe_globals = json_safe(globals_dict)
+    md5er = hashlib.md5()
+    md5er.update(repr(code))
+    md5er.update(json.dumps(safe_globals, sort_keys=True))
+    statsd.timing('capa.safe_exec.cache.key_time', time.time() - start)
+    return "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+
+
 @statsd.timed('capa.safe_exec.time')
 def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None, slug=None, unsafely=False):
     """
@@ -83,9 +125,9 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
 
     `python_path` is a list of directories to add to the Python path before execution.
 
-    `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
-    to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    `cache` is an object with .get(key) and .set(key, value) methods, such as a
+    `SafeExecCache`.  It will be used to cache the execution, taking into account the
+    code, the values of the globals, and the random seed.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
@@ -95,11 +137,7 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
     """
     # Check the cache for a previous result.
     if cache:
-        safe_globals = json_safe(globals_dict)
-        md5er = hashlib.md5()
-        md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
-        key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+        key = cache_key(code, globals_dict, random_seed)
         cached = cache.get(key)
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
@@ -113,9 +151,12 @@ def safe_exec(code, globals_dict, random_seed=None, python_path=None, cache=None
     # Create the complete code we'll run.
     code_prolog = CODE_PROLOG % random_seed
 
-    # Decide which code executor to use.
+    # Decide which code executor to use.  The pool workers can't read the
+    # course's files, so code that needs them is run by codejail.
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif POOL is not None and not python_path:
+        exec_fn = POOL.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
@@ -0,0 +1,115 @@
+"""Test pool.py, with workers that run without a sandbox."""
+
+import threading
+import unittest
+
+from codejail.safe_exec import SafeExecException
+from mock import patch
+
+from capa.safe_exec import safe_exec, configure_pool, LOCAL_COMMAND
+from capa.safe_exec.pool import SandboxPool
+
+
+class TestSandboxPool(unittest.TestCase):
+    """Test running code in pool workers."""
+
+    def setUp(self):
+        self.pool = SandboxPool(LOCAL_COMMAND, modules=['math'], size=2, max_uses=3, limits={'REALTIME': 2})
+        self.addCleanup(self.pool.shutdown)
+
+    def test_set_values(self):
+        g = {'x': 17}
+        self.pool.safe_exec("a = x + 1\nb = 'hello'", g)
+        self.assertEqual(g, {'x': 17, 'a': 18, 'b': 'hello'})
+
+    def test_raising_exceptions(self):
+        with self.assertRaisesRegexp(SafeExecException, "ZeroDivisionError"):
+            self.pool.safe_exec("1/0", {})
+
+        # The worker is still fine.
+        g = {}
+        self.pool.safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+
+    def test_executions_are_isolated(self):
+        g = {}
+        self.pool.safe_exec("import math\nmath.pi = 3\na = math.pi", g)
+        self.assertEqual(g['a'], 3)
+        self.pool.safe_exec("import math\na = math.pi", g)
+        self.assertAlmostEqual(g['a'], 3.14159, places=5)
+
+    def test_realtime_limit(self):
+        with self.assertRaisesRegexp(SafeExecException, "Killed"):
+            self.pool.safe_exec("import time\ntime.sleep(5)", {})
+
+    def test_workers_are_reused_then_replaced(self):
+        pids = []
+        for _ in range(4):
+            g = {}
+            self.pool.safe_exec("import os\nppid = os.getppid()", g)
+            pids.append(g['ppid'])
+        self.assertEqual(len(set(pids[:3])), 1)
+        self.assertNotEqual(pids[3], pids[0])
+
+    def test_waiting_for_retired_workers(self):
+        # With one worker that is retired after each use, waiting executions
+        # have to be given the room it leaves.
+        pool = SandboxPool(LOCAL_COMMAND, size=1, max_uses=1)
+        self.addCleanup(pool.shutdown)
+        results = []
+
+        def run(value):
+            g = {'x': value}
+            pool.safe_exec("import time\ntime.sleep(0.1)\na = x", g)
+            results.append(g['a'])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertEqual(sorted(results), [0, 1, 2])
+
+    def test_worker_retired_on_other_errors(self):
+        pool = SandboxPool(LOCAL_COMMAND, size=1)
+        self.addCleanup(pool.shutdown)
+        pool.safe_exec("a = 1", {})
+        ((worker,),) = [pool._idle]  # pylint: disable=W0212
+        with patch.object(worker, 'execute', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                pool.safe_exec("a = 1", {})
+
+        # The room is given to a new worker.
+        g = {}
+        pool.safe_exec("a = 1", g)
+        self.assertEqual(g['a'], 1)
+        self.assertIsNot(pool._idle[0], worker)  # pylint: disable=W0212
+
+    def test_no_python_path(self):
+        with self.assertRaises(ValueError):
+            self.pool.safe_exec("a = 1", {}, python_path=["/tmp"])
+
+
+class TestSafeExecWithPool(unittest.TestCase):
+    """Test that capa's safe_exec uses the configured pool."""
+
+    def setUp(self):
+        configure_pool(LOCAL_COMMAND, size=1)
+        self.addCleanup(configure_pool, None, size=0)
+
+    def test_division(self):
+        g = {}
+        safe_exec("a = 1/2", g)
+        self.assertEqual(g['a'], 0.5)
+
+    def test_random_seeding(self):
+        g = {}
+        safe_exec("rnums = [random.randint(0, 999) for _ in xrange(100)]", g, random_seed=17)
+        first = g['rnums']
+        safe_exec("rnums = [random.randint(0, 999) for _ in xrange(100)]", g, random_seed=17)
+        self.assertEqual(g['rnums'], first)
+
+    def test_assumed_imports(self):
+        g = {}
+        safe_exec("a = int(math.pi)", g)
+        self.assertEqual(g['a'], 3)
@@ -9,7 +9,7 @@ import unittest
 
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import safe_exec, update_hash, SafeExecCache
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -177,6 +177,61 @@ class TestSafeExecCaching(unittest.TestCase):
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
 
+class TestSafeExecCache(unittest.TestCase):
+    """Test the two tiers of SafeExecCache."""
+
+    def test_local_then_shared(self):
+        shared = {}
+        cache = SafeExecCache(DictCache(shared))
+        cache.set("key", (None, {'a': [1, 2]}))
+        self.assertEqual(shared["key"], (None, {'a': [1, 2]}))
+
+        # Found in the local tier: changing the shared cache doesn't matter.
+        shared["key"] = (None, {'a': 17})
+        emsg, result = cache.get("key")
+        self.assertEqual((emsg, result), (None, {'a': [1, 2]}))
+        # Each hit is a fresh copy
+        result['a'].append(3)
+        self.assertEqual(cache.get("key")[1], {'a': [1, 2]})
+
+        # Another process only has the shared cache.
+        other_cache = SafeExecCache(DictCache(shared))
+        self.assertEqual(other_cache.get("key"), (None, {'a': 17}))
+        self.assertIsNone(other_cache.get("another key"))
+
+    def test_caching_safe_exec(self):
+        shared = {}
+        cache = SafeExecCache(DictCache(shared))
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=cache)
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(len(shared), 1)
+
+        shared.clear()
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=cache)
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(len(shared), 0)
+
+    def test_max_entry_size(self):
+        shared = {}
+        cache = SafeExecCache(DictCache(shared), max_entry_size=100)
+        cache.set("small", (None, {'a': 1}))
+        cache.set("big", (None, {'a': "x" * 100}))
+        self.assertEqual(shared.keys(), ["small"])
+        self.assertIsNone(cache.get("big"))
+
+    def test_local_max_size(self):
+        cache = SafeExecCache(local_max_size=60)
+        for key in ["one", "two", "three"]:
+            cache.set(key, (None, {'a': "x" * 10}))
+        # Each entry is 27 characters of JSON, so only two fit.
+        self.assertIsNone(cache.get("one"))
+        self.assertIsNotNone(cache.get("two"))
+        self.assertIsNotNone(cache.get("three"))
+        self.assertEqual(cache.local_size, 54)
+
+
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
 
@@ -0,0 +1,95 @@
+"""
+Tests for the cache of parsed problems in capa_problem
+"""
+import unittest
+import textwrap
+
+from fs.memoryfs import MemoryFS
+
+from capa.capa_problem import LoncapaProblem, ProblemTemplateCache, TEMPLATE_CACHE
+from . import test_system
+
+
+class ProblemTemplateCacheTest(unittest.TestCase):
+    """
+    Test that problems are only parsed once, and that each LoncapaProblem
+    gets its own copy of the parsed problem.
+    """
+    xml = textwrap.dedent("""
+        <problem>
+            <stringresponse answer="Michigan">
+                <textline size="20"/>
+            </stringresponse>
+            <stringresponse answer="Ohio">
+                <textline size="20"/>
+            </stringresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        TEMPLATE_CACHE.clear()
+
+    def new_problem(self, xml=None, problem_id='template_test', cache_group=None):
+        """
+        Return a LoncapaProblem for `xml`
+        """
+        return LoncapaProblem(xml or self.xml, id=problem_id, seed=723, system=test_system(),
+                              cache_group=cache_group)
+
+    def test_parsed_once(self):
+        first = self.new_problem()
+        second = self.new_problem()
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (1, 1))
+
+        # Each problem has its own tree and responders
+        self.assertIsNot(first.tree, second.tree)
+        self.assertEqual(first.get_answer_ids(), second.get_answer_ids())
+        for responder in second.responders:
+            self.assertIs(responder.getroottree().getroot(), second.tree)
+
+        correct_map = second.grade_answers({'template_test_2_1': 'Michigan', 'template_test_3_1': 'Ohio'})
+        self.assertEqual(correct_map.get_correctness('template_test_3_1'), 'correct')
+        self.assertEqual(first.get_score()['score'], 0)
+
+        # Other ids and other contents are parsed separately
+        self.new_problem(problem_id='other_id')
+        self.new_problem(self.xml.replace('Ohio', 'Texas'))
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (1, 3))
+
+    def test_invalidate_group(self):
+        self.new_problem(cache_group='org/course')
+        self.new_problem(problem_id='other_id', cache_group='org/other_course')
+        TEMPLATE_CACHE.invalidate_group('org/course')
+
+        self.new_problem(cache_group='org/course')
+        self.new_problem(problem_id='other_id', cache_group='org/other_course')
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (1, 3))
+
+    def test_max_size(self):
+        template = self.new_problem()._cached_template(self.xml, None)  # pylint: disable=W0212
+
+        cache = ProblemTemplateCache(max_size=2 * template.size)
+        cache.set('a', template, 'org/course')
+        cache.set('b', template, 'org/course')
+        cache.set('c', template, 'org/course')
+        self.assertEqual(cache.size, 2 * template.size)
+        self.assertIsNone(cache.get('a'))
+        self.assertIs(cache.get('c'), template)
+
+        # Dropping the group drops the templates that are left in it
+        cache.invalidate_group('org/course')
+        self.assertEqual(cache.size, 0)
+
+    def test_includes_not_cached(self):
+        system = test_system()
+        system.filestore = MemoryFS()
+        system.filestore.setcontents('answer.xml', '<stringresponse answer="Michigan"><textline/></stringresponse>')
+        xml = '<problem><include file="answer.xml"/></problem>'
+
+        first = LoncapaProblem(xml, id='template_test', seed=723, system=system)
+        system.filestore.setcontents('answer.xml', '<stringresponse answer="Ohio"><textline/></stringresponse>')
+        second = LoncapaProblem(xml, id='template_test', seed=723, system=system)
+
+        self.assertEqual(first.get_question_answers(), {'template_test_2_1': 'Michigan'})
+        self.assertEqual(second.get_question_answers(), {'template_test_2_1': 'Ohio'})
+        self.assertEqual((TEMPLATE_CACHE.hits, TEMPLATE_CACHE.misses), (0, 0))
@@ -496,6 +496,31 @@ class FormulaResponseTest(ResponseTest):
         input_dict = {'1_2_1': '1/0'}
         self.assertRaises(StudentInputError, problem.grade_answers, input_dict)
 
+    def test_raises_errors_for_all_samples(self):
+        """
+        Errors that only show up when the samples are checked one at a time
+        are still reported.
+        """
+        sample_dict = {'x': (1.5, 2.5)}
+        problem = self.build_problem(sample_dict=sample_dict,
+                                     num_samples=10,
+                                     tolerance="1%",
+                                     answer="x")
+
+        # Unknown variables
+        input_dict = {'1_2_1': 'x + z'}
+        with self.assertRaisesRegexp(StudentInputError, "z not permitted"):
+            problem.grade_answers(input_dict)
+
+        # Factorial of non-integers doesn't work on arrays of samples either
+        input_dict = {'1_2_1': 'fact(x)'}
+        with self.assertRaisesRegexp(StudentInputError, "factorial function not permitted"):
+            problem.grade_answers(input_dict)
+
+        # Numpy gives an inf here, rather than an error
+        input_dict = {'1_2_1': 'x/(x-x)'}
+        self.assertRaises(StudentInputError, problem.grade_answers, input_dict)
+
 
 class StringResponseTest(ResponseTest):
     from capa.tests.response_xml_factory import StringResponseXMLFactory
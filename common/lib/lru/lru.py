@@ -0,0 +1,95 @@
+"""
+A thread-safe, in-process cache that drops the least recently used values
+when the values it holds grow bigger than its maximum size.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A least recently used cache, holding values whose sizes, as measured by
+    `sizeof`, add up to at most `max_size`. By default each value has size 1,
+    so `max_size` is the number of values. Values bigger than `max_size`
+    aren't cached at all, and None can't be cached.
+
+    `on_evict(key, value)`, if given, is called for each value that is dropped
+    to make room for others, once the cache is no longer locked.
+
+    `hits` and `misses` count the lookups with get() since the cache was
+    created or last cleared.
+    """
+    def __init__(self, max_size, sizeof=None, on_evict=None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.on_evict = on_evict
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Return the value for `key`, as the most recently used, or `default`
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Reinsert it as the most recently used.
+            self._entries[key] = entry
+            return entry[0]
+
+    def set(self, key, value):
+        """
+        Save `value` for `key`, dropping the least recently used values to make
+        room for it. Returns whether it was saved.
+        """
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return False
+        evicted = []
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                evicted_key = next(iter(self._entries))
+                evicted.append((evicted_key, self._pop(evicted_key)))
+        if self.on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+        return True
+
+    def pop(self, key, default=None):
+        """
+        Remove the value for `key`, and return it, or `default`
+        """
+        with self._lock:
+            value = self._pop(key)
+        return default if value is None else value
+
+    def clear(self):
+        """
+        Drop all the values, and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+    def _pop(self, key):
+        """
+        Remove the value for `key` and return it, or None. Called with the lock held.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.size -= entry[1]
+        return entry[0]
@@ -0,0 +1,7 @@
+from setuptools import setup
+
+setup(
+    name="lru",
+    version="0.1",
+    py_modules=["lru"],
+)
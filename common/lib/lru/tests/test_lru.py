@@ -0,0 +1,51 @@
+"""
+Tests for the LRUCache
+"""
+import unittest
+
+from lru import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    Test that the least recently used values are dropped first
+    """
+    def test_max_count(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertEqual((2, 3, 1), (len(cache), cache.hits, cache.misses))
+
+    def test_max_size(self):
+        evicted = []
+        cache = LRUCache(10, sizeof=len, on_evict=lambda key, value: evicted.append(key))
+        self.assertTrue(cache.set('a', 'aaaa'))
+        self.assertTrue(cache.set('b', 'bbbb'))
+        self.assertTrue(cache.set('c', 'cccc'))
+        self.assertEqual(['a'], evicted)
+        self.assertEqual(8, cache.size)
+
+        # too big to cache at all
+        self.assertFalse(cache.set('d', 'd' * 11))
+        self.assertEqual(['a'], evicted)
+
+        # replacing a value doesn't count it twice
+        cache.set('b', 'bb')
+        self.assertEqual(6, cache.size)
+        self.assertEqual(['a'], evicted)
+
+    def test_pop_and_clear(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.set('a', 'aaaa')
+        cache.set('b', 'bbbb')
+        self.assertEqual('aaaa', cache.pop('a'))
+        self.assertIsNone(cache.pop('a'))
+        self.assertEqual(4, cache.size)
+        cache.get('b')
+        cache.clear()
+        self.assertEqual((0, 0, 0, 0), (len(cache), cache.size, cache.hits, cache.misses))
@@ -46,6 +46,19 @@ def randomization_bin(seed, problem_id):
     return int(h.hexdigest()[:7], 16) % NUM_RANDOMIZATION_BINS
 
 
+def possible_seeds(rerandomize):
+    """
+    Return the seeds that a problem with this `rerandomize` setting can be
+    given for a student (see CapaModule.choose_new_seed).
+    """
+    if rerandomize == 'never':
+        return [1]
+    elif rerandomize == 'per_student':
+        return range(NUM_RANDOMIZATION_BINS)
+    else:
+        return range(MAX_RANDOMIZATION_BINS)
+
+
 class Randomization(String):
     """
     Define a field to store how to randomize a problem.
@@ -265,6 +278,7 @@ class CapaModule(CapaFields, XModule):
             state=state,
             seed=self.seed,
             system=self.system,
+            cache_group="/".join([self.location.org, self.location.course]),
         )
 
     def get_state_for_lcp(self):
@@ -0,0 +1,107 @@
+"""
+Counts that all students of a module add to, such as the votes of a poll or
+the words of a word cloud.
+
+A runtime can keep these counts in a `content_counters` service (see
+ModuleSystem), so that many students can add to them at the same time without
+overwriting each other's changes. The service has these methods:
+
+    increment(definition_id, field_name, deltas) - adds the dict of deltas to
+        the counts of their keys, and returns the new counts of those keys
+    counts(definition_id, field_name, keys=None) - returns a dict of the
+        counts of keys, or of all keys if keys is None
+    top(definition_id, field_name, amount) - returns a dict of the `amount`
+        highest (non-zero) counts, and the total of all counts. These may be a
+        few seconds old.
+    seed(definition_id, field_name, counts) - adds the dict of counts, unless
+        counts were seeded for the field already
+
+Without a service, the counts are kept in a Scope.content Dict field of the
+module, which is read, changed and written back as a whole.
+"""
+
+
+class FieldCounters(object):
+    """
+    Counts kept in the Dict field `field_name` of `module`
+    """
+    def __init__(self, module, field_name):
+        self.module = module
+        self.field_name = field_name
+
+    def _field(self):
+        """The dict of counts in the field"""
+        return getattr(self.module, self.field_name) or {}
+
+    def increment(self, deltas):
+        """
+        Add the dict of deltas to the counts of their keys, and return the new
+        counts of those keys
+        """
+        # FIXME: fix this, when xblock will support mutable types.
+        # Now we use this hack.
+        counts = self._field()
+        for key, delta in deltas.items():
+            counts[key] = counts.get(key, 0) + delta
+        setattr(self.module, self.field_name, counts)
+        return dict((key, counts[key]) for key in deltas)
+
+    def counts(self, keys=None):
+        """
+        Return a dict of the counts of keys, or of all keys if keys is None
+        """
+        counts = self._field()
+        if keys is None:
+            return dict(counts)
+        return dict((key, counts.get(key, 0)) for key in keys)
+
+    def top(self, amount):
+        """
+        Return a dict of the `amount` highest counts, and the total of all counts
+        """
+        counts = self._field()
+        top = dict(sorted(counts.items(), key=lambda x: x[1], reverse=True)[:amount])
+        return top, sum(counts.itervalues())
+
+
+class SharedCounters(object):
+    """
+    Counts for the field `field_name` of `module`, kept by the content_counters
+    `service` of its runtime.
+
+    Counts that were kept in the field before are moved to the service the
+    first time they're used.
+    """
+    def __init__(self, module, field_name, service):
+        self.definition_id = module.location.url()
+        self.field_name = field_name
+        self.service = service
+
+        field_counts = getattr(module, field_name)
+        if field_counts:
+            service.seed(self.definition_id, field_name, field_counts)
+            setattr(module, field_name, {})
+
+    def increment(self, deltas):
+        """See FieldCounters.increment"""
+        return self.service.increment(self.definition_id, self.field_name, deltas)
+
+    def counts(self, keys=None):
+        """See FieldCounters.counts"""
+        return self.service.counts(self.definition_id, self.field_name, keys)
+
+    def top(self, amount):
+        """See FieldCounters.top. The counts may be a few seconds old."""
+        return self.service.top(self.definition_id, self.field_name, amount)
+
+
+def content_counters(module, field_name):
+    """
+    Return the counters for the Dict field `field_name` of `module`: shared
+    ones if its runtime has a content_counters service, or else ones kept in
+    the field
+    """
+    service = getattr(module.system, 'content_counters', None)
+    if service is None:
+        return FieldCounters(module, field_name)
+    return SharedCounters(module, field_name, service)
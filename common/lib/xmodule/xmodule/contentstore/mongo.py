@@ -55,13 +55,13 @@ class MongoContentStore(ContentStore):
                 return StaticContentStream(location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
                                            thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
                                            import_path=fp.import_path if hasattr(fp, 'import_path') else None,
-                                           length=fp.length)
+                                           length=fp.length, content_digest=fp.md5)
             else:
                 with self.fs.get(id) as fp:
                     return StaticContent(location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
                                          thumbnail_location=fp.thumbnail_location if hasattr(fp, 'thumbnail_location') else None,
                                          import_path=fp.import_path if hasattr(fp, 'import_path') else None,
-                                         length=fp.length)
+                                         length=fp.length, content_digest=fp.md5)
         except NoFile:
             if throw_on_not_found:
                 raise NotFoundError()
@@ -84,7 +84,7 @@ class MongoContentStore(ContentStore):
             pass
 
     def export(self, location, output_directory):
-        content = self.find(location)
+        content = self.find(location, as_stream=True)
 
         if content.import_path is not None:
             output_directory = output_directory + '/' + os.path.dirname(content.import_path)
@@ -94,8 +94,12 @@ class MongoContentStore(ContentStore):
 
         disk_fs = OSFS(output_directory)
 
-        with disk_fs.open(content.name, 'wb') as asset_file:
-            asset_file.write(content.data)
+        try:
+            with disk_fs.open(content.name, 'wb') as asset_file:
+                for chunk in content.stream_data():
+                    asset_file.write(chunk)
+        finally:
+            content.close()
 
     def export_all_for_course(self, course_location, output_directory):
         assets = self.get_all_content_for_course(course_location)
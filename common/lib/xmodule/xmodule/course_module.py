@@ -734,6 +734,9 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
                 "section_descriptor" : The section descriptor
                 "xmoduledescriptors" : An array of xmoduledescriptors that
                     could possibly be in the section, for any student
+                "static_scores" : False if the problems in the section can
+                    depend on the student (dynamic children), or have to be
+                    scored every time (always_recalculate_grades)
 
         all_descriptors - This contains a list of all xmodules that can
             effect grading a student. This is used to efficiently fetch
@@ -759,7 +762,14 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
                     xmoduledescriptors.append(s)
 
                     # The xmoduledescriptors included here are only the ones that have scores.
-                    section_description = {'section_descriptor': s, 'xmoduledescriptors': filter(lambda child: child.has_score, xmoduledescriptors)}
+                    section_description = {
+                        'section_descriptor': s,
+                        'xmoduledescriptors': filter(lambda child: child.has_score, xmoduledescriptors),
+                        'static_scores': not any(
+                            child.has_dynamic_children() or child.always_recalculate_grades
+                            for child in xmoduledescriptors
+                        ),
+                    }
 
                     section_format = s.lms.format if s.lms.format is not None else ''
                     graded_sections[section_format] = graded_sections.get(section_format, []) + [section_description]
@@ -17,6 +17,13 @@ log = logging.getLogger('mitx.' + 'modulestore')
 MONGO_MODULESTORE_TYPE = 'mongo'
 XML_MODULESTORE_TYPE = 'xml'
 
+# The groups of fields that callers can ask a ModuleStore to fetch up front when
+# loading modules (see ModuleStore.get_item). Stores that support it leave the
+# other fields out of their queries, and only fetch them when they're used.
+STRUCTURE_FIELDS = 'structure'  # location and children
+SETTINGS_FIELDS = 'settings'  # ... and Scope.settings fields
+CONTENT_FIELDS = 'content'  # ... and Scope.content fields: everything
+
 URL_RE = re.compile("""
     (?P<tag>[^:]+)://?
     (?P<org>[^/]+)/
@@ -266,7 +273,7 @@ class ModuleStore(object):
         """
         raise NotImplementedError
 
-    def get_item(self, location, depth=0):
+    def get_item(self, location, depth=0, fields=CONTENT_FIELDS):
         """
         Returns an XModuleDescriptor instance for the item at location.
 
@@ -282,13 +289,19 @@ class ModuleStore(object):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
+
+        fields: STRUCTURE_FIELDS, SETTINGS_FIELDS or CONTENT_FIELDS. An
+            argument that some module stores may use to only fetch the fields
+            that the caller needs up front, and the rest when they are used
         """
         raise NotImplementedError
 
-    def get_instance(self, course_id, location, depth=0):
+    def get_instance(self, course_id, location, depth=0, fields=CONTENT_FIELDS):
         """
         Get an instance of this location, with policy for course_id applied.
         TODO (vshnayder): this may want to live outside the modulestore eventually
+
+        depth, fields: as for get_item
         """
         raise NotImplementedError
 
@@ -304,7 +317,7 @@ class ModuleStore(object):
         """
         raise NotImplementedError
 
-    def get_items(self, location, course_id=None, depth=0):
+    def get_items(self, location, course_id=None, depth=0, fields=CONTENT_FIELDS):
         """
         Returns a list of XModuleDescriptor instances for the items
         that match location. Any element of location that is None is treated
@@ -316,6 +329,8 @@ class ModuleStore(object):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
+
+        fields: as for get_item
         """
         raise NotImplementedError
 
@@ -400,6 +415,25 @@ class ModuleStore(object):
         """
         raise NotImplementedError
 
+    def get_cached_max_scores(self, course_id):
+        """
+        Returns a dictionary mapping location urls to the max scores that have
+        been recorded (with cache_max_scores) for the scored items of course_id.
+        Items whose max score isn't known are missing from the dictionary.
+
+        The dictionary belongs to the caller, and can be modified freely.
+        """
+        raise NotImplementedError
+
+    def cache_max_scores(self, course_id, max_scores):
+        """
+        Record the max scores of some of the scored items of course_id, so that
+        they don't have to be instantiated again to find them.
+
+        max_scores: a dictionary mapping location urls to max scores
+        """
+        raise NotImplementedError
+
 
 class ModuleStoreBase(ModuleStore):
     '''
@@ -412,6 +446,7 @@ class ModuleStoreBase(ModuleStore):
         self._location_errors = {}  # location -> ErrorLog
         self.modulestore_configuration = {}
         self.modulestore_update_signal = None  # can be set by runtime to route notifications of datastore changes
+        self._max_scores = {}  # course_id -> {location url -> max score}
 
     def _get_errorlog(self, location):
         """
@@ -455,6 +490,21 @@ class ModuleStoreBase(ModuleStore):
                 return c
         return None
 
+    def get_cached_max_scores(self, course_id):
+        """
+        Return the max scores recorded for course_id in this process.
+
+        This is only correct for stores whose content can't change while
+        the process is running; editable stores must override it.
+        """
+        return dict(self._max_scores.get(course_id, {}))
+
+    def cache_max_scores(self, course_id, max_scores):
+        """
+        Record max_scores for course_id in this process
+        """
+        self._max_scores.setdefault(course_id, {}).update(max_scores)
+
     @property
     def metadata_inheritance_cache_subsystem(self):
         """
@@ -6,7 +6,7 @@ In this way, courses can be served up both - say - XMLModuleStore or MongoModule
 IMPORTANT: This modulestore only supports READONLY applications, e.g. LMS
 """
 
-from . import ModuleStoreBase
+from . import ModuleStoreBase, CONTENT_FIELDS
 from xmodule.modulestore.django import create_modulestore_instance
 import logging
 
@@ -44,17 +44,17 @@ class MixedModuleStore(ModuleStoreBase):
     def has_item(self, course_id, location):
         return self._get_modulestore_for_courseid(course_id).has_item(course_id, location)
 
-    def get_item(self, location, depth=0):
+    def get_item(self, location, depth=0, fields=CONTENT_FIELDS):
         """
         This method is explicitly not implemented as we need a course_id to disambiguate
         We should be able to fix this when the data-model rearchitecting is done
         """
         raise NotImplementedError
 
-    def get_instance(self, course_id, location, depth=0):
-        return self._get_modulestore_for_courseid(course_id).get_instance(course_id, location, depth)
+    def get_instance(self, course_id, location, depth=0, fields=CONTENT_FIELDS):
+        return self._get_modulestore_for_courseid(course_id).get_instance(course_id, location, depth, fields)
 
-    def get_items(self, location, course_id=None, depth=0):
+    def get_items(self, location, course_id=None, depth=0, fields=CONTENT_FIELDS):
         """
         Returns a list of XModuleDescriptor instances for the items
         that match location. Any element of location that is None is treated
@@ -70,7 +70,7 @@ class MixedModuleStore(ModuleStoreBase):
         if not course_id:
             raise Exception("Must pass in a course_id when calling get_items() with MixedModuleStore")
 
-        return self._get_modulestore_for_courseid(course_id).get_items(location, course_id, depth)
+        return self._get_modulestore_for_courseid(course_id).get_items(location, course_id, depth, fields)
 
     def update_item(self, location, data, allow_not_found=False):
         """
@@ -147,6 +147,18 @@ class MixedModuleStore(ModuleStoreBase):
         """
         return self._get_modulestore_for_courseid(course_id).get_modulestore_type(course_id)
 
+    def get_cached_max_scores(self, course_id):
+        """
+        Returns the max scores recorded for course_id by the modulestore servicing it
+        """
+        return self._get_modulestore_for_courseid(course_id).get_cached_max_scores(course_id)
+
+    def cache_max_scores(self, course_id, max_scores):
+        """
+        Records max scores for course_id in the modulestore servicing it
+        """
+        self._get_modulestore_for_courseid(course_id).cache_max_scores(course_id, max_scores)
+
     def get_errored_courses(self):
         """
         Return a dictionary of course_dir -> [(msg, exception_str)], for each
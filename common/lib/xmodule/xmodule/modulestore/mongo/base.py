@@ -15,13 +15,11 @@ structure:
 import pymongo
 import sys
 import logging
-import copy
 
 from collections import namedtuple
 from fs.osfs import OSFS
 from itertools import repeat
 from path import path
-from operator import attrgetter
 from uuid import uuid4
 
 from importlib import import_module
@@ -32,7 +30,8 @@ from xmodule.error_module import ErrorDescriptor
 from xblock.runtime import DbModel, KeyValueStore, InvalidScopeError
 from xblock.core import Scope
 
-from xmodule.modulestore import ModuleStoreBase, Location, namedtuple_to_son, MONGO_MODULESTORE_TYPE
+from xmodule.modulestore import (ModuleStoreBase, Location, namedtuple_to_son, MONGO_MODULESTORE_TYPE,
+                                  STRUCTURE_FIELDS, SETTINGS_FIELDS, CONTENT_FIELDS)
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.modulestore.inheritance import own_metadata, INHERITABLE_METADATA, inherit_metadata
 
@@ -50,6 +49,17 @@ def get_course_id_no_run(location):
     return "/".join([location.org, location.course])
 
 
+# The parts of a module's document to fetch for each group of fields
+FIELDS_PROJECTIONS = {
+    STRUCTURE_FIELDS: {'_id': 1, 'definition.children': 1},
+    SETTINGS_FIELDS: {'_id': 1, 'definition.children': 1, 'metadata': 1},
+    CONTENT_FIELDS: None,
+}
+
+# Stands in for the data or metadata of a module that hasn't been fetched yet
+NOT_FETCHED = object()
+
+
 class InvalidWriteError(Exception):
     """
     Raised to indicate that writing to a particular key
@@ -61,14 +71,52 @@ class MongoKeyValueStore(KeyValueStore):
     """
     A KeyValueStore that maps keyed data access to one of the 3 data areas
     known to the MongoModuleStore (data, children, and metadata)
+
+    data and metadata can be NOT_FETCHED, if they were left out of the query
+    that loaded the module. In that case, `fetch` is called the first time
+    either of them is used, and returns the (data, metadata) of the module.
     """
-    def __init__(self, data, children, metadata, location, category):
+    def __init__(self, data, children, metadata, location, category, fetch=None):
+        self._fetch = fetch
         self._data = data
         self._children = children
         self._metadata = metadata
         self._location = location
         self._category = category
 
+    def _fetch_missing(self):
+        """
+        Fetch the data and metadata, if they haven't been yet
+        """
+        if self._fetch is None:
+            return
+        data, metadata = self._fetch()
+        self._fetch = None
+        if self._stored_data is NOT_FETCHED:
+            self._stored_data = data
+        if self._stored_metadata is NOT_FETCHED:
+            self._stored_metadata = metadata
+
+    @property
+    def _data(self):
+        if self._stored_data is NOT_FETCHED:
+            self._fetch_missing()
+        return self._stored_data
+
+    @_data.setter
+    def _data(self, value):
+        self._stored_data = value
+
+    @property
+    def _metadata(self):
+        if self._stored_metadata is NOT_FETCHED:
+            self._fetch_missing()
+        return self._stored_metadata
+
+    @_metadata.setter
+    def _metadata(self, value):
+        self._stored_metadata = value
+
     def get(self, key):
         if key.scope == Scope.children:
             return self._children
@@ -153,13 +201,16 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
     references to metadata_inheritance_tree
     """
     def __init__(self, modulestore, module_data, default_class, resources_fs,
-                 error_tracker, render_template, cached_metadata=None):
+                 error_tracker, render_template, cached_metadata=None, fields=CONTENT_FIELDS):
         """
         modulestore: the module store that can be used to retrieve additional modules
 
         module_data: a dict mapping Location -> json that was cached from the
             underlying modulestore
 
+        fields: the group of fields that module_data was fetched with. The
+            other fields of the modules are fetched when they are first used.
+
         default_class: The default_class to use when loading an
             XModuleDescriptor from the module_data
 
@@ -179,6 +230,24 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
         # define an attribute here as well, even though it's None
         self.course_id = None
         self.cached_metadata = cached_metadata
+        self.fields = fields
+
+    def fetch_fields(self, location, class_):
+        """
+        Return a function that fetches the (data, metadata) of the module at
+        location, for a MongoKeyValueStore
+        """
+        def fetch():
+            item = self.modulestore.collection.find_one(
+                {'_id': namedtuple_to_son(location)},
+                {'definition.data': 1, 'metadata': 1},
+            )
+            if item is None:
+                raise ItemNotFoundError(location)
+            metadata = item.get('metadata', {})
+            translate_metadata(class_, metadata)
+            return item.get('definition', {}).get('data', {}), metadata
+        return fetch
 
     def load_item(self, location):
         """
@@ -201,18 +270,25 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
                     self.default_class
                 )
                 definition = json_data.get('definition', {})
+                data = definition.get('data', {})
                 metadata = json_data.get('metadata', {})
-                for old_name, new_name in class_.metadata_translations.items():
-                    if old_name in metadata:
-                        metadata[new_name] = metadata[old_name]
-                        del metadata[old_name]
+                translate_metadata(class_, metadata)
+
+                fetch = None
+                if self.fields != CONTENT_FIELDS:
+                    if 'data' not in definition:
+                        data = NOT_FETCHED
+                    if self.fields == STRUCTURE_FIELDS and 'metadata' not in json_data:
+                        metadata = NOT_FETCHED
+                    fetch = self.fetch_fields(location, class_)
 
                 kvs = MongoKeyValueStore(
-                    definition.get('data', {}),
+                    data,
                     definition.get('children', []),
                     metadata,
                     location,
-                    category
+                    category,
+                    fetch
                 )
 
                 model_data = DbModel(kvs, class_, None, MongoUsage(self.course_id, location))
@@ -238,6 +314,16 @@ class CachingDescriptorSystem(MakoDescriptorSystem):
                 )
 
 
+def translate_metadata(class_, metadata):
+    """
+    Rename the fields in metadata that class_ has renamed since they were saved
+    """
+    for old_name, new_name in class_.metadata_translations.items():
+        if old_name in metadata:
+            metadata[new_name] = metadata[old_name]
+            del metadata[old_name]
+
+
 def location_to_query(location, wildcard=True):
     """
     Takes a Location and returns a SON object that will query for that location.
@@ -258,7 +344,88 @@ def location_to_query(location, wildcard=True):
     return query
 
 
-metadata_cache_key = attrgetter('org', 'course')
+# The categories of items that can have children that inherit their metadata
+INHERITANCE_CONTAINER_CATEGORIES = [
+    'course', 'chapter', 'sequential', 'vertical', 'wrapper', 'problemset', 'conditional', 'randomize'
+]
+
+
+def metadata_cache_key(location):
+    """
+    Returns the key of the metadata inheritance tree of the org/course of
+    location in the metadata_inheritance_cache_subsystem.
+    """
+    return ('metadata_inheritance', location.org, location.course)
+
+
+def metadata_generation_key(location):
+    """
+    Returns the key of the generation of the metadata inheritance tree of the
+    org/course of location in the metadata_inheritance_cache_subsystem.
+
+    The generation is incremented by every update of the tree, and the tree is
+    cached together with the generation it was made for: a tree is only used
+    while its generation is the current one, so that when two processes update
+    the tree at the same time, neither of their trees is used.
+    """
+    return ('metadata_inheritance_generation', location.org, location.course)
+
+
+def update_inherited_metadata(tree, url, inherited):
+    """
+    Record in the metadata inheritance tree that the item at url inherits
+    `inherited`, and recompute what all of its descendents inherit
+    """
+    to_visit = [(url, inherited)]
+    visited = set()
+    while to_visit:
+        url, inherited = to_visit.pop()
+        tree['inherited'][url] = inherited
+        node = tree['nodes'].get(url)
+        if node is None or url in visited:
+            continue
+        visited.add(url)
+
+        # Children share the dict that they inherit, which is only copied
+        # when a container sets some inheritable metadata of its own
+        if node['metadata']:
+            inherited = dict(inherited)
+            inherited.update(node['metadata'])
+        to_visit.extend((child, inherited) for child in node['children'])
+
+
+def add_parents(parents, nodes):
+    """
+    Record in the child to parents index `parents` that the containers in
+    the metadata inheritance tree `nodes` are the parents of their children
+    """
+    for url, node in nodes.iteritems():
+        for child in node['children']:
+            child_parents = parents.setdefault(child, [])
+            if url not in child_parents:
+                child_parents.append(url)
+
+
+def remove_parents(parents, url, children):
+    """
+    Remove the container at url as the parent of children from the child to
+    parents index `parents`
+    """
+    for child in children:
+        child_parents = parents.get(child, [])
+        if url in child_parents:
+            child_parents.remove(url)
+            if not child_parents:
+                del parents[child]
+
+
+def max_scores_cache_key(org, course):
+    """
+    Returns the key of the max score index of a course in the
+    metadata_inheritance_cache_subsystem. Like the metadata inheritance
+    tree, it is shared by all runs of the org/course.
+    """
+    return ('max_scores', org, course)
 
 
 class MongoModuleStore(ModuleStoreBase):
@@ -305,16 +472,34 @@ class MongoModuleStore(ModuleStoreBase):
 
     def compute_metadata_inheritance_tree(self, location):
         '''
+        Return the metadata inheritance tree of the org/course of location, a dict of:
+            'root': the url of the course, or None
+            'nodes': {url: {'metadata': inheritable metadata, 'children': [urls]}}
+                for all of the containers in the course
+            'inherited': {url: the inheritable metadata that the item inherits}
+            'parents': {url: [urls of the containers that have the item as a child]}
+        Items that have the same ancestors share their 'inherited' dict.
+
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
         '''
+        nodes = self._query_inheritance_nodes({
+            '_id.org': location.org,
+            '_id.course': location.course,
+            '_id.category': {'$in': INHERITANCE_CONTAINER_CATEGORIES},
+        })
+        tree = {'root': None, 'nodes': nodes, 'inherited': {}, 'parents': {}}
+        add_parents(tree['parents'], nodes)
+        for url in nodes:
+            if Location(url).category == 'course':
+                tree['root'] = url
+        if tree['root'] is not None:
+            update_inherited_metadata(tree, tree['root'], {})
+        return tree
 
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-        query = {'_id.org': location.org,
-                 '_id.course': location.course,
-                 '_id.category': {'$in': ['course', 'chapter', 'sequential', 'vertical',
-                                          'wrapper', 'problemset', 'conditional', 'randomize']}
-                 }
+    def _query_inheritance_nodes(self, query):
+        '''
+        Return the 'nodes' of the metadata inheritance tree for the containers that match query
+        '''
         # we just want the Location, children, and inheritable metadata
         record_filter = {'_id': 1, 'definition.children': 1}
 
@@ -323,91 +508,61 @@ class MongoModuleStore(ModuleStoreBase):
         for attr in INHERITABLE_METADATA:
             record_filter['metadata.{0}'.format(attr)] = 1
 
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
-
-        results_by_url = {}
-        root = None
-
-        # now go through the results and order them by the location url
-        for result in resultset:
+        nodes = {}
+        for result in self.collection.find(query, record_filter):
             location = Location(result['_id'])
+            children = result.get('definition', {}).get('children', [])
             # We need to collate between draft and non-draft
             # i.e. draft verticals can have children which are not in non-draft versions
-            location = location.replace(revision=None)
-            location_url = location.url()
-            if location_url in results_by_url:
-                existing_children = results_by_url[location_url].get('definition', {}).get('children', [])
-                additional_children = result.get('definition', {}).get('children', [])
-                total_children = existing_children + additional_children
-                if 'definition' not in results_by_url[location_url]:
-                    results_by_url[location_url]['definition'] = {}
-                results_by_url[location_url]['definition']['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
-
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
-
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            # check for presence of metadata key. Note that a given module may not yet be fully formed.
-            # example: update_item -> update_children -> update_metadata sequence on new item create
-            # if we get called here without update_metadata called first then 'metadata' hasn't been set
-            # as we're not fully transactional at the DB layer. Same comment applies to below key name
-            # check
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
-                else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
-
-        if root is not None:
-            _compute_inherited_metadata(root)
-
-        return metadata_to_inherit
-
-    def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
+            url = location.replace(revision=None).url()
+            node = nodes.get(url)
+            if node is None:
+                nodes[url] = {'metadata': result.get('metadata', {}), 'children': list(children)}
+                continue
+            node['children'].extend(child for child in children if child not in node['children'])
+            if location.revision is not None:
+                # the draft's metadata is the one being edited
+                node['metadata'] = result.get('metadata', {})
+        return nodes
+
+    def _get_cached_inheritance_tree_or_none(self, location):
         '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        Return the metadata inheritance tree cached for the org/course of
+        location, or None if there is no current one
         '''
         key = metadata_cache_key(location)
-        tree = {}
-
-        if not force_refresh:
-            # see if we are first in the request cache (if present)
-            if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
-                return self.request_cache.data['metadata_inheritance'][key]
-
-            # then look in any caching subsystem (e.g. memcached)
-            if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
-            else:
-                logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
-
-        if not tree:
-            # if not in subsystem, or we are on force refresh, then we have to compute
-            tree = self.compute_metadata_inheritance_tree(location)
+        if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
+            return self.request_cache.data['metadata_inheritance'][key]
+        if self.metadata_inheritance_cache_subsystem is not None:
+            cached = self.metadata_inheritance_cache_subsystem.get(key)
+            if cached is not None:
+                generation, tree = cached
+                if generation == self.metadata_inheritance_cache_subsystem.get(metadata_generation_key(location)):
+                    return tree
+        return None
+
+    def _current_inheritance_generation(self, location):
+        '''
+        Return the current generation of the metadata inheritance tree of the
+        org/course of location, starting it if there is none
+        '''
+        if self.metadata_inheritance_cache_subsystem is None:
+            return None
+        key = metadata_generation_key(location)
+        self.metadata_inheritance_cache_subsystem.add(key, 0)
+        return self.metadata_inheritance_cache_subsystem.get(key)
 
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+    def _cache_inheritance_tree(self, location, tree, generation=None, shared=True):
+        '''
+        Save tree in the caching subsystem, as the tree of `generation`, if
+        `shared`, and in the request cache, if available
+        '''
+        key = metadata_cache_key(location)
+        # now write out computed tree to caching subsystem (e.g. memcached), if available
+        if shared and self.metadata_inheritance_cache_subsystem is not None:
+            self.metadata_inheritance_cache_subsystem.set(key, (generation, tree))
 
-        # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
-        # put into the request_cache
+        # now populate a request_cache, if available.
         if self.request_cache is not None:
             # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
             # defined
@@ -415,6 +570,37 @@ class MongoModuleStore(ModuleStoreBase):
                 self.request_cache.data['metadata_inheritance'] = {}
             self.request_cache.data['metadata_inheritance'][key] = tree
 
+    def _forget_inheritance_tree(self, location):
+        '''
+        Drop the cached metadata inheritance tree of the org/course of location
+        '''
+        key = metadata_cache_key(location)
+        if self.metadata_inheritance_cache_subsystem is not None:
+            self.metadata_inheritance_cache_subsystem.delete(key)
+        if self.request_cache is not None:
+            self.request_cache.data.get('metadata_inheritance', {}).pop(key, None)
+
+    def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
+        '''
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+        '''
+        if not force_refresh:
+            # see if we are first in the request cache (if present), then in
+            # any caching subsystem (e.g. memcached)
+            tree = self._get_cached_inheritance_tree_or_none(location)
+            if tree is not None:
+                # NOTE, after a memcache hit, this puts the tree into the request_cache
+                self._cache_inheritance_tree(location, tree, shared=False)
+                return tree
+            if self.metadata_inheritance_cache_subsystem is None:
+                logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
+
+        # if not in subsystem, or we are on force refresh, then we have to compute.
+        # The generation is read first, so that the tree isn't used if it
+        # is updated while we compute it.
+        generation = self._current_inheritance_generation(location)
+        tree = self.compute_metadata_inheritance_tree(location)
+        self._cache_inheritance_tree(location, tree, generation)
         return tree
 
     def refresh_cached_metadata_inheritance_tree(self, location):
@@ -426,6 +612,127 @@ class MongoModuleStore(ModuleStoreBase):
         if pseudo_course_id not in self.ignore_write_events_on_courses:
             self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
 
+    def update_cached_metadata_inheritance_tree(self, location):
+        """
+        Update the cached metadata inheritance tree for the org/course of location,
+        after location has been written. Only the container at location is
+        reread, and only the inheritance of its descendents is recomputed.
+
+        Writes to the children or metadata of items that aren't containers
+        don't change the tree. If no tree is cached, there is nothing to do: it
+        will be computed the next time it is needed.
+        """
+        location = Location(location)
+        if get_course_id_no_run(location) in self.ignore_write_events_on_courses:
+            return
+        if location.category not in INHERITANCE_CONTAINER_CATEGORIES:
+            return
+
+        if self.metadata_inheritance_cache_subsystem is None:
+            generation = None
+            tree = self._get_cached_inheritance_tree_or_none(location)
+        else:
+            try:
+                generation = self.metadata_inheritance_cache_subsystem.incr(metadata_generation_key(location))
+            except ValueError:
+                # The generation was evicted, so no tree can be trusted
+                self._forget_inheritance_tree(location)
+                return
+            cached = self.metadata_inheritance_cache_subsystem.get(metadata_cache_key(location))
+            if cached is None or cached[0] != generation - 1:
+                # The tree isn't cached, or another process is updating it too
+                self._forget_inheritance_tree(location)
+                return
+            tree = cached[1]
+        if tree is None:
+            return
+
+        url = location.replace(revision=None).url()
+        nodes = self._query_inheritance_nodes({
+            '_id.tag': location.tag,
+            '_id.org': location.org,
+            '_id.course': location.course,
+            '_id.category': location.category,
+            '_id.name': location.name,
+        })
+        old_node = tree['nodes'].pop(url, None)
+        if old_node is not None:
+            remove_parents(tree['parents'], url, old_node['children'])
+        tree['nodes'].update(nodes)
+        add_parents(tree['parents'], nodes)
+        if location.category == 'course' and url in nodes:
+            tree['root'] = url
+
+        # Read the containers that have just been added under location
+        missing = set(nodes.get(url, {}).get('children', [])) - set(tree['nodes'])
+        while missing:
+            nodes = self._query_inheritance_nodes({
+                '_id.org': location.org,
+                '_id.course': location.course,
+                '_id.category': {'$in': INHERITANCE_CONTAINER_CATEGORIES},
+                '_id.name': {'$in': [Location(child).name for child in missing]},
+            })
+            tree['nodes'].update(nodes)
+            add_parents(tree['parents'], nodes)
+            missing = set(
+                child for node in nodes.values() for child in node['children']
+            ) - set(tree['nodes'])
+
+        if url == tree['root']:
+            update_inherited_metadata(tree, url, {})
+        elif url in tree['inherited']:
+            update_inherited_metadata(tree, url, tree['inherited'][url])
+        self._cache_inheritance_tree(location, tree, generation)
+
+    def get_cached_max_scores(self, course_id):
+        """
+        Returns the max scores recorded for course_id in the
+        metadata_inheritance_cache_subsystem, so that they are shared
+        between processes, and invalidated by writes from Studio.
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return {}
+        org, course, _ = course_id.split('/')
+        return self.metadata_inheritance_cache_subsystem.get(max_scores_cache_key(org, course), {})
+
+    def cache_max_scores(self, course_id, max_scores):
+        """
+        Adds max_scores to the max scores recorded for course_id
+        """
+        if self.metadata_inheritance_cache_subsystem is None:
+            return
+        org, course, _ = course_id.split('/')
+        key = max_scores_cache_key(org, course)
+        cached = self.metadata_inheritance_cache_subsystem.get(key, {})
+        cached.update(max_scores)
+        self.metadata_inheritance_cache_subsystem.set(key, cached)
+
+    def clear_cached_max_scores(self, location):
+        """
+        Forget all of the max scores recorded for the org/course of location
+        """
+        if self.metadata_inheritance_cache_subsystem is not None:
+            self.metadata_inheritance_cache_subsystem.delete(max_scores_cache_key(location.org, location.course))
+
+    def invalidate_cached_max_score(self, location):
+        """
+        Forget the max score recorded for location, because it may have changed.
+        """
+        location = Location(location)
+        if self.metadata_inheritance_cache_subsystem is None:
+            return
+        # bulk writers (e.g. course import) clear the whole course when they are done
+        if get_course_id_no_run(location) in self.ignore_write_events_on_courses:
+            return
+
+        key = max_scores_cache_key(location.org, location.course)
+        cached = self.metadata_inheritance_cache_subsystem.get(key, {})
+        # Scores are recorded for the published version of an item
+        location_url = location.replace(revision=None).url()
+        if location_url in cached:
+            del cached[location_url]
+            self.metadata_inheritance_cache_subsystem.set(key, cached)
+
     def _clean_item_data(self, item):
         """
         Renames the '_id' field in item to 'location'
@@ -433,20 +740,22 @@ class MongoModuleStore(ModuleStoreBase):
         item['location'] = item['_id']
         del item['_id']
 
-    def _query_children_for_cache_children(self, items):
+    def _query_children_for_cache_children(self, items, fields=CONTENT_FIELDS):
         # first get non-draft in a round-trip
         query = {
             '_id': {'$in': [namedtuple_to_son(Location(item)) for item in items]}
         }
-        return list(self.collection.find(query))
+        return list(self.collection.find(query, FIELDS_PROJECTIONS[fields]))
 
-    def _cache_children(self, items, depth=0):
+    def _cache_children(self, items, depth=0, fields=CONTENT_FIELDS):
         """
         Returns a dictionary mapping Location -> item data, populated with json data
         for all descendents of items up to the specified depth.
         (0 = no descendents, 1 = children, 2 = grandchildren, etc)
         If depth is None, will load all the children.
         This will make a number of queries that is linear in the depth.
+        Only the parts of the descendents' documents for the group of fields
+        `fields` are fetched.
         """
 
         data = {}
@@ -466,7 +775,7 @@ class MongoModuleStore(ModuleStoreBase):
             # for or-query syntax
             to_process = []
             if children:
-                to_process = self._query_children_for_cache_children(children)
+                to_process = self._query_children_for_cache_children(children, fields)
 
             # If depth is None, then we just recurse until we hit all the descendents
             if depth is not None:
@@ -474,9 +783,10 @@ class MongoModuleStore(ModuleStoreBase):
 
         return data
 
-    def _load_item(self, item, data_cache, apply_cached_metadata=True):
+    def _load_item(self, item, data_cache, apply_cached_metadata=True, fields=CONTENT_FIELDS):
         """
-        Load an XModuleDescriptor from item, using the children stored in data_cache
+        Load an XModuleDescriptor from item, using the children stored in data_cache,
+        which were fetched with the group of fields `fields`
         """
         data_dir = getattr(item, 'data_dir', item['location']['course'])
         root = self.fs_root / data_dir
@@ -488,7 +798,7 @@ class MongoModuleStore(ModuleStoreBase):
 
         cached_metadata = {}
         if apply_cached_metadata:
-            cached_metadata = self.get_cached_metadata_inheritance_tree(Location(item['location']))
+            cached_metadata = self.get_cached_metadata_inheritance_tree(Location(item['location']))['inherited']
 
         # TODO (cdodge): When the 'split module store' work has been completed, we should remove
         # the 'metadata_inheritance_tree' parameter
@@ -500,20 +810,23 @@ class MongoModuleStore(ModuleStoreBase):
             self.error_tracker,
             self.render_template,
             cached_metadata,
+            fields,
         )
         return system.load_item(item['location'])
 
-    def _load_items(self, items, depth=0):
+    def _load_items(self, items, depth=0, fields=CONTENT_FIELDS):
         """
         Load a list of xmodules from the data in items, with children cached up
-        to specified depth
+        to specified depth. items only need to contain the parts of the
+        documents for the group of fields `fields`.
         """
-        data_cache = self._cache_children(items, depth)
+        data_cache = self._cache_children(items, depth, fields)
 
         # if we are loading a course object, if we're not prefetching children (depth != 0) then don't
         # bother with the metadata inheritance
         return [self._load_item(item, data_cache,
-                apply_cached_metadata=(item['location']['category'] != 'course' or depth != 0)) for item in items]
+                apply_cached_metadata=(item['location']['category'] != 'course' or depth != 0),
+                fields=fields) for item in items]
 
     def get_courses(self):
         '''
@@ -531,13 +844,15 @@ class MongoModuleStore(ModuleStoreBase):
             )
         ]
 
-    def _find_one(self, location):
+    def _find_one(self, location, fields=CONTENT_FIELDS):
         '''Look for a given location in the collection.  If revision is not
         specified, returns the latest.  If the item is not present, raise
-        ItemNotFoundError.
+        ItemNotFoundError. Only the parts of the document for the group of
+        fields `fields` are returned.
         '''
         item = self.collection.find_one(
             location_to_query(location, wildcard=False),
+            FIELDS_PROJECTIONS[fields],
             sort=[('revision', pymongo.ASCENDING)],
         )
         if item is None:
@@ -555,7 +870,7 @@ class MongoModuleStore(ModuleStoreBase):
         except ItemNotFoundError:
             return False
 
-    def get_item(self, location, depth=0):
+    def get_item(self, location, depth=0, fields=CONTENT_FIELDS):
         """
         Returns an XModuleDescriptor instance for the item at location.
 
@@ -569,13 +884,17 @@ class MongoModuleStore(ModuleStoreBase):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of
             calls to get_children() to cache. None indicates to cache all descendents.
+        fields: The group of fields (STRUCTURE_FIELDS, SETTINGS_FIELDS or
+            CONTENT_FIELDS) to fetch for the item and its cached descendents.
+            Their other fields are fetched, one module at a time, when they are
+            first used.
         """
         location = Location.ensure_fully_specified(location)
-        item = self._find_one(location)
-        module = self._load_items([item], depth)[0]
+        item = self._find_one(location, fields)
+        module = self._load_items([item], depth, fields)[0]
         return module
 
-    def get_instance(self, course_id, location, depth=0):
+    def get_instance(self, course_id, location, depth=0, fields=CONTENT_FIELDS):
         """
         TODO (vshnayder): implement policy tracking in mongo.
         For now, just delegate to get_item and ignore policy.
@@ -584,16 +903,18 @@ class MongoModuleStore(ModuleStoreBase):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of
             calls to get_children() to cache. None indicates to cache all descendents.
+        fields: as for get_item
         """
-        return self.get_item(location, depth=depth)
+        return self.get_item(location, depth=depth, fields=fields)
 
-    def get_items(self, location, course_id=None, depth=0):
+    def get_items(self, location, course_id=None, depth=0, fields=CONTENT_FIELDS):
         items = self.collection.find(
             location_to_query(location),
+            FIELDS_PROJECTIONS[fields],
             sort=[('revision', pymongo.ASCENDING)],
         )
 
-        modules = self._load_items(list(items), depth)
+        modules = self._load_items(list(items), depth, fields)
         return modules
 
     def create_xmodule(self, location, definition_data=None, metadata=None, system=None):
@@ -651,8 +972,9 @@ class MongoModuleStore(ModuleStoreBase):
                     'children': xmodule.children if xmodule.has_children else []
                 }
             })
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(xmodule.location)
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(xmodule.location)
+        self.invalidate_cached_max_score(xmodule.location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(xmodule.location), xmodule.location)
 
     def create_and_save_xmodule(self, location, definition_data=None, metadata=None, system=None):
@@ -758,6 +1080,47 @@ class MongoModuleStore(ModuleStoreBase):
         except ItemNotFoundError:
             if not allow_not_found:
                 raise
+        self.invalidate_cached_max_score(location)
+
+    def bulk_write_items(self, items):
+        """
+        Write many items at once, replacing any that already exist. Used when
+        importing courses.
+
+        items: a list of (location, data, children, metadata)
+
+        Unlike update_item, update_children and update_metadata, this doesn't
+        update the cached metadata inheritance tree or max scores, or fire the
+        modulestore update signal: the caller should do that when it's done.
+
+        New items are inserted together. Items that exist already are replaced
+        one at a time, so that readers always find them.
+        """
+        if not items:
+            return
+        documents = [
+            {
+                '_id': Location(location).dict(),
+                'definition': {'data': data, 'children': children},
+                'metadata': metadata,
+            }
+            for location, data, children, metadata in items
+        ]
+        existing = set(
+            Location(result['_id']) for result in self.collection.find(
+                {'_id': {'$in': [document['_id'] for document in documents]}}, {'_id': 1}
+            )
+        )
+        new_documents = [document for document in documents if Location(document['_id']) not in existing]
+        replaced_documents = [document for document in documents if Location(document['_id']) in existing]
+        if new_documents:
+            try:
+                self.collection.insert(new_documents, safe=self.collection.safe)
+            except pymongo.errors.DuplicateKeyError:
+                # Some were written by someone else meanwhile
+                replaced_documents.extend(new_documents)
+        for document in replaced_documents:
+            self.collection.update({'_id': document['_id']}, document, upsert=True, safe=self.collection.safe)
 
     def update_children(self, location, children):
         """
@@ -769,8 +1132,8 @@ class MongoModuleStore(ModuleStoreBase):
         """
 
         self._update_single_item(location, {'definition.children': children})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(Location(location))
         # fire signal that we've written to DB
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
@@ -799,8 +1162,9 @@ class MongoModuleStore(ModuleStoreBase):
             self.update_metadata(course.location, own_metadata(course))
 
         self._update_single_item(location, {'metadata': metadata})
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(loc)
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(loc)
+        self.invalidate_cached_max_score(loc)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def delete_item(self, location, delete_all_versions=False):
@@ -825,8 +1189,9 @@ class MongoModuleStore(ModuleStoreBase):
         # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
-        # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        # update the metadata inheritance tree which is cached
+        self.update_cached_metadata_inheritance_tree(Location(location))
+        self.invalidate_cached_max_score(location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
@@ -834,6 +1199,14 @@ class MongoModuleStore(ModuleStoreBase):
         course.  Needed for path_to_location().
         '''
         location = Location.ensure_fully_specified(location)
+
+        # Containers are in the course's metadata inheritance tree, so their
+        # children can be looked up there without a query
+        parents = self.get_cached_metadata_inheritance_tree(location)['parents']
+        url = location.replace(revision=None).url()
+        if url in parents:
+            return [Location(parent) for parent in parents[url]]
+
         items = self.collection.find({'definition.children': location.url()},
                                      {'_id': True})
         return [i['_id'] for i in items]
@@ -9,10 +9,11 @@ and otherwise returns i4x://org/course/cat/name).
 from datetime import datetime
 
 from xmodule.exceptions import InvalidVersionError
-from xmodule.modulestore import Location, namedtuple_to_son
+from xmodule.modulestore import Location, namedtuple_to_son, CONTENT_FIELDS
 from xmodule.modulestore.exceptions import ItemNotFoundError, DuplicateItemError
 from xmodule.modulestore.inheritance import own_metadata
-from xmodule.modulestore.mongo.base import location_to_query, get_course_id_no_run, MongoModuleStore
+from xmodule.modulestore.mongo.base import (location_to_query, get_course_id_no_run, MongoModuleStore,
+                                            FIELDS_PROJECTIONS)
 import pymongo
 from pytz import UTC
 
@@ -57,7 +58,7 @@ class DraftModuleStore(MongoModuleStore):
     their children) to published modules.
     """
 
-    def get_item(self, location, depth=0):
+    def get_item(self, location, depth=0, fields=CONTENT_FIELDS):
         """
         Returns an XModuleDescriptor instance for the item at location.
         If location.revision is None, returns the item with the most
@@ -75,23 +76,26 @@ class DraftModuleStore(MongoModuleStore):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
+
+        fields: The group of fields to fetch up front, see MongoModuleStore.get_item
         """
 
         try:
-            return wrap_draft(super(DraftModuleStore, self).get_item(as_draft(location), depth=depth))
+            return wrap_draft(super(DraftModuleStore, self).get_item(as_draft(location), depth=depth, fields=fields))
         except ItemNotFoundError:
-            return wrap_draft(super(DraftModuleStore, self).get_item(location, depth=depth))
+            return wrap_draft(super(DraftModuleStore, self).get_item(location, depth=depth, fields=fields))
 
-    def get_instance(self, course_id, location, depth=0):
+    def get_instance(self, course_id, location, depth=0, fields=CONTENT_FIELDS):
         """
         Get an instance of this location, with policy for course_id applied.
         TODO (vshnayder): this may want to live outside the modulestore eventually
         """
 
         try:
-            return wrap_draft(super(DraftModuleStore, self).get_instance(course_id, as_draft(location), depth=depth))
+            return wrap_draft(super(DraftModuleStore, self).get_instance(
+                course_id, as_draft(location), depth=depth, fields=fields))
         except ItemNotFoundError:
-            return wrap_draft(super(DraftModuleStore, self).get_instance(course_id, location, depth=depth))
+            return wrap_draft(super(DraftModuleStore, self).get_instance(course_id, location, depth=depth, fields=fields))
 
     def create_xmodule(self, location, definition_data=None, metadata=None, system=None):
         """
@@ -108,7 +112,7 @@ class DraftModuleStore(MongoModuleStore):
         return super(DraftModuleStore, self).create_xmodule(draft_loc, definition_data, metadata, system)
 
 
-    def get_items(self, location, course_id=None, depth=0):
+    def get_items(self, location, course_id=None, depth=0, fields=CONTENT_FIELDS):
         """
         Returns a list of XModuleDescriptor instances for the items
         that match location. Any element of location that is None is treated
@@ -120,11 +124,13 @@ class DraftModuleStore(MongoModuleStore):
             descendents of the queried modules for more efficient results later
             in the request. The depth is counted in the number of calls to
             get_children() to cache. None indicates to cache all descendents
+
+        fields: The group of fields to fetch up front, see MongoModuleStore.get_item
         """
         draft_loc = as_draft(location)
 
-        draft_items = super(DraftModuleStore, self).get_items(draft_loc, course_id=course_id, depth=depth)
-        items = super(DraftModuleStore, self).get_items(location, course_id=course_id, depth=depth)
+        draft_items = super(DraftModuleStore, self).get_items(draft_loc, course_id=course_id, depth=depth, fields=fields)
+        items = super(DraftModuleStore, self).get_items(location, course_id=course_id, depth=depth, fields=fields)
 
         draft_locs_found = set(item.location.replace(revision=None) for item in draft_items)
         non_draft_items = [
@@ -151,7 +157,7 @@ class DraftModuleStore(MongoModuleStore):
         except pymongo.errors.DuplicateKeyError:
             raise DuplicateItemError(original['_id'])
 
-        self.refresh_cached_metadata_inheritance_tree(draft_location)
+        self.update_cached_metadata_inheritance_tree(draft_location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(draft_location), draft_location)
 
         return self._load_items([original])[0]
@@ -249,9 +255,9 @@ class DraftModuleStore(MongoModuleStore):
         self.convert_to_draft(location)
         super(DraftModuleStore, self).delete_item(location)
 
-    def _query_children_for_cache_children(self, items):
+    def _query_children_for_cache_children(self, items, fields=CONTENT_FIELDS):
         # first get non-draft in a round-trip
-        to_process_non_drafts = super(DraftModuleStore, self)._query_children_for_cache_children(items)
+        to_process_non_drafts = super(DraftModuleStore, self)._query_children_for_cache_children(items, fields)
 
         to_process_dict = {}
         for non_draft in to_process_non_drafts:
@@ -261,7 +267,7 @@ class DraftModuleStore(MongoModuleStore):
         query = {
             '_id': {'$in': [namedtuple_to_son(as_draft(Location(item))) for item in items]}
         }
-        to_process_drafts = list(self.collection.find(query))
+        to_process_drafts = list(self.collection.find(query, FIELDS_PROJECTIONS[fields]))
 
         # now we have to go through all drafts and replace the non-draft
         # with the draft. This is because the semantics of the DraftStore is to
@@ -8,10 +8,14 @@ from xblock.core import Scope
 from xblock.runtime import KeyValueStore, InvalidScopeError
 
 from xmodule.tests import DATA_DIR
-from xmodule.modulestore import Location
+from xmodule.modulestore import Location, SETTINGS_FIELDS
 from xmodule.modulestore.mongo import MongoModuleStore, MongoKeyValueStore
+from xmodule.modulestore.mongo.base import (
+    NOT_FETCHED, update_inherited_metadata, metadata_cache_key, metadata_generation_key
+)
+from xmodule.modulestore.inheritance import own_metadata
 from xmodule.modulestore.draft import DraftModuleStore
-from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint
+from xmodule.modulestore.xml_importer import import_from_xml, perform_xlint, item_bytes
 from xmodule.contentstore.mongo import MongoContentStore
 
 from xmodule.modulestore.tests.test_modulestore import check_path_to_location
@@ -26,6 +30,33 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
 
 
+class DictCache(dict):
+    """
+    Minimal stand-in for a django cache, for the metadata_inheritance_cache_subsystem
+    """
+    def set(self, key, value):
+        self[key] = value
+
+    def add(self, key, value):
+        self.setdefault(key, value)
+
+    def incr(self, key):
+        if key not in self:
+            raise ValueError("Key '%s' not found" % (key,))
+        self[key] += 1
+        return self[key]
+
+    def delete(self, key):
+        self.pop(key, None)
+
+
+def test_item_bytes():
+    location = Location('i4x', 'edX', 'toy', 'html', 'sized')
+    assert_equals(5 + 2 + 2, item_bytes((location, 'hello', [], {})))
+    # data that isn't a string counts too
+    assert_equals(len('{"a": "hello"}') + 2 + 2, item_bytes((location, {'a': 'hello'}, [], {})))
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     @classmethod
@@ -149,6 +180,120 @@ class TestMongoModuleStore(object):
                 '{0} is a template course'.format(course)
             )
 
+    def test_cached_max_scores(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+        # without a cache subsystem, nothing is recorded
+        store.cache_max_scores('edX/toy/2012_Fall', {'i4x://edX/toy/problem/a': 1})
+        assert_equals(store.get_cached_max_scores('edX/toy/2012_Fall'), {})
+
+        store.set_modulestore_configuration({'metadata_inheritance_cache_subsystem': DictCache()})
+        store.cache_max_scores('edX/toy/2012_Fall', {'i4x://edX/toy/problem/a': 1})
+        store.cache_max_scores('edX/toy/2012_Fall', {'i4x://edX/toy/problem/b': 2})
+        assert_equals(
+            store.get_cached_max_scores('edX/toy/2012_Fall'),
+            {'i4x://edX/toy/problem/a': 1, 'i4x://edX/toy/problem/b': 2}
+        )
+        assert_equals(store.get_cached_max_scores('edX/simple/2012_Fall'), {})
+
+        # edits to an item (or its draft) invalidate its max score only
+        store.invalidate_cached_max_score(Location('i4x://edX/toy/problem/a@draft'))
+        assert_equals(store.get_cached_max_scores('edX/toy/2012_Fall'), {'i4x://edX/toy/problem/b': 2})
+
+        store.clear_cached_max_scores(Location('i4x://edX/toy/course/2012_Fall'))
+        assert_equals(store.get_cached_max_scores('edX/toy/2012_Fall'), {})
+
+    def test_get_items_settings_fields(self):
+        html_location = Location('i4x', 'edX', 'toy', 'html', None)
+        full = dict((module.location, module) for module in self.store.get_items(html_location))
+        modules = self.store.get_items(html_location, fields=SETTINGS_FIELDS)
+        assert_equals(len(full), len(modules))
+        for module in modules:
+            # the content is only fetched when it is used
+            assert module._model_data._kvs._stored_data is NOT_FETCHED
+            assert_equals(full[module.location].display_name, module.display_name)
+            assert_equals(full[module.location].data, module.data)
+
+    def test_get_item_settings_fields_depth(self):
+        course = self.store.get_item(Location('i4x', 'edX', 'toy', 'course', '2012_Fall'), depth=2, fields=SETTINGS_FIELDS)
+        full_course = self.store.get_item(Location('i4x', 'edX', 'toy', 'course', '2012_Fall'), depth=2)
+        assert_equals(
+            [child.display_name for child in full_course.get_children()],
+            [child.display_name for child in course.get_children()]
+        )
+
+    def test_update_cached_metadata_inheritance_tree(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+        store.set_modulestore_configuration({'metadata_inheritance_cache_subsystem': DictCache()})
+        chapter_location = Location('i4x', 'edX', 'toy', 'chapter', 'Overview')
+        chapter = store.get_item(chapter_location)
+        metadata = own_metadata(chapter)
+        store.get_cached_metadata_inheritance_tree(chapter_location)
+
+        try:
+            store.update_metadata(chapter_location, dict(metadata, graceperiod='3 days'))
+            tree = store.get_cached_metadata_inheritance_tree(chapter_location)
+            assert_equals('3 days', tree['inherited'][chapter.children[0]]['graceperiod'])
+            assert_equals(store.compute_metadata_inheritance_tree(chapter_location), tree)
+        finally:
+            store.update_metadata(chapter_location, metadata)
+
+    def test_concurrent_metadata_inheritance_tree_updates(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+        cache = DictCache()
+        store.set_modulestore_configuration({'metadata_inheritance_cache_subsystem': cache})
+        chapter_location = Location('i4x', 'edX', 'toy', 'chapter', 'Overview')
+        store.get_cached_metadata_inheritance_tree(chapter_location)
+
+        # Another process starts updating the tree, and stores it later
+        generation = cache.incr(metadata_generation_key(chapter_location))
+        _, other_tree = cache[metadata_cache_key(chapter_location)]
+
+        # This update sees the other one, and drops the tree instead of racing it
+        store.update_cached_metadata_inheritance_tree(chapter_location)
+        assert_false(metadata_cache_key(chapter_location) in cache)
+
+        # The tree the other process stores is out of date, and isn't used
+        cache.set(metadata_cache_key(chapter_location), (generation, other_tree))
+        assert_equals(store._get_cached_inheritance_tree_or_none(chapter_location), None)  # pylint: disable=W0212
+
+    def test_get_parent_locations_from_tree(self):
+        store = MongoModuleStore(HOST, DB, COLLECTION, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+        store.set_modulestore_configuration({'metadata_inheritance_cache_subsystem': DictCache()})
+        course_location = Location('i4x', 'edX', 'toy', 'course', '2012_Fall')
+        chapter_location = Location('i4x', 'edX', 'toy', 'chapter', 'Overview')
+        children = store.get_item(course_location).children
+
+        assert_equals([course_location], store.get_parent_locations(chapter_location, 'edX/toy/2012_Fall'))
+        try:
+            store.update_children(course_location, [child for child in children if child != chapter_location.url()])
+            assert_equals([], store.get_parent_locations(chapter_location, 'edX/toy/2012_Fall'))
+        finally:
+            store.update_children(course_location, children)
+        assert_equals([course_location], store.get_parent_locations(chapter_location, 'edX/toy/2012_Fall'))
+
+    def test_bulk_write_items(self):
+        html_location = Location('i4x', 'edX', 'toy', 'html', 'bulk_written')
+        vertical_location = Location('i4x', 'edX', 'toy', 'vertical', 'bulk_written')
+        other_location = Location('i4x', 'edX', 'toy', 'html', 'bulk_written_other')
+        try:
+            self.store.bulk_write_items([
+                (html_location, '<p>first</p>', [], {'display_name': 'First'}),
+                (vertical_location, {}, [html_location.url()], {}),
+            ])
+            # existing items are replaced, and new ones added, in the same batch
+            self.store.bulk_write_items([
+                (html_location, '<p>second</p>', [], {'display_name': 'Second'}),
+                (other_location, '<p>other</p>', [], {}),
+            ])
+            assert_equals('<p>second</p>', self.store.get_item(html_location).data)
+            assert_equals('Second', self.store.get_item(html_location).display_name)
+            assert_equals('<p>other</p>', self.store.get_item(other_location).data)
+            assert_equals([html_location.url()], self.store.get_item(vertical_location).children)
+        finally:
+            self.store.collection.remove({'_id': {'$in': [
+                html_location.dict(), vertical_location.dict(), other_location.dict()
+            ]}})
+
     def test_static_tab_names(self):
         courses = self.store.get_courses()
 
@@ -242,7 +387,44 @@ class TestMongoKeyValueStore(object):
         yield (self._check_delete_default, KeyValueStore.Key(Scope.children, None, None, 'children'), [])
         yield (self._check_delete_key_error, KeyValueStore.Key(Scope.settings, None, None, 'meta'))
 
+    def test_fetch_missing(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(self.location)
+            return self.data, self.metadata
+
+        kvs = MongoKeyValueStore(NOT_FETCHED, self.children, NOT_FETCHED, self.location, 'category', fetch)
+        assert_equals(self.children, kvs.get(KeyValueStore.Key(Scope.children, None, None, 'children')))
+        assert_equals(self.location, kvs.get(KeyValueStore.Key(Scope.content, None, None, 'location')))
+        assert_equals([], fetches)
+
+        assert_equals(self.data['foo'], kvs.get(KeyValueStore.Key(Scope.content, None, None, 'foo')))
+        assert_equals(self.metadata['meta'], kvs.get(KeyValueStore.Key(Scope.settings, None, None, 'meta')))
+        assert_equals([self.location], fetches)
+
     def test_delete_invalid_scope(self):
         for scope in (Scope.preferences, Scope.user_info, Scope.user_state, Scope.parent):
             with assert_raises(InvalidScopeError):
                 self.kvs.delete(KeyValueStore.Key(scope, None, None, 'foo'))
+
+
+def test_update_inherited_metadata():
+    tree = {
+        'root': 'course',
+        'nodes': {
+            'course': {'metadata': {'due': 'monday'}, 'children': ['chapter', 'other_chapter']},
+            'chapter': {'metadata': {}, 'children': ['html']},
+            'other_chapter': {'metadata': {'due': 'friday'}, 'children': ['html']},
+        },
+        'inherited': {},
+    }
+    update_inherited_metadata(tree, 'course', {})
+    assert_equals({}, tree['inherited']['course'])
+    # chapter doesn't set anything, so it shares what its parent passes down
+    assert tree['inherited']['chapter'] is tree['inherited']['other_chapter']
+    assert_equals({'due': 'monday'}, tree['inherited']['other_chapter'])
+
+    tree['nodes']['course']['children'] = ['other_chapter']
+    update_inherited_metadata(tree, 'course', {})
+    assert_equals({'due': 'friday'}, tree['inherited']['html'])
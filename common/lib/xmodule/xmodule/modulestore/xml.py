@@ -21,7 +21,7 @@ from xmodule.x_module import XModuleDescriptor, XMLParsingSystem
 
 from xmodule.html_module import HtmlDescriptor
 
-from . import ModuleStoreBase, Location, XML_MODULESTORE_TYPE
+from . import ModuleStoreBase, Location, XML_MODULESTORE_TYPE, CONTENT_FIELDS
 from .exceptions import ItemNotFoundError
 from .inheritance import compute_inherited_metadata
 
@@ -485,7 +485,7 @@ class XMLModuleStore(ModuleStoreBase):
                     logging.exception("Failed to load {0}. Skipping... Exception: {1}".format(filepath, str(e)))
                     system.error_tracker("ERROR: " + str(e))
 
-    def get_instance(self, course_id, location, depth=0):
+    def get_instance(self, course_id, location, depth=0, fields=CONTENT_FIELDS):
         """
         Returns an XModuleDescriptor instance for the item at
         location, with the policy for course_id.  (In case two xml
@@ -513,7 +513,7 @@ class XMLModuleStore(ModuleStoreBase):
         location = Location(location)
         return location in self.modules[course_id]
 
-    def get_item(self, location, depth=0):
+    def get_item(self, location, depth=0, fields=CONTENT_FIELDS):
         """
         Returns an XModuleDescriptor instance for the item at location.
 
@@ -528,7 +528,7 @@ class XMLModuleStore(ModuleStoreBase):
         raise NotImplementedError("XMLModuleStores can't guarantee that definitions"
                                   " are unique. Use get_instance.")
 
-    def get_items(self, location, course_id=None, depth=0):
+    def get_items(self, location, course_id=None, depth=0, fields=CONTENT_FIELDS):
         items = []
 
         def _add_get_items(self, location, modules):
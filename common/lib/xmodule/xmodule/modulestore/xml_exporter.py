@@ -3,8 +3,13 @@ Methods for exporting course data to XML
 """
 
 import logging
+import tarfile
+import time
+from calendar import timegm
+from cStringIO import StringIO
 from xmodule.modulestore import Location
 from xmodule.modulestore.inheritance import own_metadata
+from fs.memoryfs import MemoryFS
 from fs.osfs import OSFS
 from json import dumps
 import json
@@ -46,18 +51,41 @@ def export_to_xml(modulestore, contentstore, course_location, root_dir, course_d
         alongside the public content in the course.
     """
 
-    course = modulestore.get_item(course_location)
-
     fs = OSFS(root_dir)
     export_fs = fs.makeopendir(course_dir)
 
-    xml = course.export_to_xml(export_fs)
-    with export_fs.open('course.xml', 'w') as course_xml:
-        course_xml.write(xml)
+    export_course_xml(modulestore, course_location, export_fs, draft_modulestore)
 
     # export the static assets
     contentstore.export_all_for_course(course_location, root_dir + '/' + course_dir + '/static/')
 
+
+def export_to_tar(modulestore, contentstore, course_location, course_dir, draft_modulestore=None):
+    """
+    Export all modules from `modulestore` and content from `contentstore` as a
+    gzipped tar of the course's xml, with everything in `course_dir`.
+
+    The xml is exported in memory before this returns, so that errors
+    exporting modules are raised here. Returns an iterator over the chunks of
+    the tar.gz, which reads the static assets from the `contentstore` a chunk at
+    a time as it goes, so it can be sent as a streaming response.
+    """
+    export_fs = MemoryFS()
+    export_course_xml(modulestore, course_location, export_fs, draft_modulestore)
+    return _tar_chunks(export_fs, contentstore, course_location, course_dir)
+
+
+def export_course_xml(modulestore, course_location, export_fs, draft_modulestore=None):
+    """
+    Export all modules of the course at `course_location` from `modulestore` as xml
+    to the filesystem `export_fs`. The static assets aren't exported.
+    """
+    course = modulestore.get_item(course_location)
+
+    xml = course.export_to_xml(export_fs)
+    with export_fs.open('course.xml', 'w') as course_xml:
+        course_xml.write(xml)
+
     # export the static tabs
     export_extra_content(export_fs, modulestore, course_location, 'static_tab', 'tabs', '.html')
 
@@ -102,6 +130,81 @@ def export_to_xml(modulestore, contentstore, course_location, root_dir, course_d
                     draft_vertical.export_to_xml(draft_course_dir)
 
 
+class _TarSink(object):
+    """
+    A file for a streamed tarfile to write to, which holds what's written
+    until it's drained
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def drain(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _tar_chunks(export_fs, contentstore, course_location, course_dir):
+    """
+    Yield the chunks of a tar.gz of the files in `export_fs`, and of the static
+    assets of the course in `contentstore`, in `course_dir`
+    """
+    sink = _TarSink()
+    tar = tarfile.open(mode='w|gz', fileobj=sink)
+
+    now = time.time()
+    for file_path in export_fs.walkfiles():
+        data = export_fs.getcontents(file_path)
+        tarinfo = tarfile.TarInfo(course_dir + file_path)
+        tarinfo.size = len(data)
+        tarinfo.mtime = now
+        tar.addfile(tarinfo, StringIO(data))
+        data = sink.drain()
+        if data:
+            yield data
+
+    for asset in contentstore.get_all_content_for_course(course_location):
+        content = contentstore.find(Location(asset['_id']), as_stream=True)
+        try:
+            tarinfo = tarfile.TarInfo('{0}/static/{1}'.format(course_dir, content.get_export_path()))
+            tarinfo.size = content.length
+            tarinfo.mtime = timegm(content.last_modified_at.utctimetuple())
+            for data in _add_streamed_file(tar, tarinfo, content.stream_data(), sink):
+                yield data
+        finally:
+            content.close()
+
+    tar.close()
+    yield sink.drain()
+
+
+def _add_streamed_file(tar, tarinfo, chunks, sink):
+    """
+    Add a file with the data in the iterable `chunks` to `tar`, like
+    TarFile.addfile, yielding what's written to `sink` as it goes rather than
+    reading all of the file first
+    """
+    header = tarinfo.tobuf(tar.format, tar.encoding, tar.errors)
+    tar.fileobj.write(header)
+    tar.offset += len(header)
+
+    for chunk in chunks:
+        tar.fileobj.write(chunk)
+        data = sink.drain()
+        if data:
+            yield data
+
+    # pad the file to a whole number of blocks
+    blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+    if remainder > 0:
+        tar.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+        blocks += 1
+    tar.offset += blocks * tarfile.BLOCKSIZE
+
+
 def export_extra_content(export_fs, modulestore, course_location, category_type, dirname, file_suffix=''):
     query_loc = Location('i4x', course_location.org, course_location.course, category_type, None)
     items = modulestore.get_items(query_loc)
@@ -1,78 +1,140 @@
+import json
 import logging
 import os
 import mimetypes
+import time
+from functools import partial
+from multiprocessing.pool import ThreadPool
 from path import path
 
 from xblock.core import Scope
 
 from .xml import XMLModuleStore, ImportSystem, ParentTracker
 from xmodule.modulestore import Location
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import StaticContent, STREAM_DATA_CHUNK_SIZE
 from .inheritance import own_metadata
 from xmodule.errortracker import make_error_tracker
 from .store_utilities import rewrite_nonportable_content_links
 
 log = logging.getLogger(__name__)
 
+# How many threads upload static files while a course is imported
+STATIC_IMPORT_WORKERS = 4
 
-def import_static_content(modules, course_loc, course_data_path, static_content_store, target_location_namespace,
-                          subpath='static', verbose=False):
+# The most modules, and the most bytes of module data, written to the store at once
+IMPORT_BATCH_SIZE = 100
+IMPORT_BATCH_BYTES = 4 * 1024 * 1024
 
-    remap_dict = {}
 
-    # now import all static assets
-    static_dir = course_data_path / subpath
+def item_bytes(item):
+    """
+    Return about how many bytes the (location, data, children, metadata) of a
+    module take up when written
+    """
+    _, data, children, metadata = item
+    if isinstance(data, basestring):
+        size = len(data)
+    else:
+        size = len(json.dumps(data, default=unicode))
+    return size + len(json.dumps(children, default=unicode)) + len(json.dumps(metadata, default=unicode))
 
-    verbose = True
 
-    for dirname, dirnames, filenames in os.walk(static_dir):
+def import_static_content(modules, course_loc, course_data_path, static_content_store, target_location_namespace,
+                          subpath='static', verbose=False, workers=STATIC_IMPORT_WORKERS):
+    """
+    Import the static files in the subpath directory of the course into
+    static_content_store, using `workers` threads, and return a dict of the
+    path of each file to the name of its asset
+    """
+    pool = ThreadPool(workers)
+    try:
+        return dict(start_static_content_import(
+            pool, course_data_path, static_content_store, target_location_namespace, subpath, verbose
+        ).get())
+    finally:
+        pool.close()
+        pool.join()
+
+
+def start_static_content_import(pool, course_data_path, static_content_store, target_location_namespace,
+                                subpath='static', verbose=False):
+    """
+    Start importing the static files in the subpath directory of the course
+    into static_content_store with the workers of pool (a ThreadPool).
+
+    Returns an AsyncResult whose get() returns a dict of the path of each file
+    to the name of its asset, once they've all been imported.
+    """
+    static_dir = course_data_path / subpath
+    content_paths = []
+    for dirname, _dirnames, filenames in os.walk(static_dir):
         for filename in filenames:
+            content_paths.append(os.path.join(dirname, filename))
 
-            try:
-                content_path = os.path.join(dirname, filename)
-                if verbose:
-                    log.debug('importing static content {0}...'.format(content_path))
+    import_file = partial(
+        _import_static_file, static_dir, static_content_store, target_location_namespace, verbose
+    )
+    return pool.map_async(import_file, content_paths)
 
-                fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
-                if fullname_with_subpath.startswith('/'):
-                    fullname_with_subpath = fullname_with_subpath[1:]
-                content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
-                mime_type = mimetypes.guess_type(filename)[0]
 
-                with open(content_path, 'rb') as f:
-                    data = f.read()
+def _import_static_file(static_dir, static_content_store, target_location_namespace, verbose, content_path):
+    """
+    Import the static file at content_path, streaming it into the
+    static_content_store, and return the (path, asset name) to remap it with
+    """
+    if verbose:
+        log.debug('importing static content {0}...'.format(content_path))
 
-                content = StaticContent(content_loc, filename, mime_type, data, import_path=fullname_with_subpath)
+    fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
+    if fullname_with_subpath.startswith('/'):
+        fullname_with_subpath = fullname_with_subpath[1:]
+    content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
+    filename = os.path.basename(content_path)
+    mime_type = mimetypes.guess_type(filename)[0]
 
-                # first let's save a thumbnail so we can get back a thumbnail location
-                (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content)
+    content = StaticContent(content_loc, filename, mime_type, _file_chunks(content_path), import_path=fullname_with_subpath)
 
-                if thumbnail_content is not None:
-                    content.thumbnail_location = thumbnail_location
+    # first let's save a thumbnail so we can get back a thumbnail location
+    (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content, tempfile_path=content_path)
 
-                #then commit the content
-                try:
-                    static_content_store.save(content)
-                except Exception as err:
-                    log.exception('Error importing {0}, error={1}'.format(fullname_with_subpath, err))
+    if thumbnail_content is not None:
+        content.thumbnail_location = thumbnail_location
 
-                #store the remapping information which will be needed to subsitute in the module data
-                remap_dict[fullname_with_subpath] = content_loc.name
-            except:
-                raise
+    #then commit the content
+    try:
+        static_content_store.save(content)
+    except Exception as err:
+        log.exception('Error importing {0}, error={1}'.format(fullname_with_subpath, err))
 
-    return remap_dict
+    #store the remapping information which will be needed to subsitute in the module data
+    return fullname_with_subpath, content_loc.name
+
+
+def _file_chunks(file_path):
+    """
+    Yield the contents of the file at file_path in chunks
+    """
+    with open(file_path, 'rb') as static_file:
+        while True:
+            chunk = static_file.read(STREAM_DATA_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
 
 
 def import_from_xml(store, data_dir, course_dirs=None,
                     default_class='xmodule.raw_module.RawDescriptor',
                     load_error_modules=True, static_content_store=None, target_location_namespace=None,
                     verbose=False, draft_store=None,
-                    do_import_static=True):
+                    do_import_static=True, static_workers=STATIC_IMPORT_WORKERS):
     """
     Import the specified xml data_dir into the "store" modulestore,
     using org and course as the location org and course.
 
+    The static files of each course are uploaded by static_workers threads
+    while its modules are written, in batches if the store supports
+    bulk_write_items.
+
     course_dirs: If specified, the list of course_dirs to load. Otherwise, load
     all course dirs
 
@@ -87,12 +149,14 @@ def import_from_xml(store, data_dir, course_dirs=None,
 
     """
 
+    started = time.time()
     xml_module_store = XMLModuleStore(
         data_dir,
         default_class=default_class,
         course_dirs=course_dirs,
         load_error_modules=load_error_modules
     )
+    log.info('Parsed {0} in {1:.1f}s'.format(course_dirs or data_dir, time.time() - started))
 
     # NOTE: the XmlModuleStore does not implement get_items() which would be a preferable means
     # to enumerate the entire collection of course modules. It will be left as a TBD to implement that
@@ -106,6 +170,8 @@ def import_from_xml(store, data_dir, course_dirs=None,
             course_id_components = course_id.split('/')
             pseudo_course_id = '/'.join([course_id_components[0], course_id_components[1]])
 
+        static_pool = ThreadPool(static_workers)
+        static_imports = []
         try:
             # turn off all write signalling while importing as this is a high volume operation
             if pseudo_course_id not in store.ignore_write_events_on_courses:
@@ -150,13 +216,16 @@ def import_from_xml(store, data_dir, course_dirs=None,
 
                     course_items.append(module)
 
-            # then import all the static content
+            # then start importing all the static content, while the modules are written
+            started = time.time()
             if static_content_store is not None and do_import_static:
                 _namespace_rename = target_location_namespace if target_location_namespace is not None else course_location
 
                 # first pass to find everything in /static/
-                import_static_content(xml_module_store.modules[course_id], course_location, course_data_path, static_content_store,
-                                      _namespace_rename, subpath='static', verbose=verbose)
+                static_imports.append(start_static_content_import(
+                    static_pool, course_data_path, static_content_store, _namespace_rename,
+                    subpath='static', verbose=verbose
+                ))
 
             elif verbose and not do_import_static:
                 log.debug('Skipping import of static content, since do_import_static={0}'.format(do_import_static))
@@ -172,50 +241,100 @@ def import_from_xml(store, data_dir, course_dirs=None,
             if os.path.exists(course_data_path / simport):
                 _namespace_rename = target_location_namespace if target_location_namespace is not None else course_location
 
-                import_static_content(xml_module_store.modules[course_id], course_location, course_data_path, static_content_store,
-                                      _namespace_rename, subpath=simport, verbose=verbose)
+                static_imports.append(start_static_content_import(
+                    static_pool, course_data_path, static_content_store, _namespace_rename,
+                    subpath=simport, verbose=verbose
+                ))
 
             # finally loop through all the modules
-            for module in xml_module_store.modules[course_id].itervalues():
-                if module.category == 'course':
-                    # we've already saved the course module up at the top of the loop
-                    # so just skip over it in the inner loop
-                    continue
-
-                # remap module to the new namespace
-                if target_location_namespace is not None:
-                    module = remap_namespace(module, target_location_namespace)
-
-                if verbose:
-                    log.debug('importing module location {0}'.format(module.location))
-
-                import_module(module, store, course_data_path, static_content_store, course_location,
-                              target_location_namespace if target_location_namespace else course_location,
-                              do_import_static=do_import_static)
+            modules_started = time.time()
+            import_modules(
+                xml_module_store.modules[course_id], store, course_data_path, static_content_store,
+                course_location, target_location_namespace, do_import_static=do_import_static, verbose=verbose
+            )
+            log.info('Imported the modules of {0} in {1:.1f}s'.format(course_id, time.time() - modules_started))
 
             # now import any 'draft' items
             if draft_store is not None:
+                drafts_started = time.time()
                 import_course_draft(xml_module_store, store, draft_store, course_data_path,
                                     static_content_store, course_location, target_location_namespace if target_location_namespace
                                     else course_location)
+                log.info('Imported the drafts of {0} in {1:.1f}s'.format(course_id, time.time() - drafts_started))
+
+            static_count = sum(len(static_import.get()) for static_import in static_imports)
+            log.info('Imported {0} static files of {1} in {2:.1f}s'.format(static_count, course_id, time.time() - started))
 
         finally:
+            static_pool.close()
+            static_pool.join()
+
             # turn back on all write signalling
             if pseudo_course_id in store.ignore_write_events_on_courses:
                 store.ignore_write_events_on_courses.remove(pseudo_course_id)
                 store.refresh_cached_metadata_inheritance_tree(
                     target_location_namespace if target_location_namespace is not None else course_location
                 )
+                store.clear_cached_max_scores(
+                    target_location_namespace if target_location_namespace is not None else course_location
+                )
 
     return xml_module_store, course_items
 
 
-def import_module(module, store, course_data_path, static_content_store,
-                  source_course_location, dest_course_location, allow_not_found=False,
-                  do_import_static=True):
+def import_modules(modules, store, course_data_path, static_content_store, course_location,
+                   target_location_namespace, do_import_static=True, verbose=False):
+    """
+    Import all of the modules of a course, except the course itself, into
+    store. If the store can, they're written in batches with bulk_write_items,
+    and the store is told about the changes to the course at the end.
+    """
+    dest_course_location = target_location_namespace if target_location_namespace else course_location
+    bulk_write_items = getattr(store, 'bulk_write_items', None)
+    batch = []
+    batch_bytes = 0
+    count = 0
+    for module in modules.itervalues():
+        if module.category == 'course':
+            # we've already saved the course module up at the top of the loop
+            # so just skip over it in the inner loop
+            continue
 
-    logging.debug('processing import of module {0}...'.format(module.location.url()))
+        # remap module to the new namespace
+        if target_location_namespace is not None:
+            module = remap_namespace(module, target_location_namespace)
+
+        if verbose:
+            log.debug('importing module location {0}'.format(module.location))
+
+        count += 1
+        # static tabs also update the course's tabs when they're written, see update_metadata
+        if bulk_write_items is None or module.location.category == 'static_tab':
+            import_module(module, store, course_data_path, static_content_store, course_location,
+                          dest_course_location, do_import_static=do_import_static)
+            continue
+
+        item = (module.location,) + import_module_fields(module, course_location, dest_course_location, do_import_static)
+        batch.append(item)
+        batch_bytes += item_bytes(item)
+        if len(batch) >= IMPORT_BATCH_SIZE or batch_bytes >= IMPORT_BATCH_BYTES:
+            bulk_write_items(batch)
+            log.info('Imported {0} of {1} modules of {2}'.format(count, len(modules) - 1, dest_course_location.course_id))
+            batch = []
+            batch_bytes = 0
 
+    if bulk_write_items is not None:
+        bulk_write_items(batch)
+        if hasattr(store, 'fire_updated_modulestore_signal'):
+            store.fire_updated_modulestore_signal(
+                '/'.join([dest_course_location.org, dest_course_location.course]), dest_course_location
+            )
+
+
+def import_module_fields(module, source_course_location, dest_course_location, do_import_static=True):
+    """
+    Return the (data, children, metadata) to write to the store for module
+    """
     content = {}
     for field in module.fields:
         if field.scope != Scope.content:
@@ -238,13 +357,7 @@ def import_module(module, store, course_data_path, static_content_store,
         module_data = rewrite_nonportable_content_links(
             source_course_location.course_id, dest_course_location.course_id, module_data)
 
-    if allow_not_found:
-        store.update_item(module.location, module_data, allow_not_found=allow_not_found)
-    else:
-        store.update_item(module.location, module_data)
-
-    if hasattr(module, 'children') and module.children != []:
-        store.update_children(module.location, module.children)
+    children = getattr(module, 'children', None) or []
 
     # NOTE: It's important to use own_metadata here to avoid writing
     # inherited metadata everywhere.
@@ -257,7 +370,28 @@ def import_module(module, store, course_data_path, static_content_store,
         del module.xml_attributes['index_in_children_list']
     module.save()
 
-    store.update_metadata(module.location, dict(own_metadata(module)))
+    return module_data, children, dict(own_metadata(module))
+
+
+def import_module(module, store, course_data_path, static_content_store,
+                  source_course_location, dest_course_location, allow_not_found=False,
+                  do_import_static=True):
+
+    logging.debug('processing import of module {0}...'.format(module.location.url()))
+
+    module_data, children, metadata = import_module_fields(
+        module, source_course_location, dest_course_location, do_import_static
+    )
+
+    if allow_not_found:
+        store.update_item(module.location, module_data, allow_not_found=allow_not_found)
+    else:
+        store.update_item(module.location, module_data)
+
+    if children != []:
+        store.update_children(module.location, children)
+
+    store.update_metadata(module.location, metadata)
 
 
 def import_course_draft(xml_module_store, store, draft_store, course_data_path, static_content_store, source_location_namespace, target_location_namespace):
@@ -28,6 +28,13 @@ class HtmlModuleSubstitutionTestCase(unittest.TestCase):
         self.assertEqual(module.get_html(), sample_xml)
 
 
+    def test_user_state_independent(self):
+        module = HtmlModule(get_test_system(), self.descriptor, {'data': '<p>Hi!</p>'})
+        self.assertTrue(module.user_state_independent)
+
+        module = HtmlModule(get_test_system(), self.descriptor, {'data': '<p>Hi %%USER_ID%%!</p>'})
+        self.assertFalse(module.user_state_independent)
+
     def test_substitution_without_anonymous_student_id(self):
         sample_xml = '''%%USER_ID%%'''
         module_data = {'data': sample_xml}
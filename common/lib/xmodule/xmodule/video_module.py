@@ -132,6 +132,7 @@ class VideoModule(VideoFields, XModule):
     """
     video_time = 0
     icon_class = 'video'
+    user_state_independent = True
 
     js = {
         'js': [
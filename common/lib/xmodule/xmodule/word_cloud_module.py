@@ -13,6 +13,7 @@ from pkg_resources import resource_string
 from xmodule.raw_module import EmptyDataRawDescriptor
 from xmodule.editing_module import MetadataOnlyEditingDescriptor
 from xmodule.x_module import XModule
+from xmodule.content_counters import content_counters
 
 from xblock.core import Scope, Dict, Boolean, List, Integer, String
 
@@ -73,6 +74,7 @@ class WordCloudFields(object):
         help="All possible words from all students.",
         scope=Scope.content
     )
+    # Not updated any more: the top words are computed from all_words
     top_words = Dict(
         help="Top num_top_words words for word cloud.",
         scope=Scope.content
@@ -92,21 +94,26 @@ class WordCloudModule(WordCloudFields, XModule):
     css = {'scss': [resource_string(__name__, 'css/word_cloud/display.scss')]}
     js_module_name = "WordCloud"
 
-    def get_state(self):
-        """Return success json answer for client."""
+    def get_state(self, student_word_counts=None):
+        """Return success json answer for client.
+
+        :param student_word_counts: The current counts of the student's
+            words, if they're known already
+        """
         if self.submitted:
-            total_count = sum(self.all_words.itervalues())
+            counters = content_counters(self, 'all_words')
+            if student_word_counts is None:
+                student_word_counts = counters.counts(self.student_words)
+            top_words, total_count = counters.top(self.num_top_words)
             return json.dumps({
                 'status': 'success',
                 'submitted': True,
                 'display_student_percents': pretty_bool(
                     self.display_student_percents
                 ),
-                'student_words': {
-                    word: self.all_words[word] for word in self.student_words
-                },
+                'student_words': student_word_counts,
                 'total_count': total_count,
-                'top_words': self.prepare_words(self.top_words, total_count)
+                'top_words': self.prepare_words(top_words, total_count)
             })
         else:
             return json.dumps({
@@ -156,24 +163,6 @@ class WordCloudModule(WordCloudFields, XModule):
             )
         return list_to_return
 
-    def top_dict(self, dict_obj, amount):
-        """Return top words from all words, filtered by number of
-        occurences
-
-        :param dict_obj: all words
-        :type dict_obj: dict
-        :param amount: number of words to be in top dict
-        :type amount: int
-        :rtype: dict
-        """
-        return dict(
-            sorted(
-                dict_obj.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:amount]
-        )
-
     def handle_ajax(self, dispatch, data):
         """Ajax handler.
 
@@ -198,27 +187,15 @@ class WordCloudModule(WordCloudFields, XModule):
 
             self.student_words = student_words
 
-            # FIXME: fix this, when xblock will support mutable types.
-            # Now we use this hack.
-            # speed issues
-            temp_all_words = self.all_words
-
             self.submitted = True
 
-            # Save in all_words.
+            # Count the words in all_words.
+            word_counts = {}
             for word in self.student_words:
-                temp_all_words[word] = temp_all_words.get(word, 0) + 1
-
-            # Update top_words.
-            self.top_words = self.top_dict(
-                temp_all_words,
-                self.num_top_words
-            )
+                word_counts[word] = word_counts.get(word, 0) + 1
+            student_word_counts = content_counters(self, 'all_words').increment(word_counts)
 
-            # Save all_words in database.
-            self.all_words = temp_all_words
-
-            return self.get_state()
+            return self.get_state(student_word_counts)
         elif dispatch == 'get_state':
             return self.get_state()
         else:
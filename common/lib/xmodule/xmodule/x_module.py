@@ -1,5 +1,7 @@
 import logging
 import copy
+import hashlib
+import json
 import yaml
 import os
 
@@ -151,6 +153,12 @@ class XModule(XModuleFields, HTMLSnippet, XBlock):
     # in the module
     icon_class = 'other'
 
+    # Whether get_html depends only on the content and settings of the module,
+    # and not on the student or their state, so that the html can be shared
+    # between students. Subclasses can override this with a property if it
+    # depends on the data in the module
+    user_state_independent = False
+
 
     def __init__(self, runtime, descriptor, model_data):
         '''
@@ -699,6 +707,17 @@ class XModuleDescriptor(XModuleFields, HTMLSnippet, ResourceTemplates, XBlock):
                     result[field.name] = self._model_data[field.name]
             return result
 
+    def content_version(self):
+        """
+        Return a digest of the content and settings that are set on this
+        xblock, which changes whenever they do.
+        """
+        fields = {
+            'content': self.get_explicitly_set_fields_by_scope(Scope.content),
+            'settings': self.get_explicitly_set_fields_by_scope(Scope.settings),
+        }
+        return hashlib.md5(json.dumps(fields, sort_keys=True, default=unicode)).hexdigest()
+
     @property
     def editable_metadata_fields(self):
         """
@@ -857,7 +876,7 @@ class ModuleSystem(Runtime):
             anonymous_student_id='', course_id=None,
             open_ended_grading_interface=None, s3_interface=None,
             cache=None, can_execute_unsafe_code=None, replace_course_urls=None,
-            replace_jump_to_id_urls=None):
+            replace_jump_to_id_urls=None, content_counters=None):
         '''
         Create a closure around the system environment.
 
@@ -907,6 +926,10 @@ class ModuleSystem(Runtime):
         can_execute_unsafe_code - A function returning a boolean, whether or
             not to allow the execution of unsafe, unsandboxed code.
 
+        content_counters - A service that keeps counts that all students add
+            to, such as the votes of a poll (see xmodule.content_counters), or
+            None to keep them in the module's fields.
+
         '''
         self.ajax_url = ajax_url
         self.xqueue = xqueue
@@ -935,6 +958,7 @@ class ModuleSystem(Runtime):
         self.can_execute_unsafe_code = can_execute_unsafe_code or (lambda: False)
         self.replace_course_urls = replace_course_urls
         self.replace_jump_to_id_urls = replace_jump_to_id_urls
+        self.content_counters = content_counters
 
     def get(self, attr):
         '''	provide uniform access to attributes (like etree).'''
@@ -19,8 +19,18 @@ The distribution in a course for gender might look like:
         'o': 'Other',
         'f': 'Female'
 }
+
+The distributions of all features are counted together, with one grouped query
+over the profiles of the students enrolled in the course, from the database
+named by settings.DATABASE_FOR_ANALYTICS (e.g. a read replica). The counts are
+cached for settings.ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT seconds, or until an
+enrollment in the course changes.
 """
 
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count
 from student.models import CourseEnrollment, UserProfile
 
@@ -91,80 +101,107 @@ def profile_distribution(course_id, feature):
     NOTE: no_data will appear as a key instead of None/null to adhere to the json spec.
     data types are EASY_CHOICE or OPEN_CHOICE
     """
+    return profile_distributions(course_id, [feature])[feature]
+
+
+def profile_distributions(course_id, features=AVAILABLE_PROFILE_FEATURES):
+    """
+    Retrieve the distributions of students over each of features, which are
+    some of AVAILABLE_PROFILE_FEATURES.
+
+    Returns a dict of feature -> ProfileDistribution instance.
+    """
+    for feature in features:
+        if not feature in AVAILABLE_PROFILE_FEATURES:
+            raise ValueError(
+                "unsupported feature requested for distribution '{}'".format(
+                    feature)
+            )
+
+    counts = _feature_counts(course_id)
+
+    distributions = {}
+    for feature in features:
+        prd = ProfileDistribution(feature)
+
+        if feature in _EASY_CHOICE_FEATURES:
+            prd.type = 'EASY_CHOICE'
+
+            if feature == 'gender':
+                raw_choices = UserProfile.GENDER_CHOICES
+            elif feature == 'level_of_education':
+                raw_choices = UserProfile.LEVEL_OF_EDUCATION_CHOICES
+
+            # short name and display name (full) of the choices.
+            choices = [(short, full)
+                       for (short, full) in raw_choices] + [('no_data', 'No Data')]
+
+            distribution = {}
+            for (short, full) in choices:
+                # handle no data case
+                if short == 'no_data':
+                    distribution['no_data'] = counts[feature].get(None, 0) + counts[feature].get('', 0)
+                else:
+                    distribution[short] = counts[feature].get(short, 0)
 
-    if not feature in AVAILABLE_PROFILE_FEATURES:
-        raise ValueError(
-            "unsupported feature requested for distribution '{}'".format(
-                feature)
-        )
-
-    prd = ProfileDistribution(feature)
-
-    if feature in _EASY_CHOICE_FEATURES:
-        prd.type = 'EASY_CHOICE'
-
-        if feature == 'gender':
-            raw_choices = UserProfile.GENDER_CHOICES
-        elif feature == 'level_of_education':
-            raw_choices = UserProfile.LEVEL_OF_EDUCATION_CHOICES
-
-        # short name and display name (full) of the choices.
-        choices = [(short, full)
-                   for (short, full) in raw_choices] + [('no_data', 'No Data')]
-
-        def get_filter(feature, value):
-            """ Get the orm filter parameters for a feature. """
-            return {
-                'gender': {'user__profile__gender': value},
-                'level_of_education': {'user__profile__level_of_education': value},
-            }[feature]
-
-        def get_count(feature, value):
-            """ Get the count of enrolled students matching the feature value. """
-            return CourseEnrollment.objects.filter(
-                course_id=course_id,
-                **get_filter(feature, value)
-            ).count()
-
-        distribution = {}
-        for (short, full) in choices:
-            # handle no data case
-            if short == 'no_data':
-                distribution['no_data'] = 0
-                distribution['no_data'] += get_count(feature, None)
-                distribution['no_data'] += get_count(feature, '')
-            else:
-                distribution[short] = get_count(feature, short)
-
-        prd.data = distribution
-        prd.choices_display_names = dict(choices)
-    elif feature in _OPEN_CHOICE_FEATURES:
-        prd.type = 'OPEN_CHOICE'
-        profiles = UserProfile.objects.filter(
-            user__courseenrollment__course_id=course_id
-        )
-        query_distribution = profiles.values(
-            feature).annotate(Count(feature)).order_by()
-        # query_distribution is of the form [{'featureval': 'value1', 'featureval__count': 4},
-        #    {'featureval': 'value2', 'featureval__count': 2}, ...]
-
-        distribution = dict((vald[feature], vald[feature + '__count'])
-                            for vald in query_distribution)
-        # distribution is of the form {'value1': 4, 'value2': 2, ...}
-
-        # change none to no_data for valid json key
-        if None in distribution:
-            # django does not properly count NULL values when using annotate Count
-            # so
-            #     distribution['no_data'] = distribution.pop(None)
-            # would always be 0.
-
-            # Correctly count null values
-            distribution['no_data'] = profiles.filter(
-                **{feature: None}
-            ).count()
-
-        prd.data = distribution
-
-    prd.validate()
-    return prd
+            prd.data = distribution
+            prd.choices_display_names = dict(choices)
+        elif feature in _OPEN_CHOICE_FEATURES:
+            prd.type = 'OPEN_CHOICE'
+
+            # distribution is of the form {'value1': 4, 'value2': 2, ...}
+            distribution = dict(counts[feature])
+
+            # change none to no_data for valid json key
+            if None in distribution:
+                distribution['no_data'] = distribution.pop(None)
+
+            prd.data = distribution
+
+        prd.validate()
+        distributions[feature] = prd
+    return distributions
+
+
+def _cache_key(course_id):
+    """ The cache key of the feature counts of course_id. """
+    return u'analytics.distributions.{}'.format(course_id)
+
+
+def _feature_counts(course_id):
+    """
+    Return a dict of feature -> {value: count} for all of
+    AVAILABLE_PROFILE_FEATURES, over the profiles of the students enrolled in
+    course_id.
+    """
+    cache_timeout = getattr(settings, 'ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT', 300)
+    if cache_timeout:
+        counts = cache.get(_cache_key(course_id))
+        if counts is not None:
+            return counts
+
+    db = getattr(settings, 'DATABASE_FOR_ANALYTICS', 'default')
+    # One row per combination of feature values, e.g.
+    # {'gender': 'f', 'level_of_education': 'b', 'year_of_birth': 1980, 'count': 4}.
+    # Counting the ids, rather than a feature, also counts the NULL values.
+    rows = UserProfile.objects.using(db).filter(
+        user__courseenrollment__course_id=course_id
+    ).values(*AVAILABLE_PROFILE_FEATURES).annotate(count=Count('id')).order_by()
+
+    counts = dict((feature, defaultdict(int)) for feature in AVAILABLE_PROFILE_FEATURES)
+    for row in rows.iterator():
+        for feature in AVAILABLE_PROFILE_FEATURES:
+            counts[feature][row[feature]] += row['count']
+    counts = dict((feature, dict(values)) for feature, values in counts.iteritems())
+
+    if cache_timeout:
+        cache.set(_cache_key(course_id), counts, cache_timeout)
+    return counts
+
+
+def forget_feature_counts(course_id):
+    """
+    Forget the cached feature counts of course_id, after its enrollments
+    change (see instructor.models)
+    """
+    cache.delete(_cache_key(course_id))
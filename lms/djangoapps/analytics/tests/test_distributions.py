@@ -1,11 +1,12 @@
 """ Tests for analytics.distributions """
 
+from django.core.cache import cache
 from django.test import TestCase
 from nose.tools import raises
 from student.models import CourseEnrollment
 from student.tests.factories import UserFactory
 
-from analytics.distributions import profile_distribution, AVAILABLE_PROFILE_FEATURES
+from analytics.distributions import profile_distribution, profile_distributions, AVAILABLE_PROFILE_FEATURES
 
 
 class TestAnalyticsDistributions(TestCase):
@@ -90,3 +91,39 @@ class TestAnalyticsDistributionsNoData(TestCase):
         self.assertEqual(distribution.choices_display_names, None)
         self.assertIn('no_data', distribution.data)
         self.assertEqual(distribution.data['no_data'], len(self.nodata_users))
+
+
+class TestAnalyticsDistributionsQueries(TestCase):
+    '''Test that distributions are counted together and cached.'''
+
+    def setUp(self):
+        cache.clear()
+        self.course_id = 'some/robot/course/id'
+
+        self.users = [UserFactory(
+            profile__gender=['m', 'f'][i % 2],
+            profile__year_of_birth=i % 3 + 1930,
+        ) for i in xrange(6)]
+
+        for user in self.users:
+            CourseEnrollment.enroll(user, self.course_id)
+
+    def test_all_features_in_one_query(self):
+        with self.assertNumQueries(1):
+            distributions = profile_distributions(self.course_id)
+        self.assertEqual(set(distributions), set(AVAILABLE_PROFILE_FEATURES))
+        self.assertEqual(distributions['gender'].data['m'], 3)
+        self.assertEqual(distributions['gender'].data['no_data'], 0)
+        self.assertEqual(distributions['level_of_education'].data['no_data'], 6)
+        self.assertEqual(distributions['year_of_birth'].data, {1930: 2, 1931: 2, 1932: 2})
+
+    def test_cached_until_enrollment_changes(self):
+        profile_distribution(self.course_id, 'gender')
+        with self.assertNumQueries(0):
+            self.assertEqual(profile_distribution(self.course_id, 'gender').data['f'], 3)
+
+        CourseEnrollment.enroll(UserFactory(profile__gender='f'), self.course_id)
+        self.assertEqual(profile_distribution(self.course_id, 'gender').data['f'], 4)
+
+        CourseEnrollment.objects.filter(user=self.users[1]).delete()
+        self.assertEqual(profile_distribution(self.course_id, 'gender').data['f'], 3)
@@ -1,16 +1,32 @@
 from django.core.management.base import BaseCommand
-from certificates.models import certificate_status_for_student
+from certificates.models import GeneratedCertificate
 from certificates.queue import XQueueCertInterface
+from courseware import grades
+from courseware.model_data import chunks
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.client import RequestFactory
 from optparse import make_option
 from django.conf import settings
 from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore.django import modulestore
 from certificates.models import CertificateStatuses
+from collections import defaultdict
+from multiprocessing import Pool
 import datetime
+import itertools
+import json
+import os
 from pytz import UTC
 
 
+# The course being graded by grade_students. It is set before the
+# grading processes are started, so that they share the course tree
+# that was loaded already.
+_GRADING_COURSE = []
+
+
 class Command(BaseCommand):
 
     help = """
@@ -20,6 +36,16 @@ class Command(BaseCommand):
 
     Use the --noop option to test without actually
     putting certificates on the queue to be generated.
+
+    Students are graded --chunk-size at a time, and the
+    certificate requests of each chunk are put on the queue
+    by --send-workers threads. With --processes greater than
+    1, worker processes grade the next chunks meanwhile;
+    otherwise a chunk is graded once the one before it has
+    been queued. The id of the last student whose
+    request was queued is kept in a state file for each course
+    (ungenerated_certs.<course>.json), so that an interrupted
+    run continues where it stopped.
     """
 
     option_list = BaseCommand.option_list + (
@@ -42,6 +68,22 @@ class Command(BaseCommand):
                     'whose entry in the certificate table matches STATUS. '
                     'STATUS can be generating, unavailable, deleted, error '
                     'or notpassing.'),
+        make_option('-p', '--processes',
+                    type='int',
+                    dest='processes',
+                    default=1,
+                    help='Number of processes grading students at once'),
+        make_option('--send-workers',
+                    type='int',
+                    dest='send_workers',
+                    default=4,
+                    help='Number of certificate requests to put '
+                    'on the queue at once'),
+        make_option('--chunk-size',
+                    type='int',
+                    dest='chunk_size',
+                    default=100,
+                    help='Number of students to grade and queue together'),
     )
 
     def handle(self, *args, **options):
@@ -51,14 +93,10 @@ class Command(BaseCommand):
         # to something else with the force flag
 
         if options['force']:
-            valid_statuses = getattr(CertificateStatuses, options['force'])
+            valid_statuses = [getattr(CertificateStatuses, options['force'])]
         else:
             valid_statuses = [CertificateStatuses.unavailable]
 
-        # Print update after this many students
-
-        STATUS_INTERVAL = 500
-
         if options['course']:
             ended_courses = [options['course']]
         else:
@@ -75,33 +113,141 @@ class Command(BaseCommand):
         for course_id in ended_courses:
             # prefetch all chapters/sequentials by saying depth=2
             course = modulestore().get_instance(course_id, CourseDescriptor.id_to_location(course_id), depth=2)
+            state_file = 'ungenerated_certs.{0}.json'.format(course_id.replace('/', '.'))
+            last_student_id = load_state(state_file)
 
             print "Fetching enrolled students for {0}".format(course_id)
-            enrolled_students = User.objects.filter(
-                courseenrollment__course_id=course_id).prefetch_related(
-                    "groups").order_by('username')
+            student_ids = students_to_certify(course_id, valid_statuses, last_student_id)
+            total = len(student_ids)
+            print "{0} students to grade".format(total)
+            if options['noop']:
+                continue
+
             xq = XQueueCertInterface()
-            total = enrolled_students.count()
+            counts = defaultdict(int)
             count = 0
             start = datetime.datetime.now(UTC)
-            for student in enrolled_students:
-                count += 1
-                if count % STATUS_INTERVAL == 0:
-                    # Print a status update with an approximation of
-                    # how much time is left based on how long the last
-                    # interval took
-                    diff = datetime.datetime.now(UTC) - start
-                    timeleft = diff * (total - count) / STATUS_INTERVAL
-                    hours, remainder = divmod(timeleft.seconds, 3600)
-                    minutes, seconds = divmod(remainder, 60)
-                    print "{0}/{1} completed ~{2:02}:{3:02}m remaining".format(
-                        count, total, hours, minutes)
-                    start = datetime.datetime.now(UTC)
-
-                if certificate_status_for_student(
-                        student, course_id)['status'] in valid_statuses:
-                    if not options['noop']:
-                        # Add the certificate request to the queue
-                        ret = xq.add_cert(student, course_id, course=course)
-                        if ret == 'generating':
-                            print '{0} - {1}'.format(student, ret)
+            for student_grades in grade_students(course, student_ids, options['chunk_size'], options['processes']):
+                for student_status in xq.add_certs(course_id, student_grades, options['send_workers']).itervalues():
+                    counts[student_status] += 1
+                save_state(state_file, student_grades[-1][0].id)
+
+                # Print a status update with an approximation of
+                # how much time is left based on how long it took
+                # so far
+                count += len(student_grades)
+                diff = datetime.datetime.now(UTC) - start
+                timeleft = diff * (total - count) / count
+                hours, remainder = divmod(timeleft.seconds, 3600)
+                minutes, seconds = divmod(remainder, 60)
+                print "{0}/{1} completed ~{2:02}:{3:02}m remaining".format(
+                    count, total, hours, minutes)
+
+            for student_status, status_count in sorted(counts.items()):
+                print '{0} - {1}'.format(student_status, status_count)
+            if os.path.exists(state_file):
+                os.remove(state_file)
+
+
+def students_to_certify(course_id, valid_statuses, after_id=0):
+    """
+    Return the sorted ids of the students enrolled in course_id, after
+    after_id, whose certificate status is in valid_statuses and can be
+    changed by XQueueCertInterface.add_certs
+    """
+    valid_statuses = [s for s in valid_statuses if s in XQueueCertInterface.VALID_STATUSES]
+    cert_statuses = dict(GeneratedCertificate.objects.filter(
+        course_id=course_id, user__gt=after_id).values_list('user', 'status'))
+    enrolled_ids = User.objects.filter(
+        courseenrollment__course_id=course_id, id__gt=after_id).order_by('id').values_list('id', flat=True)
+    return [
+        student_id for student_id in enrolled_ids
+        if cert_statuses.get(student_id, CertificateStatuses.unavailable) in valid_statuses
+    ]
+
+
+def grade_students(course, student_ids, chunk_size, processes=1):
+    """
+    Grade the students with student_ids in course, chunk_size at a
+    time, and yield a list of (User, letter grade, percent) for each
+    chunk, in order.
+
+    With more than one process, the chunks are graded by a pool of
+    worker processes, forked after the grading context of the course
+    has been loaded, so that they don't have to load it again. The
+    workers go on grading the next chunks while the caller handles
+    the ones yielded already. With one process, each chunk is graded
+    when the caller asks for it.
+    """
+    # Loads all of the graded descriptors of the course
+    course.grading_context
+    _GRADING_COURSE[:] = [course]
+
+    id_chunks = chunks(student_ids, chunk_size)
+    if processes <= 1:
+        for grade_chunk in itertools.imap(_grade_chunk, id_chunks):
+            yield _with_students(grade_chunk)
+        return
+
+    # The workers can't share our connections
+    connection.close()
+    cache.close()
+    pool = Pool(processes)
+    try:
+        for grade_chunk in pool.imap(_grade_chunk, id_chunks):
+            yield _with_students(grade_chunk)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def _grade_chunk(student_ids):
+    """
+    Return a list of (student id, letter grade, percent) for the
+    students with student_ids in the course being graded
+    """
+    course = _GRADING_COURSE[0]
+    students = User.objects.filter(id__in=student_ids).order_by('id')
+    request = RequestFactory().get('/')
+    # Needed by the modules that are instantiated to grade the students
+    request.user = None
+    request.session = {}
+    return [
+        (student.id, grade['grade'], grade['percent'])
+        for student, grade in grades.iterate_grades_for(course, students, request, chunk_size=len(student_ids))
+    ]
+
+
+def _with_students(grade_chunk):
+    """
+    Replace the student ids in grade_chunk, as returned by _grade_chunk,
+    with their Users
+    """
+    students = User.objects.in_bulk([student_id for student_id, _, _ in grade_chunk])
+    return [(students[student_id], letter_grade, percent) for student_id, letter_grade, percent in grade_chunk]
+
+
+def load_state(state_file):
+    """
+    Return the id of the last student whose certificate request was
+    queued by an earlier run, or 0
+    """
+    try:
+        with open(state_file) as f:
+            state = json.load(f)
+    except IOError:
+        return 0
+    print "Continuing after student {0}, from {1}".format(state['last_student_id'], state_file)
+    return state['last_student_id']
+
+
+def save_state(state_file, last_student_id):
+    """
+    Remember that the certificate requests of the students up to
+    last_student_id were queued
+    """
+    with open(state_file, "w") as f:
+        json.dump({'last_student_id': last_student_id}, f)
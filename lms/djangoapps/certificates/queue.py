@@ -9,12 +9,15 @@ from django.test.client import RequestFactory
 from capa.xqueue_interface import XQueueInterface
 from capa.xqueue_interface import make_xheader, make_hashkey
 from django.conf import settings
+from django.db import transaction
 from requests.auth import HTTPBasicAuth
 from student.models import UserProfile
 
 import json
 import random
 import logging
+import threading
+from multiprocessing.pool import ThreadPool
 
 
 logger = logging.getLogger(__name__)
@@ -49,8 +52,17 @@ class XQueueCertInterface(object):
                    For a user that already has a certificate
                    this will delete his cert.
 
+       add_certs:  Add new certificates for many students
+                   at once, given their grades.
+
     """
 
+    # The statuses from which add_cert and add_certs will
+    # request a new certificate
+    VALID_STATUSES = [status.generating,
+            status.unavailable, status.deleted, status.error,
+            status.notpassing]
+
     def __init__(self, request=None):
         # MakoMiddleware Note:
         # Line below has the side-effect of writing to a module level lookup
@@ -61,26 +73,14 @@ class XQueueCertInterface(object):
         # introduced. This is the bandage until we can trace the root cause.
         m = MakoMiddleware()
 
-        # Get basic auth (username/password) for
-        # xqueue connection if it's in the settings
-
-        if settings.XQUEUE_INTERFACE.get('basic_auth') is not None:
-            requests_auth = HTTPBasicAuth(
-                    *settings.XQUEUE_INTERFACE['basic_auth'])
-        else:
-            requests_auth = None
-
         if request is None:
             factory = RequestFactory()
             self.request = factory.get('/')
         else:
             self.request = request
 
-        self.xqueue_interface = XQueueInterface(
-                settings.XQUEUE_INTERFACE['url'],
-                settings.XQUEUE_INTERFACE['django_auth'],
-                requests_auth,
-                )
+        self.xqueue_interface = _make_xqueue_interface()
+        self._thread_interfaces = threading.local()
         self.whitelist = CertificateWhitelist.objects.all()
         self.restricted = UserProfile.objects.filter(allow_certificate=False)
 
@@ -151,14 +151,10 @@ class XQueueCertInterface(object):
 
         """
 
-        VALID_STATUSES = [status.generating,
-                status.unavailable, status.deleted, status.error,
-                status.notpassing]
-
         cert_status = certificate_status_for_student(
                               student, course_id)['status']
 
-        if cert_status in VALID_STATUSES:
+        if cert_status in self.VALID_STATUSES:
             # grade the student
 
             # re-use the course passed in optionally so we don't have to re-fetch everything
@@ -177,53 +173,178 @@ class XQueueCertInterface(object):
             grade = grades.grade(student, self.request, course)
             is_whitelisted = self.whitelist.filter(
                 user=student, course_id=course_id, whitelist=True).exists()
+            is_restricted = self.restricted.filter(user=student).exists()
+
+            contents = self._update_cert(cert, student, course_id, profile.name,
+                    grade['grade'], grade['percent'], is_whitelisted, is_restricted)
+            cert.save()
+            if contents is not None:
+                self._send_to_xqueue(contents, cert.key)
+            elif cert.status == status.notpassing:
+                cert_status = status.notpassing
 
-            if is_whitelisted or grade['grade'] is not None:
+        return cert_status
 
-                key = make_hashkey(random.random())
+    def add_certs(self, course_id, student_grades, send_workers=1):
+        """
 
-                cert.grade = grade['percent']
-                cert.user = student
-                cert.course_id = course_id
-                cert.key = key
-                cert.name = profile.name
+        Arguments:
+          course_id - courseenrollment.course_id (string)
+          student_grades - list of (User.object, letter grade, percent)
+          send_workers - number of requests to have on the queue
+                         server at once
 
-                # check to see whether the student is on the
-                # the embargoed country restricted list
-                # otherwise, put a new certificate request
-                # on the queue
-                if self.restricted.filter(user=student).exists():
-                    cert.status = status.restricted
-                    cert.save()
-                else:
-                    contents = {
-                        'action': 'create',
-                        'username': student.username,
-                        'course_id': course_id,
-                        'name': profile.name,
-                    }
-                    cert.status = status.generating
+        Request new certificates for many students at once, the same
+        way add_cert does for one, given their grades (see
+        grades.iterate_grades_for).
+
+        The certificates, profiles, whitelist entries and restrictions
+        of all the students are fetched with one query each, and the
+        certificates are written in one transaction before any of the
+        requests are put on the queue. A request that can't be put on
+        the queue changes the status to status.error, rather than
+        stopping the others.
+
+        Students whose current status isn't one add_cert would change
+        are left out.
+
+        Returns a dict of student id -> the student's new status
+
+        """
+
+        student_ids = [student.id for student, _, _ in student_grades]
+        certs = dict((cert.user_id, cert) for cert in GeneratedCertificate.objects.filter(
+                course_id=course_id, user__in=student_ids))
+        names = dict(UserProfile.objects.filter(
+                user__in=student_ids).values_list('user', 'name'))
+        whitelisted = set(self.whitelist.filter(
+                course_id=course_id, whitelist=True,
+                user__in=student_ids).values_list('user', flat=True))
+        restricted = set(self.restricted.filter(
+                user__in=student_ids).values_list('user', flat=True))
+
+        statuses = {}
+        new_certs = []
+        queue_requests = []
+        with transaction.commit_on_success():
+            for student, letter_grade, percent in student_grades:
+                cert = certs.get(student.id)
+                if cert is None:
+                    cert = GeneratedCertificate(user=student, course_id=course_id)
+                    new_certs.append(cert)
+                elif cert.status not in self.VALID_STATUSES:
+                    continue
+
+                contents = self._update_cert(cert, student, course_id,
+                        names.get(student.id, ''), letter_grade, percent,
+                        student.id in whitelisted, student.id in restricted)
+                if cert.pk is not None:
                     cert.save()
-                    self._send_to_xqueue(contents, key)
-            else:
-                cert_status = status.notpassing
-                cert.grade = grade['percent']
-                cert.user = student
-                cert.course_id = course_id
-                cert.name = profile.name
-                cert.status = cert_status
-                cert.save()
+                if contents is not None:
+                    queue_requests.append((cert, contents))
+                statuses[student.id] = cert.status
+            GeneratedCertificate.objects.bulk_create(new_certs)
+
+        pool = ThreadPool(send_workers)
+        try:
+            results = pool.map(self._post_to_xqueue,
+                    [(contents, cert.key) for cert, contents in queue_requests])
+        finally:
+            pool.close()
+
+        for (cert, contents), (error, msg) in zip(queue_requests, results):
+            if error:
+                logger.critical('Unable to add a request to the queue: {} {}'.format(error, msg))
+                GeneratedCertificate.objects.filter(
+                        user=cert.user_id, course_id=course_id, key=cert.key).update(
+                        status=status.error, error_reason=unicode(msg)[:512])
+                statuses[cert.user_id] = status.error
+
+        return statuses
+
+    def _update_cert(self, cert, student, course_id, name, letter_grade,
+            percent, is_whitelisted, is_restricted):
+        """
+        Set the fields of the (unsaved) cert of student from their
+        grade, and return the contents of the request to put on the
+        queue for it, or None if there shouldn't be one.
+        """
 
-        return cert_status
+        cert.grade = percent
+        cert.user = student
+        cert.course_id = course_id
+        cert.name = name
+
+        if is_whitelisted or letter_grade is not None:
+
+            cert.key = make_hashkey(random.random())
+
+            # check to see whether the student is on the
+            # the embargoed country restricted list
+            # otherwise, put a new certificate request
+            # on the queue
+            if is_restricted:
+                cert.status = status.restricted
+            else:
+                cert.status = status.generating
+                return {
+                    'action': 'create',
+                    'username': student.username,
+                    'course_id': course_id,
+                    'name': name,
+                }
+        else:
+            cert.status = status.notpassing
+        return None
 
     def _send_to_xqueue(self, contents, key):
 
+        (error, msg) = self._post_to_xqueue((contents, key), self.xqueue_interface)
+        if error:
+            logger.critical('Unable to add a request to the queue: {} {}'.format(error, msg))
+            raise Exception('Unable to send queue message')
+
+    def _post_to_xqueue(self, queue_request, xqueue_interface=None):
+        """
+        Put queue_request, a (contents, key) tuple, on the queue, and
+        return (error, msg) as XQueueInterface.send_to_queue does.
+
+        Each thread uses its own connection to the queue server,
+        unless xqueue_interface is given.
+        """
+
+        contents, key = queue_request
+        if xqueue_interface is None:
+            xqueue_interface = getattr(self._thread_interfaces, 'xqueue_interface', None)
+            if xqueue_interface is None:
+                xqueue_interface = _make_xqueue_interface()
+                self._thread_interfaces.xqueue_interface = xqueue_interface
+
         xheader = make_xheader(
             'https://{0}/update_certificate?{1}'.format(
                 settings.SITE_NAME, key), key, settings.CERT_QUEUE)
 
-        (error, msg) = self.xqueue_interface.send_to_queue(
+        return xqueue_interface.send_to_queue(
                 header=xheader, body=json.dumps(contents))
-        if error:
-            logger.critical('Unable to add a request to the queue: {} {}'.format(error, msg))
-            raise Exception('Unable to send queue message')
+
+
+def _make_xqueue_interface():
+    """
+    Return a new XQueueInterface connected to the queue server in
+    settings.XQUEUE_INTERFACE
+    """
+
+    # Get basic auth (username/password) for
+    # xqueue connection if it's in the settings
+
+    if settings.XQUEUE_INTERFACE.get('basic_auth') is not None:
+        requests_auth = HTTPBasicAuth(
+                *settings.XQUEUE_INTERFACE['basic_auth'])
+    else:
+        requests_auth = None
+
+    return XQueueInterface(
+            settings.XQUEUE_INTERFACE['url'],
+            settings.XQUEUE_INTERFACE['django_auth'],
+            requests_auth,
+            )
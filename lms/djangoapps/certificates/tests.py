@@ -0,0 +1,217 @@
+"""
+Tests for requesting certificates from the queue, and for the
+ungenerated_certs command that grades students and requests them
+"""
+import os
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+from mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from capa.tests.response_xml_factory import OptionResponseXMLFactory
+from certificates.management.commands import ungenerated_certs
+from certificates.models import CertificateStatuses, CertificateWhitelist, GeneratedCertificate
+from certificates.queue import XQueueCertInterface
+from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
+from student.models import UserProfile
+from student.tests.factories import AdminFactory, UserFactory, CourseEnrollmentFactory
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+
+COURSE_ID = 'edX/toy/2012_Fall'
+
+
+@override_settings(CERT_QUEUE='test-pull')
+@patch('certificates.queue.XQueueInterface')
+class AddCertsTest(TestCase):
+    """
+    Test that XQueueCertInterface.add_certs requests the certificates of
+    many students, given their grades
+    """
+    def setUp(self):
+        self.passing = UserFactory.create()
+        self.failing = UserFactory.create()
+        self.whitelisted = UserFactory.create()
+        self.restricted = UserFactory.create()
+        UserProfile.objects.filter(user=self.restricted).update(allow_certificate=False)
+        CertificateWhitelist.objects.create(user=self.whitelisted, course_id=COURSE_ID, whitelist=True)
+        self.student_grades = [
+            (self.passing, 'Pass', 0.9),
+            (self.failing, None, 0.1),
+            (self.whitelisted, None, 0.2),
+            (self.restricted, 'Pass', 0.8),
+        ]
+
+    def add_certs(self):
+        """Return the statuses that add_certs returns for self.student_grades"""
+        return XQueueCertInterface().add_certs(COURSE_ID, self.student_grades, send_workers=2)
+
+    def cert(self, student):
+        """The GeneratedCertificate of student"""
+        return GeneratedCertificate.objects.get(user=student, course_id=COURSE_ID)
+
+    def test_add_certs(self, xqueue_interface):
+        xqueue_interface.return_value.send_to_queue.return_value = (0, 'Queued')
+        # An existing certificate that can be requested again
+        GeneratedCertificate.objects.create(user=self.failing, course_id=COURSE_ID, status=CertificateStatuses.error)
+
+        self.assertEqual({
+            self.passing.id: CertificateStatuses.generating,
+            self.failing.id: CertificateStatuses.notpassing,
+            self.whitelisted.id: CertificateStatuses.generating,
+            self.restricted.id: CertificateStatuses.restricted,
+        }, self.add_certs())
+
+        self.assertEqual(4, GeneratedCertificate.objects.filter(course_id=COURSE_ID).count())
+        self.assertEqual('0.9', self.cert(self.passing).grade)
+        self.assertEqual(CertificateStatuses.notpassing, self.cert(self.failing).status)
+        self.assertEqual(CertificateStatuses.generating, self.cert(self.whitelisted).status)
+        self.assertEqual(CertificateStatuses.restricted, self.cert(self.restricted).status)
+        # Only the students who get a certificate are put on the queue
+        self.assertEqual(2, xqueue_interface.return_value.send_to_queue.call_count)
+
+    def test_send_error(self, xqueue_interface):
+        xqueue_interface.return_value.send_to_queue.return_value = (1, 'No queue')
+
+        statuses = self.add_certs()
+
+        self.assertEqual(CertificateStatuses.error, statuses[self.passing.id])
+        self.assertEqual(CertificateStatuses.error, self.cert(self.passing).status)
+        self.assertEqual('No queue', self.cert(self.passing).error_reason)
+        # The students who weren't queued keep their status
+        self.assertEqual(CertificateStatuses.notpassing, statuses[self.failing.id])
+
+    def test_invalid_statuses_are_left_out(self, xqueue_interface):
+        xqueue_interface.return_value.send_to_queue.return_value = (0, 'Queued')
+        GeneratedCertificate.objects.create(
+            user=self.passing, course_id=COURSE_ID, status=CertificateStatuses.downloadable, grade='0.7'
+        )
+
+        statuses = self.add_certs()
+
+        self.assertNotIn(self.passing.id, statuses)
+        self.assertEqual(CertificateStatuses.downloadable, self.cert(self.passing).status)
+        self.assertEqual('0.7', self.cert(self.passing).grade)
+        self.assertEqual(1, xqueue_interface.return_value.send_to_queue.call_count)
+
+
+class StudentsToCertifyTest(TestCase):
+    """
+    Test that the students to grade are found, in order
+    """
+    def setUp(self):
+        self.students = [CourseEnrollmentFactory.create(course_id=COURSE_ID).user for _ in range(4)]
+        GeneratedCertificate.objects.create(
+            user=self.students[1], course_id=COURSE_ID, status=CertificateStatuses.downloadable
+        )
+        GeneratedCertificate.objects.create(
+            user=self.students[2], course_id=COURSE_ID, status=CertificateStatuses.error
+        )
+        # Not enrolled
+        UserFactory.create()
+
+    def test_unavailable(self):
+        self.assertEqual(
+            [self.students[0].id, self.students[3].id],
+            ungenerated_certs.students_to_certify(COURSE_ID, [CertificateStatuses.unavailable])
+        )
+
+    def test_after_id(self):
+        self.assertEqual(
+            [self.students[3].id],
+            ungenerated_certs.students_to_certify(
+                COURSE_ID, [CertificateStatuses.unavailable, CertificateStatuses.error], self.students[2].id
+            )
+        )
+
+    def test_only_valid_statuses(self):
+        # add_certs wouldn't request a new certificate for downloadable ones
+        self.assertEqual(
+            [self.students[2].id],
+            ungenerated_certs.students_to_certify(
+                COURSE_ID, [CertificateStatuses.downloadable, CertificateStatuses.error]
+            )
+        )
+
+
+class StateTest(TestCase):
+    """
+    Test that an interrupted run can continue where it stopped
+    """
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+        self.state_file = os.path.join(self.state_dir, 'ungenerated_certs.json')
+
+    def test_no_state(self):
+        self.assertEqual(0, ungenerated_certs.load_state(self.state_file))
+
+    def test_resume(self):
+        ungenerated_certs.save_state(self.state_file, 42)
+        self.assertEqual(42, ungenerated_certs.load_state(self.state_file))
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class GradeStudentsTest(ModuleStoreTestCase):
+    """
+    Test that students are graded in chunks, in order
+    """
+    def setUp(self):
+        course = CourseFactory.create()
+        self.course = modulestore().get_instance(course.id, course.location, depth=2)
+        self.students = [CourseEnrollmentFactory.create(course_id=self.course.id).user for _ in range(3)]
+        self.student_ids = [student.id for student in self.students]
+
+    def test_one_process(self):
+        self.assertEqual(
+            [
+                [(self.students[0], None, 0), (self.students[1], None, 0)],
+                [(self.students[2], None, 0)],
+            ],
+            list(ungenerated_certs.grade_students(self.course, self.student_ids, 2))
+        )
+
+    def test_staff_student(self):
+        # Without a cached max score, the problem is instantiated to get it,
+        # which checks the staff access of the student
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter')
+        section = ItemFactory.create(
+            parent_location=chapter.location, category='sequential', metadata={'graded': True, 'format': 'Homework'}
+        )
+        ItemFactory.create(
+            parent_location=section.location,
+            category='problem',
+            data=OptionResponseXMLFactory().build_xml(
+                question_text='The correct answer is Correct', options=['Correct', 'Incorrect'], correct_option='Correct'
+            ),
+        )
+        course = modulestore().get_instance(self.course.id, self.course.location, depth=2)
+        staff = AdminFactory.create()
+        CourseEnrollmentFactory.create(user=staff, course_id=course.id)
+
+        self.assertEqual([[(staff, None, 0)]], list(ungenerated_certs.grade_students(course, [staff.id], 2)))
+
+    @patch.object(ungenerated_certs, 'connection')
+    @patch.object(ungenerated_certs, 'Pool', ThreadPool)
+    def test_processes(self, connection):
+        def grade_chunk(student_ids):
+            """Grade the students without the database, which threads don't share in tests"""
+            return [(student_id, 'Pass', student_id / 100.0) for student_id in student_ids]
+
+        with patch.object(ungenerated_certs, '_grade_chunk', grade_chunk):
+            student_grades = list(ungenerated_certs.grade_students(self.course, self.student_ids, 2, processes=2))
+
+        self.assertEqual(
+            [
+                [(student, 'Pass', student.id / 100.0) for student in self.students[:2]],
+                [(self.students[2], 'Pass', self.students[2].id / 100.0)],
+            ],
+            student_grades
+        )
+        # The connection isn't shared with the workers
+        self.assertTrue(connection.close.called)
@@ -6,7 +6,9 @@ from datetime import datetime, timedelta
 from functools import partial
 
 from django.conf import settings
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 
 from xmodule.course_module import CourseDescriptor
 from xmodule.error_module import ErrorDescriptor
@@ -23,6 +25,10 @@ DEBUG_ACCESS = False
 
 log = logging.getLogger(__name__)
 
+# Bumped whenever users are added to or removed from groups in this process,
+# so that the group names remembered on user objects are looked up again
+_GROUP_MEMBERSHIP = {'version': 0}
+
 
 class CourseContextRequired(Exception):
     """
@@ -494,6 +500,35 @@ course_beta_test_group_name.__test__ = False
 
 
 
+@receiver(m2m_changed, sender=User.groups.through)
+def _group_membership_changed(sender, action, **kwargs):
+    """
+    Forget the group names remembered by user_group_names
+    """
+    if action.startswith('post_'):
+        _GROUP_MEMBERSHIP['version'] += 1
+
+
+def user_group_names(user):
+    """
+    Return the set of names of the groups that user is in.
+
+    They're looked up once for each user object, and so once per request for
+    request.user, rather than for every has_access check on the modules of a
+    course.
+    """
+    if not isinstance(user, User):
+        return frozenset(g.name for g in user.groups.all())
+
+    version, group_names = user.__dict__.get('_access_group_names', (None, None))
+    if version != _GROUP_MEMBERSHIP['version']:
+        version = _GROUP_MEMBERSHIP['version']
+        # groups.all() uses the groups of prefetch_related("groups"), if any
+        group_names = frozenset(g.name for g in user.groups.all())
+        user._access_group_names = (version, group_names)
+    return group_names
+
+
 def _has_global_staff_access(user):
     if user.is_staff:
         debug("Allow: user.is_staff")
@@ -516,9 +551,6 @@ def _adjust_start_date_for_beta_testers(user, descriptor):
     Returns:
         A datetime.  Either the same as start, or earlier for beta testers.
 
-    NOTE: number of days to adjust should be cached to avoid looking it up thousands of
-    times per query.
-
     NOTE: For now, this function assumes that the descriptor's location is in the course
     the user is looking at.  Once we have proper usages and definitions per the XBlock
     design, this should use the course the usage is in.
@@ -530,7 +562,7 @@ def _adjust_start_date_for_beta_testers(user, descriptor):
         # bail early if no beta testing is set up
         return descriptor.lms.start
 
-    user_groups = [g.name for g in user.groups.all()]
+    user_groups = user_group_names(user)
 
     beta_group = course_beta_test_group_name(descriptor.location)
     if beta_group in user_groups:
@@ -577,7 +609,7 @@ def _has_access_to_location(user, location, access_level, course_context):
         return True
 
     # If not global staff, is the user in the Auth group for this class?
-    user_groups = [g.name for g in user.groups.all()]
+    user_groups = user_group_names(user)
 
     if access_level == 'staff':
         staff_groups = group_names_for_staff(location, course_context) + \
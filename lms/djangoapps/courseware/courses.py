@@ -8,7 +8,7 @@ from django.http import Http404
 
 from .module_render import get_module
 from xmodule.course_module import CourseDescriptor
-from xmodule.modulestore import Location, XML_MODULESTORE_TYPE
+from xmodule.modulestore import Location, XML_MODULESTORE_TYPE, CONTENT_FIELDS
 from xmodule.modulestore.django import modulestore
 from xmodule.contentstore.content import StaticContent
 from xmodule.modulestore.exceptions import ItemNotFoundError, InvalidLocationError
@@ -35,22 +35,23 @@ def get_request_for_thread():
         del frame
 
 
-def get_course_by_id(course_id, depth=0):
+def get_course_by_id(course_id, depth=0, fields=CONTENT_FIELDS):
     """
     Given a course id, return the corresponding course descriptor.
 
     If course_id is not valid, raises a 404.
     depth: The number of levels of children for the modulestore to cache. None means infinite depth
+    fields: The group of fields for the modulestore to fetch up front, see ModuleStore.get_item
     """
     try:
         course_loc = CourseDescriptor.id_to_location(course_id)
-        return modulestore().get_instance(course_id, course_loc, depth=depth)
+        return modulestore().get_instance(course_id, course_loc, depth=depth, fields=fields)
     except (KeyError, ItemNotFoundError):
         raise Http404("Course not found.")
     except InvalidLocationError:
         raise Http404("Invalid location")
 
-def get_course_with_access(user, course_id, action, depth=0):
+def get_course_with_access(user, course_id, action, depth=0, fields=CONTENT_FIELDS):
     """
     Given a course_id, look up the corresponding course descriptor,
     check that the user has the access to perform the specified action
@@ -59,8 +60,9 @@ def get_course_with_access(user, course_id, action, depth=0):
     Raises a 404 if the course_id is invalid, or the user doesn't have access.
 
     depth: The number of levels of children for the modulestore to cache. None means infinite depth
+    fields: The group of fields for the modulestore to fetch up front, see ModuleStore.get_item
     """
-    course = get_course_by_id(course_id, depth=depth)
+    course = get_course_by_id(course_id, depth=depth, fields=fields)
     if not has_access(user, course, action):
         # Deliberately return a non-specific error message to avoid
         # leaking info about access control settings
@@ -1,20 +1,27 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 
+import hashlib
+import json
 import random
 import logging
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.utils.timezone import UTC
 
-from .model_data import ModelDataCache, LmsKeyValueStore
+from .access import has_access, user_group_names
+from .model_data import ModelDataCache, LmsKeyValueStore, chunks
 from xblock.core import Scope
 from .module_render import get_module, get_module_for_descriptor
 from xmodule import graders
 from xmodule.capa_module import CapaModule
 from xmodule.graders import Score
-from .models import StudentModule
+from xmodule.modulestore.django import modulestore
+from .models import StudentModule, StudentSectionScore
 
 log = logging.getLogger("mitx.courseware")
 
@@ -137,13 +144,310 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
 
     More information on the format is in the docstring for CourseGrader.
     """
+    if model_data_cache is None:
+        model_data_cache = ModelDataCache(course.grading_context['all_descriptors'], course.id, student)
+
+    def create_module(descriptor):
+        '''creates an XModule instance given a descriptor'''
+        # TODO: We need the request to pass into here. If we could forego that, our arguments
+        # would be simpler
+        return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
+
+    max_scores = MaxScoresCache(course.id)
+    section_scores = SectionScoresCache(student, course.id) if student.is_authenticated() else None
+    grade_summary = _grade(
+        student, course, model_data_cache, create_module, keep_raw_scores, max_scores, section_scores
+    )
+    max_scores.push_to_store()
+    return grade_summary
+
+
+def iterate_grades_for(course, students, request, keep_raw_scores=False, chunk_size=100):
+    """
+    Grade many students in a course, yielding a (student, grade_summary) tuple
+    for each student, in the order given. Each grade_summary is the same as
+    the one returned by grade().
+
+    Instead of building a ModelDataCache per student, the StudentModule grades
+    and StudentSectionScores of `chunk_size` students at a time are loaded in
+    bulk, and the max score of each unattempted problem is computed at most
+    once for the whole course (see MaxScoresCache). Modules are still
+    instantiated for a student when grading needs their state (dynamic
+    children, or always_recalculate_grades).
+
+    course: a CourseDescriptor
+    students: an iterable of User objects
+    request: the request to use if modules have to be instantiated
+    """
+    locations = [descriptor.location.url() for descriptor in course.grading_context['all_descriptors']]
+
+    # shared by all of the students being graded
+    max_scores = MaxScoresCache(course.id)
+
+    for student_chunk in chunks(students, chunk_size):
+        scores_by_student = _bulk_scores_for_students(course.id, student_chunk, locations)
+        section_rows_by_student = defaultdict(list)
+        for row in StudentSectionScore.objects.filter(course_id=course.id, student__in=student_chunk):
+            section_rows_by_student[row.student_id].append(row)
+
+        for student in student_chunk:
+            model_data_cache = BulkGradingCache(course, student, scores_by_student[student.id])
+            section_scores = SectionScoresCache(student, course.id, section_rows_by_student[student.id])
+
+            def create_module(descriptor, student=student, model_data_cache=model_data_cache):
+                '''creates an XModule instance given a descriptor'''
+                return get_module_for_descriptor(
+                    student, request, descriptor, model_data_cache.model_data_cache, course.id
+                )
+
+            yield student, _grade(
+                student, course, model_data_cache, create_module, keep_raw_scores, max_scores, section_scores
+            )
+        max_scores.push_to_store()
+
 
+StudentModuleScore = namedtuple('StudentModuleScore', 'grade, max_grade')
+
+
+class MaxScoresCache(dict):
+    """
+    A dict of location url -> max score for the problems of a course,
+    initialized from the index kept by the modulestore. Max scores that are
+    added to it while grading are saved back to the modulestore by
+    push_to_store(), so that other requests don't have to instantiate the
+    problems again.
+    """
+    def __init__(self, course_id):
+        super(MaxScoresCache, self).__init__(modulestore().get_cached_max_scores(course_id))
+        self.course_id = course_id
+        self._stored = set(self)
+
+    def push_to_store(self):
+        """
+        Save any max scores that aren't in the modulestore's index yet
+        """
+        new_scores = dict(
+            (url, score) for url, score in self.iteritems()
+            if url not in self._stored and score is not None
+        )
+        if new_scores:
+            modulestore().cache_max_scores(self.course_id, new_scores)
+            self._stored.update(new_scores)
+
+
+def _bulk_scores_for_students(course_id, students, locations):
+    """
+    Return a dict mapping student id -> {module_state_key: StudentModuleScore}
+    for all StudentModules of `students` at any of `locations`.
+
+    Only the grade columns are selected, so module state is never loaded.
+    """
+    scores_by_student = defaultdict(dict)
+    student_ids = [student.id for student in students]
+    for location_chunk in chunks(locations, 500):
+        rows = StudentModule.objects.filter(
+            course_id=course_id,
+            student__in=student_ids,
+            module_state_key__in=location_chunk,
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+        for student_id, module_state_key, grade, max_grade in rows:
+            scores_by_student[student_id][module_state_key] = StudentModuleScore(grade, max_grade)
+    return scores_by_student
+
+
+class BulkGradingCache(object):
+    """
+    Stands in for a ModelDataCache while grading one student of a batch.
+
+    Scope.user_state lookups are answered from StudentModuleScores that were
+    loaded in bulk. A real ModelDataCache is only built, on first use of
+    `model_data_cache`, if a module has to be instantiated for the student.
+    """
+    def __init__(self, course, student, scores):
+        self.course = course
+        self.student = student
+        self.scores = scores
+        self._model_data_cache = None
+
+    @property
+    def model_data_cache(self):
+        """
+        A ModelDataCache for all of the graded descriptors in the course
+        """
+        if self._model_data_cache is None:
+            self._model_data_cache = ModelDataCache(
+                self.course.grading_context['all_descriptors'], self.course.id, self.student
+            )
+        return self._model_data_cache
+
+    def find(self, key):
+        """
+        Return the StudentModuleScore for a Scope.user_state key (or None if
+        the student has no StudentModule there). Other scopes are looked up
+        in the full ModelDataCache.
+        """
+        if key.scope == Scope.user_state:
+            return self.scores.get(key.block_scope_id.url())
+        return self.model_data_cache.find(key)
+
+
+class SectionScoresCache(object):
+    """
+    The problem scores of one student in the graded sections of a course,
+    persisted as StudentSectionScore rows, keyed by section location url.
+
+    An entry is only returned while its signature (see section_signature)
+    matches, and it hasn't expired, so that only the sections in which
+    something changed have to be walked again.
+    """
+    def __init__(self, student, course_id, rows=None):
+        """
+        rows: the student's StudentSectionScores for the course, if they
+            have already been loaded
+        """
+        self.student = student
+        self.course_id = course_id
+        if rows is None:
+            rows = StudentSectionScore.objects.filter(student=student, course_id=course_id)
+        self.rows = dict((row.section_key, row) for row in rows)
+
+    def get(self, section_key, signature):
+        """
+        Return the cached list of (correct, total, graded, display_name) for
+        the section, or None if there is no valid entry for `signature`.
+        """
+        row = self.rows.get(section_key)
+        if row is None or row.signature != signature:
+            return None
+        if row.expires is not None and row.expires <= datetime.now(UTC()):
+            return None
+        return [tuple(score) for score in json.loads(row.scores)]
+
+    def set(self, section_key, signature, expires, scores):
+        """
+        Save the problem scores of a section
+        """
+        row = self.rows.get(section_key)
+        if row is None:
+            row = StudentSectionScore(student=self.student, course_id=self.course_id, section_key=section_key)
+        row.signature = signature
+        row.expires = expires
+        row.scores = json.dumps(scores)
+        try:
+            row.save()
+        except IntegrityError:
+            # Another request created the row first. It computed the same thing.
+            log.warning("Couldn't save section scores for %s in %s", self.student, section_key)
+            return
+        self.rows[section_key] = row
+
+
+def section_signature(student, section, model_data_cache, max_scores):
+    """
+    Return a digest of everything that the scores of the problems in a graded
+    section depend on: the problems, their weights and names, the student's
+    grades on them, their indexed max scores, and the staff status and groups
+    (e.g. beta testers) that decide which of them the student can access.
+    Start dates are handled by section_scores_expiration.
+
+    section: a section from course.grading_context['graded_sections']
+    """
+    signature = [[student.is_staff, sorted(user_group_names(student))]]
+    for descriptor in section['xmoduledescriptors']:
+        key = LmsKeyValueStore.Key(Scope.user_state, student.id, descriptor.location, None)
+        student_module = model_data_cache.find(key)
+        location_url = descriptor.location.url()
+        signature.append([
+            location_url,
+            getattr(descriptor, 'weight', None),
+            descriptor.lms.graded,
+            descriptor.display_name_with_default,
+            student_module.grade if student_module is not None else None,
+            student_module.max_grade if student_module is not None else None,
+            max_scores.get(location_url) if max_scores is not None else None,
+        ])
+    return hashlib.md5(json.dumps(signature)).hexdigest()
+
+
+def section_scores_expiration(section):
+    """
+    Return the first time in the future at which a student may gain access
+    to a problem in the section (at its start date, or earlier for beta
+    testers), or None.
+    """
+    now = datetime.now(UTC())
+    expires = None
+    for descriptor in section['xmoduledescriptors']:
+        start = descriptor.lms.start
+        if start is None:
+            continue
+        starts = [start]
+        if descriptor.lms.days_early_for_beta is not None:
+            starts.append(start - timedelta(descriptor.lms.days_early_for_beta))
+        for start in starts:
+            if start > now and (expires is None or start < expires):
+                expires = start
+    return expires
+
+
+def get_section_problem_scores(course_id, student, section, module_creator, model_data_cache,
+                               max_scores=None, section_scores=None):
+    """
+    Return a list of (correct, total, graded, display_name) for each problem
+    in a graded section that the student can be scored on, using the entry
+    in section_scores (a SectionScoresCache) if it is still valid.
+
+    section: a section from course.grading_context['graded_sections']
+    Other arguments are as for get_score().
+    """
+    section_descriptor = section['section_descriptor']
+    if section_scores is None or not section['static_scores']:
+        return _walk_section_problem_scores(
+            course_id, student, section_descriptor, module_creator, model_data_cache, max_scores
+        )
+
+    section_key = section_descriptor.location.url()
+    scores = section_scores.get(section_key, section_signature(student, section, model_data_cache, max_scores))
+    if scores is None:
+        scores = _walk_section_problem_scores(
+            course_id, student, section_descriptor, module_creator, model_data_cache, max_scores
+        )
+        # The walk may have added to max_scores, so the signature is computed again
+        section_scores.set(
+            section_key,
+            section_signature(student, section, model_data_cache, max_scores),
+            section_scores_expiration(section),
+            scores,
+        )
+    return scores
+
+
+def _walk_section_problem_scores(course_id, student, section_descriptor, module_creator, model_data_cache, max_scores):
+    """
+    Compute the list of (correct, total, graded, display_name) for the
+    problems under section_descriptor.
+    """
+    scores = []
+    for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, module_creator):
+        (correct, total) = get_score(course_id, student, module_descriptor, module_creator, model_data_cache, max_scores)
+        if correct is None and total is None:
+            continue
+        scores.append((correct, total, module_descriptor.lms.graded, module_descriptor.display_name_with_default))
+    return scores
+
+
+def _grade(student, course, model_data_cache, create_module, keep_raw_scores, max_scores=None, section_scores=None):
+    """
+    Implements grade(), given anything with a ModelDataCache-like `find` in
+    `model_data_cache`, and a `create_module` function that returns the
+    XModule for a descriptor (or None).
+
+    max_scores: see get_score()
+    section_scores: an optional SectionScoresCache for the student
+    """
     grading_context = course.grading_context
     raw_scores = []
 
-    if model_data_cache is None:
-        model_data_cache = ModelDataCache(grading_context['all_descriptors'], course.id, student)
-
     totaled_scores = {}
     # This next complicated loop is just to collect the totaled_scores, which is
     # passed to the grader
@@ -177,17 +481,10 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
             if should_grade_section:
                 scores = []
 
-                def create_module(descriptor):
-                    '''creates an XModule instance given a descriptor'''
-                    # TODO: We need the request to pass into here. If we could forego that, our arguments
-                    # would be simpler
-                    return get_module_for_descriptor(student, request, descriptor, model_data_cache, course.id)
-
-                for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
-
-                    (correct, total) = get_score(course.id, student, module_descriptor, create_module, model_data_cache)
-                    if correct is None and total is None:
-                        continue
+                problem_scores = get_section_problem_scores(
+                    course.id, student, section, create_module, model_data_cache, max_scores, section_scores
+                )
+                for correct, total, graded, display_name in problem_scores:
 
                     if settings.GENERATE_PROFILE_SCORES:  	# for debugging!
                         if total > 1:
@@ -195,12 +492,11 @@ def grade(student, request, course, model_data_cache=None, keep_raw_scores=False
                         else:
                             correct = total
 
-                    graded = module_descriptor.lms.graded
                     if not total > 0:
                         #We simply cannot grade a problem that is 12/0, because we might need it as a percentage
                         graded = False
 
-                    scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+                    scores.append(Score(correct, total, graded, display_name))
 
                 _, graded_total = graders.aggregate_scores(scores, section_name)
                 if keep_raw_scores:
@@ -286,6 +582,14 @@ def progress_summary(student, request, course, model_data_cache):
         # This student must not have access to the course.
         return None
 
+    max_scores = MaxScoresCache(course.id)
+    section_scores = SectionScoresCache(student, course.id) if student.is_authenticated() else None
+    graded_sections = dict(
+        (section['section_descriptor'].location.url(), section)
+        for sections in course.grading_context['graded_sections'].itervalues()
+        for section in sections
+    )
+
     chapters = []
     # Don't include chapters that aren't displayable (e.g. due to error)
     for chapter_module in course_module.get_display_items():
@@ -305,14 +609,19 @@ def progress_summary(student, request, course, model_data_cache):
 
             module_creator = section_module.system.get_module
 
-            for module_descriptor in yield_dynamic_descriptor_descendents(section_module.descriptor, module_creator):
-
-                course_id = course.id
-                (correct, total) = get_score(course_id, student, module_descriptor, module_creator, model_data_cache)
-                if correct is None and total is None:
-                    continue
+            section_key = section_module.location.url()
+            if section_key in graded_sections:
+                problem_scores = get_section_problem_scores(
+                    course.id, student, graded_sections[section_key], module_creator,
+                    model_data_cache, max_scores, section_scores
+                )
+            else:
+                problem_scores = _walk_section_problem_scores(
+                    course.id, student, section_module.descriptor, module_creator, model_data_cache, max_scores
+                )
 
-                scores.append(Score(correct, total, graded, module_descriptor.display_name_with_default))
+            for correct, total, _, display_name in problem_scores:
+                scores.append(Score(correct, total, graded, display_name))
 
             scores.reverse()
             section_total, _ = graders.aggregate_scores(
@@ -334,10 +643,11 @@ def progress_summary(student, request, course, model_data_cache):
                          'url_name': chapter_module.url_name,
                          'sections': sections})
 
+    max_scores.push_to_store()
     return chapters
 
 
-def get_score(course_id, user, problem_descriptor, module_creator, model_data_cache):
+def get_score(course_id, user, problem_descriptor, module_creator, model_data_cache, max_scores=None):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -350,6 +660,9 @@ def get_score(course_id, user, problem_descriptor, module_creator, model_data_ca
     module_creator: a function that takes a descriptor, and returns the corresponding XModule for this user.
            Can return None if user doesn't have access, or if something else went wrong.
     cache: A ModelDataCache
+    max_scores: An optional dict of location url -> max score (e.g. a MaxScoresCache),
+           shared between calls. Unattempted problems found in it are not instantiated
+           just to get their max score; ones that are instantiated are added to it.
     """
     if not user.is_authenticated():
         return (None, None)
@@ -387,12 +700,24 @@ def get_score(course_id, user, problem_descriptor, module_creator, model_data_ca
         # If the problem was not in the cache, or hasn't been graded yet,
         # we need to instantiate the problem.
         # Otherwise, the max score (cached in student_module) won't be available
-        problem = module_creator(problem_descriptor)
-        if problem is None:
-            return (None, None)
+        location_url = problem_descriptor.location.url()
+        if max_scores is not None and location_url in max_scores:
+            # module_creator would have checked access, so we still have to
+            if not has_access(user, problem_descriptor, 'load', course_id):
+                return (None, None)
+            total = max_scores[location_url]
+        else:
+            problem = module_creator(problem_descriptor)
+            if problem is None:
+                return (None, None)
+
+            total = problem.max_score()
+            # A problem that failed to load has no max score: don't remember
+            # that, so that it's computed again once the problem loads
+            if max_scores is not None and total is not None:
+                max_scores[location_url] = total
 
         correct = 0.0
-        total = problem.max_score()
 
         # Problem may be an error module (if something in the problem builder failed)
         # In which case total might be None
@@ -0,0 +1,68 @@
+"""
+Records StudentModuleHistory entries.
+
+Entries are written in the same transaction as the StudentModule they record,
+so they are rolled back with it. Within a HistoryBatch, such as the one
+ModelDataCache.save uses, the entries of all of the saved modules are inserted
+at once. A save that doesn't change the state, grade or max_grade that the
+StudentModule was loaded or last saved with isn't recorded (see
+StudentModuleHistory.save_history), so no earlier entries are looked up.
+"""
+
+import logging
+import threading
+
+from courseware.models import StudentModuleHistory
+
+log = logging.getLogger(__name__)
+
+_BATCH = threading.local()
+
+
+class HistoryBatch(object):
+    """
+    Context manager that holds back the entries recorded on this thread, and
+    writes them with one write_history when the outermost batch ends. If the
+    batch ends with an exception, the entries of the modules saved before it
+    are still written, without hiding the exception.
+    """
+    def __enter__(self):
+        self.outermost = getattr(_BATCH, 'entries', None) is None
+        if self.outermost:
+            _BATCH.entries = []
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.outermost:
+            return False
+        entries, _BATCH.entries = _BATCH.entries, None
+        if entries:
+            if exc_type is None:
+                write_history(entries)
+            else:
+                try:
+                    write_history(entries)
+                except Exception:
+                    log.exception("Couldn't write %d history entries", len(entries))
+        return False
+
+
+def record_history(entry):
+    """
+    Store the StudentModuleHistory entry, at the end of the current
+    HistoryBatch if there is one
+    """
+    entries = getattr(_BATCH, 'entries', None)
+    if entries is None:
+        write_history([entry])
+    else:
+        entries.append(entry)
+
+
+def write_history(entries):
+    """
+    Insert the StudentModuleHistory entries all at once
+    """
+    if entries:
+        StudentModuleHistory.objects.bulk_create(entries)
+    log.debug("Wrote %d history entries", len(entries))
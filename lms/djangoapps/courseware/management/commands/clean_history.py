@@ -6,6 +6,10 @@ need to clean out the unnecessary rows from the database.
 
 This command that does that.
 
+With --workers, the student_module_ids are split into ranges of
+--partition-size ids, which are cleaned in parallel, each remembering its
+progress in its own state file.
+
 """
 
 import datetime
@@ -14,6 +18,7 @@ import logging
 import optparse
 import time
 import traceback
+from multiprocessing.pool import ThreadPool
 
 from django.core.management.base import NoArgsCommand
 from django.db import connection
@@ -43,18 +48,73 @@ class Command(NoArgsCommand):
             default=0,
             help="Seconds to sleep between batches.",
         ),
+        optparse.make_option(
+            '--workers',
+            type='int',
+            default=1,
+            help="Number of ranges of student_module_ids to clean at once.",
+        ),
+        optparse.make_option(
+            '--partition-size',
+            type='int',
+            default=100000,
+            help="Number of student_module_ids in each range, with --workers.",
+        ),
     )
 
     def handle_noargs(self, **options):
         # We don't want to see the SQL output from the db layer.
         logging.getLogger("django.db.backends").setLevel(logging.INFO)
 
+        if options["workers"] > 1:
+            clean_in_parallel(
+                options["workers"],
+                options["partition_size"],
+                dry_run=options["dry_run"],
+                batch_size=options["batch"],
+                sleep=options["sleep"],
+            )
+            return
+
         smhc = StudentModuleHistoryCleaner(
             dry_run=options["dry_run"],
         )
         smhc.main(batch_size=options["batch"], sleep=options["sleep"])
 
 
+def clean_in_parallel(workers, partition_size, dry_run=False, batch_size=None, sleep=0):
+    """Clean the history in ranges of `partition_size` student_module_ids,
+    `workers` ranges at a time.
+
+    Each range is cleaned by its own StudentModuleHistoryCleaner, on its own
+    thread and database connection, and keeps its own state file, so that an
+    interrupted run can be resumed with the same `partition_size`.
+
+    """
+    last = StudentModuleHistoryCleaner(dry_run=dry_run).get_last_student_module_id()
+    if last is None:
+        return
+
+    def clean_partition(first_id):
+        """Clean the range of student_module_ids starting at first_id."""
+        try:
+            smhc = StudentModuleHistoryCleaner(
+                dry_run=dry_run,
+                first_id=first_id,
+                last_id=first_id + partition_size - 1,
+                state_file="clean_history.{}.json".format(first_id),
+            )
+            smhc.main(batch_size=batch_size, sleep=sleep)
+        finally:
+            connection.close()
+
+    pool = ThreadPool(workers)
+    try:
+        pool.map(clean_partition, range(0, last + 1, partition_size), chunksize=1)
+    finally:
+        pool.close()
+
+
 class StudentModuleHistoryCleaner(object):
     """Logic to clean rows from the StudentModuleHistory table."""
 
@@ -62,9 +122,16 @@ class StudentModuleHistoryCleaner(object):
     STATE_FILE = "clean_history.json"
     BATCH_SIZE = 100
 
-    def __init__(self, dry_run=False):
+    def __init__(self, dry_run=False, first_id=0, last_id=None, state_file=None):
+        """
+        `first_id` and `last_id` limit the student_module_ids to clean, and
+        `state_file` replaces STATE_FILE, to clean ranges of them in parallel.
+        """
         self.dry_run = dry_run
-        self.next_student_module_id = 0
+        self.first_id = first_id
+        self.last_id = last_id
+        self.state_file = state_file or self.STATE_FILE
+        self.next_student_module_id = first_id
         self.last_student_module_id = 0
 
     def main(self, batch_size=None, sleep=0):
@@ -75,6 +142,8 @@ class StudentModuleHistoryCleaner(object):
         connection.enter_transaction_management()
 
         self.last_student_module_id = self.get_last_student_module_id()
+        if self.last_id is not None:
+            self.last_student_module_id = min(self.last_student_module_id, self.last_id)
         self.load_state()
 
         while self.next_student_module_id <= self.last_student_module_id:
@@ -111,10 +180,10 @@ class StudentModuleHistoryCleaner(object):
         Load the latest state from disk.
         """
         try:
-            state_file = open(self.STATE_FILE)
+            state_file = open(self.state_file)
         except IOError:
             self.say("No stored state")
-            self.next_student_module_id = 0
+            self.next_student_module_id = self.first_id
         else:
             with state_file:
                 state = json.load(state_file)
@@ -132,7 +201,7 @@ class StudentModuleHistoryCleaner(object):
         state = {
             'next_student_module_id': self.next_student_module_id,
         }
-        with open(self.STATE_FILE, "w") as state_file:
+        with open(self.state_file, "w") as state_file:
             json.dump(state, state_file)
         self.say("Saved state: {}".format(json.dumps(state, sort_keys=True)))
 
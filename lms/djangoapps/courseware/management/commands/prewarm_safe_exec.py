@@ -0,0 +1,93 @@
+'''
+Run the scripts of all the problems in a course, for every seed that a student
+can be given, so that their results are in the safe_exec cache before students
+load the problems.
+'''
+
+import logging
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from capa.capa_problem import LoncapaProblem
+from mitxmako.shortcuts import render_to_string
+from util.sandboxing import can_execute_unsafe_code
+from xmodule.capa_module import possible_seeds
+from xmodule.modulestore import Location
+from xmodule.modulestore.django import modulestore
+from xmodule.x_module import ModuleSystem
+
+from courseware.module_render import SAFE_EXEC_CACHE
+
+LOG = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    '''
+    Usage: prewarm_safe_exec course_id [--max-seeds N]
+
+    Problems whose seed is chosen at random (rerandomize "always" or
+    "onreset") can get up to 1000 different seeds; use --max-seeds to only
+    warm up the first N of them.
+    '''
+    args = '<course_id>'
+    help = __doc__
+
+    option_list = BaseCommand.option_list + (
+        make_option('--max-seeds',
+                    action='store',
+                    type='int',
+                    dest='max_seeds',
+                    default=None,
+                    help='Run each problem with at most this many seeds.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Usage: prewarm_safe_exec course_id [--max-seeds N]')
+        course_id = args[0]
+        org, course_num, _ = course_id.split('/')
+
+        problems = modulestore().get_items(Location('i4x', org, course_num, 'problem', None), course_id=course_id)
+        # Problems without scripts don't run any code when they're loaded
+        problems = [problem for problem in problems if '<script' in problem.data]
+        LOG.info("Warming up the safe_exec cache for %d problems in %s", len(problems), course_id)
+
+        for problem in problems:
+            seeds = possible_seeds(problem.rerandomize)[:options['max_seeds']]
+            system = self.make_system(problem, course_id)
+            failures = 0
+            for seed in seeds:
+                try:
+                    LoncapaProblem(
+                        problem.data,
+                        id=problem.location.html_id(),
+                        seed=seed,
+                        system=system,
+                        cache_group="/".join([org, course_num]),
+                    )
+                except Exception:  # pylint: disable=W0703
+                    # The scripts have been run by now, unless they raised;
+                    # the errors show up to students when they load the problem.
+                    failures += 1
+            LOG.info("%s: ran %d seeds, %d failed", problem.location.url(), len(seeds), failures)
+
+    def make_system(self, problem, course_id):
+        '''
+        Return a ModuleSystem that runs the problem's code like the LMS does.
+        '''
+        system = ModuleSystem(
+            ajax_url=None,
+            track_function=lambda event_type, event: None,
+            get_module=lambda descriptor: None,
+            render_template=render_to_string,
+            replace_urls=lambda html: html,
+            xblock_model_data=None,
+            filestore=problem.system.resources_fs,
+            course_id=course_id,
+            cache=SAFE_EXEC_CACHE,
+            can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
+        )
+        system.set('DEBUG', settings.DEBUG)
+        return system
@@ -0,0 +1,29 @@
+'''
+Move the shards of the counts that students share, such as the votes of polls
+and the words of word clouds, into one row per key. Meant to be run
+periodically, e.g. from cron.
+'''
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from courseware.model_data import ContentCounters
+
+
+class Command(BaseCommand):
+    '''
+    Usage: rollup_content_counters [--location LOCATION]
+    '''
+    help = __doc__
+
+    option_list = BaseCommand.option_list + (
+        make_option('--location',
+                    action='store',
+                    default=None,
+                    help='Only roll up the counts of the module at this location'),
+    )
+
+    def handle(self, *args, **options):
+        rolled_up = ContentCounters().rollup(options['location'])
+        self.stdout.write('Rolled up the counts of {0} keys\n'.format(rolled_up))
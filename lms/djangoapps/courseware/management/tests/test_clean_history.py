@@ -481,3 +481,25 @@ class HistoryCleanerMainTest(HistoryCleanerTest):
             '(not really committing)',
             'Saved state: {"next_student_module_id": 30}',
         )
+
+    def test_one_range_of_ids(self):
+        smhc = SmhcForTestingMain(first_id=25, last_id=27, state_file="clean_history.25.json")
+        self.addCleanup(os.remove, "clean_history.25.json")
+        self.write_history([
+            (3, "2013-07-15 15:04:01.000", 24),
+            (4, "2013-07-15 15:04:00.000", 25),
+            (5, "2013-07-15 15:04:00.000", 26),
+            (6, "2013-07-15 15:04:00.000", 27),
+            (7, "2013-07-15 15:04:00.000", 28),
+        ])
+        smhc.main()
+        self.assert_said(smhc,
+            'Last student_module_id is 28',
+            'No stored state',
+            '(not really cleaning 25)',
+            '(not really cleaning 26)',
+            '(not really cleaning 27)',
+            '(not really committing)',
+            'Saved state: {"next_student_module_id": 28}',
+        )
+        self.assertFalse(os.path.exists(StudentModuleHistoryCleaner.STATE_FILE))
@@ -3,18 +3,25 @@ Classes to provide the LMS runtime data storage to XBlocks
 """
 
 import json
-from collections import namedtuple, defaultdict
+import random
+from collections import namedtuple, defaultdict, OrderedDict
 from itertools import chain
 from .models import (
     StudentModule,
+    XModuleContentCounter,
     XModuleContentField,
     XModuleSettingsField,
     XModuleStudentPrefsField,
     XModuleStudentInfoField
 )
+from .history import HistoryBatch
 import logging
 
-from django.db import DatabaseError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_save
 
 from xblock.runtime import KeyValueStore, InvalidScopeError
 from xblock.core import KeyValueMultiSaveError, Scope
@@ -42,34 +49,56 @@ class ModelDataCache(object):
     A cache of django model objects needed to supply the data
     for a module and its decendants
     """
-    def __init__(self, descriptors, course_id, user, select_for_update=False):
+    def __init__(self, descriptors, course_id, user, select_for_update=False, scopes=None,
+                 defer_writes=False):
         '''
         Find any courseware.models objects that are needed by any descriptor
         in descriptors. Attempts to minimize the number of queries to the database.
         Note: Only modules that have store_state = True or have shared
         state will have a StudentModule.
 
+        Objects for other descriptors, or in scopes that weren't fetched up
+        front, are fetched from the database one at a time when they are
+        looked up.
+
         Arguments
         descriptors: A list of XModuleDescriptors.
         course_id: The id of the current course
         user: The user for which to cache data
         select_for_update: True if rows should be locked until end of transaction
+        scopes: The scopes to fetch the fields of descriptors in up front, or
+            None for all of them
+        defer_writes: If True, changed objects are only written to the
+            database when save() is called, rather than as soon as they change
         '''
         self.cache = {}
         self.descriptors = descriptors
         self.select_for_update = select_for_update
         self.course_id = course_id
         self.user = user
+        self.defer_writes = defer_writes
+        # The groups of objects (see _fetch_group_from_kvs_key) that have
+        # been fetched from the database already
+        self.fetched_groups = set()
+        # The decoded states of StudentModules, by cache key, so that each
+        # state is only decoded once, and encoded once when it's saved
+        self.user_states = {}
+        # The objects that have changed since they were last saved, by cache
+        # key, mapped to the names of the fields that changed in them
+        self.dirty = OrderedDict()
 
         if user.is_authenticated():
             for scope, fields in self._fields_to_cache().items():
+                if scopes is not None and scope not in scopes:
+                    continue
                 for field_object in self._retrieve_fields(scope, fields):
                     self.cache[self._cache_key_from_field_object(scope, field_object)] = field_object
+                self.fetched_groups.update(self._fetch_groups(scope))
 
     @classmethod
     def cache_for_descriptor_descendents(cls, course_id, user, descriptor, depth=None,
                                          descriptor_filter=lambda descriptor: True,
-                                         select_for_update=False):
+                                         select_for_update=False, scopes=None, defer_writes=False):
         """
         course_id: the course in the context of which we want StudentModules.
         user: the django user for whom to load modules.
@@ -79,6 +108,11 @@ class ModelDataCache(object):
         descriptor_filter is a function that accepts a descriptor and return wether the StudentModule
             should be cached
         select_for_update: Flag indicating whether the rows should be locked until end of transaction
+        scopes: The scopes to load up front, or None for all of them. Objects in
+            other scopes, or for modules deeper than depth, are loaded when
+            they are used.
+        defer_writes: If True, changes are only written to the database when
+            save() is called on the returned ModelDataCache
         """
 
         def get_child_descriptors(descriptor, depth, descriptor_filter):
@@ -106,7 +140,7 @@ class ModelDataCache(object):
 
         descriptors = get_child_descriptors(descriptor, depth, descriptor_filter)
 
-        return ModelDataCache(descriptors, course_id, user, select_for_update)
+        return ModelDataCache(descriptors, course_id, user, select_for_update, scopes, defer_writes)
 
     def _query(self, model_class, **kwargs):
         """
@@ -181,6 +215,76 @@ class ModelDataCache(object):
         else:
             raise InvalidScopeError(scope)
 
+    def _retrieve_field(self, key):
+        """
+        Queries the database for the object that holds the field for the
+        specified KeyValueStore key, and returns it, or None if there isn't one
+        """
+        if key.scope == Scope.user_state:
+            query = self._query(
+                StudentModule,
+                course_id=self.course_id,
+                student=self.user.pk,
+                module_state_key=key.block_scope_id.url(),
+            )
+        elif key.scope == Scope.content:
+            query = self._query(
+                XModuleContentField,
+                definition_id=key.block_scope_id.url(),
+                field_name=key.field_name,
+            )
+        elif key.scope == Scope.settings:
+            query = self._query(
+                XModuleSettingsField,
+                usage_id='%s-%s' % (self.course_id, key.block_scope_id.url()),
+                field_name=key.field_name,
+            )
+        elif key.scope == Scope.preferences:
+            query = self._query(
+                XModuleStudentPrefsField,
+                module_type=key.block_scope_id,
+                student=self.user.pk,
+                field_name=key.field_name,
+            )
+        elif key.scope == Scope.user_info:
+            query = self._query(
+                XModuleStudentInfoField,
+                student=self.user.pk,
+                field_name=key.field_name,
+            )
+        else:
+            return None
+
+        field_objects = list(query[:1])
+        return field_objects[0] if field_objects else None
+
+    def _fetch_groups(self, scope):
+        """
+        Returns the groups of objects in scope that _retrieve_fields fetches
+        for self.descriptors
+        """
+        if scope in (Scope.user_state, Scope.content, Scope.settings):
+            return set((scope, descriptor.location.url()) for descriptor in self.descriptors)
+        elif scope == Scope.preferences:
+            return set((scope, descriptor.module_class.__name__) for descriptor in self.descriptors)
+        elif scope == Scope.user_info:
+            return set([(scope,)])
+        return set()
+
+    def _fetch_group_from_kvs_key(self, key):
+        """
+        Return the group of objects that the object for the specified
+        KeyValueStore key is fetched with, or None if it isn't stored in the
+        database
+        """
+        if key.scope in (Scope.user_state, Scope.content, Scope.settings):
+            return (key.scope, key.block_scope_id.url())
+        elif key.scope == Scope.preferences:
+            return (key.scope, key.block_scope_id)
+        elif key.scope == Scope.user_info:
+            return (key.scope,)
+        return None
+
     def _fields_to_cache(self):
         """
         Returns a map of scopes to fields in that scope that should be cached
@@ -230,12 +334,21 @@ class ModelDataCache(object):
 
         returns the found object, or None if the object doesn't exist
         '''
-        return self.cache.get(self._cache_key_from_kvs_key(key))
+        cache_key = self._cache_key_from_kvs_key(key)
+        if cache_key not in self.cache and self.user.is_authenticated():
+            group = self._fetch_group_from_kvs_key(key)
+            if group is not None and group not in self.fetched_groups:
+                # Remember missing objects too, so they are only looked up once
+                self.cache[cache_key] = self._retrieve_field(key)
+        return self.cache.get(cache_key)
 
     def find_or_create(self, key):
         '''
         Find a model data object in this cache, or create it if it doesn't
-        exist
+        exist.
+
+        A created object isn't written to the database until it's marked as
+        dirty (see mark_dirty) and saved.
         '''
         field_object = self.find(key)
 
@@ -243,33 +356,31 @@ class ModelDataCache(object):
             return field_object
 
         if key.scope == Scope.user_state:
-            field_object, _ = StudentModule.objects.get_or_create(
+            field_object = StudentModule(
                 course_id=self.course_id,
                 student=self.user,
                 module_state_key=key.block_scope_id.url(),
-                defaults={
-                    'state': json.dumps({}),
-                    'module_type': key.block_scope_id.category,
-                },
+                state=json.dumps({}),
+                module_type=key.block_scope_id.category,
             )
         elif key.scope == Scope.content:
-            field_object, _ = XModuleContentField.objects.get_or_create(
+            field_object = XModuleContentField(
                 field_name=key.field_name,
                 definition_id=key.block_scope_id.url()
             )
         elif key.scope == Scope.settings:
-            field_object, _ = XModuleSettingsField.objects.get_or_create(
+            field_object = XModuleSettingsField(
                 field_name=key.field_name,
                 usage_id='%s-%s' % (self.course_id, key.block_scope_id.url()),
             )
         elif key.scope == Scope.preferences:
-            field_object, _ = XModuleStudentPrefsField.objects.get_or_create(
+            field_object = XModuleStudentPrefsField(
                 field_name=key.field_name,
                 module_type=key.block_scope_id,
                 student=self.user,
             )
         elif key.scope == Scope.user_info:
-            field_object, _ = XModuleStudentInfoField.objects.get_or_create(
+            field_object = XModuleStudentInfoField(
                 field_name=key.field_name,
                 student=self.user,
             )
@@ -278,6 +389,133 @@ class ModelDataCache(object):
         self.cache[cache_key] = field_object
         return field_object
 
+    def user_state(self, key):
+        """
+        Return the decoded state of the StudentModule for the Scope.user_state
+        KeyValueStore key, or None if there's no StudentModule.
+
+        The state is decoded once. Changes to it are written to the
+        StudentModule when it's marked as dirty and saved.
+        """
+        field_object = self.find(key)
+        if field_object is None:
+            return None
+        cache_key = self._cache_key_from_kvs_key(key)
+        if cache_key not in self.user_states:
+            self.user_states[cache_key] = json.loads(field_object.state)
+        return self.user_states[cache_key]
+
+    def mark_dirty(self, key):
+        """
+        Remember that the object for the KeyValueStore key has changed, so that
+        it's written by the next save()
+        """
+        self.dirty.setdefault(self._cache_key_from_kvs_key(key), []).append(key.field_name)
+
+    def forget(self, key):
+        """
+        Forget the object for the KeyValueStore key, after it was deleted from
+        the database
+        """
+        cache_key = self._cache_key_from_kvs_key(key)
+        self.cache[cache_key] = None
+        self.user_states.pop(cache_key, None)
+        self.dirty.pop(cache_key, None)
+
+    def save_unless_deferred(self):
+        """
+        Save the dirty objects now, unless writes are deferred until save()
+        """
+        if not self.defer_writes:
+            self.save()
+
+    def save(self):
+        """
+        Write all dirty objects to the database: one UPDATE per changed row,
+        and one bulk INSERT per table for new rows.
+
+        Raises a KeyValueMultiSaveError with the names of the fields that were
+        saved if a write fails.
+        """
+        saved_fields = []
+        new_objects = defaultdict(list)
+        existing_objects = []
+        dirty_fields = list(chain.from_iterable(self.dirty.values()))
+        for cache_key, field_names in self.dirty.items():
+            field_object = self.cache[cache_key]
+            if cache_key in self.user_states:
+                field_object.state = json.dumps(self.user_states[cache_key])
+            if field_object.pk is None:
+                new_objects[type(field_object)].append((field_object, field_names))
+            else:
+                existing_objects.append((field_object, field_names))
+        self.dirty.clear()
+
+        try:
+            # Insert the history entries of all of the saved modules at once
+            with HistoryBatch():
+                for model_class, objects in new_objects.items():
+                    self._create_objects(model_class, objects)
+                    for _, field_names in objects:
+                        saved_fields.extend(field_names)
+
+                # Update rows in primary key order, so that concurrent requests
+                # lock them in the same order
+                for field_object, field_names in sorted(existing_objects, key=lambda item: item[0].pk):
+                    field_object.save(force_update=True)
+                    saved_fields.extend(field_names)
+        except DatabaseError:
+            log.error('Error saving fields %r', dirty_fields)
+            raise KeyValueMultiSaveError(saved_fields)
+
+    def _create_objects(self, model_class, objects):
+        """
+        Insert the new (field_object, field_names) objects of model_class with
+        one query, and give the field_objects the primary keys of their rows.
+
+        If some rows were created by a concurrent request in the meantime, the
+        objects are saved one at a time instead, over those rows.
+        """
+        unique_fields = model_class._meta.unique_together[0]
+
+        def unique_values(field_object):
+            """The values of the unique_together fields of field_object"""
+            return tuple(
+                getattr(field_object, model_class._meta.get_field(name).attname)
+                for name in unique_fields
+            )
+
+        try:
+            model_class.objects.bulk_create([field_object for field_object, _ in objects])
+        except IntegrityError:
+            for field_object, field_names in objects:
+                existing = list(model_class.objects.filter(
+                    **dict(zip(unique_fields, unique_values(field_object)))
+                )[:1])
+                if existing:
+                    field_object.pk = existing[0].pk
+                    if model_class is StudentModule:
+                        # Keep the fields that the other request set
+                        state = json.loads(existing[0].state)
+                        own_state = json.loads(field_object.state)
+                        state.update((name, own_state[name]) for name in field_names if name in own_state)
+                        field_object.state = json.dumps(state)
+                field_object.save()
+            return
+
+        # bulk_create doesn't set primary keys or send post_save, so fetch the
+        # keys of the new rows and send it (e.g. to record StudentModuleHistory)
+        query = Q()
+        for field_object, _ in objects:
+            query |= Q(**dict(zip(unique_fields, unique_values(field_object))))
+        pks = dict(
+            (tuple(values[1:]), values[0])
+            for values in model_class.objects.filter(query).values_list('pk', *unique_fields)
+        )
+        for field_object, _ in objects:
+            field_object.pk = pks.get(unique_values(field_object))
+            post_save.send(sender=model_class, instance=field_object, created=True, raw=False)
+
 
 class LmsKeyValueStore(KeyValueStore):
     """
@@ -324,14 +562,16 @@ class LmsKeyValueStore(KeyValueStore):
         if key.scope not in self._allowed_scopes:
             raise InvalidScopeError(key.scope)
 
+        if key.scope == Scope.user_state:
+            state = self._model_data_cache.user_state(key)
+            if state is None:
+                raise KeyError(key.field_name)
+            return state[key.field_name]
+
         field_object = self._model_data_cache.find(key)
         if field_object is None:
             raise KeyError(key.field_name)
-
-        if key.scope == Scope.user_state:
-            return json.loads(field_object.state)[key.field_name]
-        else:
-            return json.loads(field_object.value)
+        return json.loads(field_object.value)
 
     def set(self, key, value):
         """
@@ -347,9 +587,6 @@ class LmsKeyValueStore(KeyValueStore):
           xblock.DbModel._key : value
 
         """
-        saved_fields = []
-        # field_objects maps a field_object to a list of associated fields
-        field_objects = dict()
         for field in kv_dict:
             # Check field for validity
             if field.field_name in self._descriptor_model_data:
@@ -358,33 +595,19 @@ class LmsKeyValueStore(KeyValueStore):
             if field.scope not in self._allowed_scopes:
                 raise InvalidScopeError(field.scope)
 
-            # If the field is valid and isn't already in the dictionary, add it.
+        for field in kv_dict:
             field_object = self._model_data_cache.find_or_create(field)
-            if field_object not in field_objects.keys():
-                field_objects[field_object] = []
-            # Update the list of associated fields
-            field_objects[field_object].append(field)
 
             # Special case when scope is for the user state, because this scope saves fields in a single row
             if field.scope == Scope.user_state:
-                state = json.loads(field_object.state)
-                state[field.field_name] = kv_dict[field]
-                field_object.state = json.dumps(state)
+                self._model_data_cache.user_state(field)[field.field_name] = kv_dict[field]
             else:
             # The remaining scopes save fields on different rows, so
             # we don't have to worry about conflicts
                 field_object.value = json.dumps(kv_dict[field])
+            self._model_data_cache.mark_dirty(field)
 
-        for field_object in field_objects:
-            try:
-                # Save the field object that we made above
-                field_object.save()
-                # If save is successful on this scope, add the saved fields to
-                # the list of successful saves
-                saved_fields.extend([field.field_name for field in field_objects[field_object]])
-            except DatabaseError:
-                log.error('Error saving fields %r', field_objects[field_object])
-                raise KeyValueMultiSaveError(saved_fields)
+        self._model_data_cache.save_unless_deferred()
 
     def delete(self, key):
         if key.field_name in self._descriptor_model_data:
@@ -393,17 +616,21 @@ class LmsKeyValueStore(KeyValueStore):
         if key.scope not in self._allowed_scopes:
             raise InvalidScopeError(key.scope)
 
+        if key.scope == Scope.user_state:
+            state = self._model_data_cache.user_state(key)
+            if state is None:
+                raise KeyError(key.field_name)
+            del state[key.field_name]
+            self._model_data_cache.mark_dirty(key)
+            self._model_data_cache.save_unless_deferred()
+            return
+
         field_object = self._model_data_cache.find(key)
         if field_object is None:
             raise KeyError(key.field_name)
-
-        if key.scope == Scope.user_state:
-            state = json.loads(field_object.state)
-            del state[key.field_name]
-            field_object.state = json.dumps(state)
-            field_object.save()
-        else:
+        if field_object.pk is not None:
             field_object.delete()
+        self._model_data_cache.forget(key)
 
     def has(self, key):
         if key.field_name in self._descriptor_model_data:
@@ -415,14 +642,151 @@ class LmsKeyValueStore(KeyValueStore):
         if key.scope not in self._allowed_scopes:
             raise InvalidScopeError(key.scope)
 
-        field_object = self._model_data_cache.find(key)
-        if field_object is None:
-            return False
-
         if key.scope == Scope.user_state:
-            return key.field_name in json.loads(field_object.state)
-        else:
-            return True
+            state = self._model_data_cache.user_state(key)
+            return state is not None and key.field_name in state
+
+        return self._model_data_cache.find(key) is not None
+
+
+class ContentCounters(object):
+    """
+    The content_counters service of the LMS runtime (see
+    xmodule.content_counters): counts that all students add to, kept in
+    XModuleContentCounter rows.
+
+    Each increment goes to one of SHARDS rows of a key, picked at random, and
+    changes it with an atomic UPDATE, so that students who vote at the same
+    time rarely wait for each other, and never overwrite each other's votes.
+    rollup() moves the counts of the shards into one row.
+
+    Keys longer than XModuleContentCounter.key can hold, such as very long
+    words, are counted by their first KEY_MAX_LENGTH characters.
+    """
+    SHARDS = 16
+    # The shard that counts seeded from a field are kept in
+    SEED_SHARD = 0
+    # The shard that rollup() moves counts into
+    ROLLUP_SHARD = 1
+    KEY_MAX_LENGTH = XModuleContentCounter._meta.get_field('key').max_length
+
+    def _query(self, definition_id, field_name):
+        """The XModuleContentCounters of the field"""
+        return XModuleContentCounter.objects.filter(definition_id=definition_id, field_name=field_name)
+
+    def _stored_key(self, key):
+        """The key that key is counted by"""
+        return key[:self.KEY_MAX_LENGTH]
+
+    def _stored_counts(self, counts):
+        """The dict of counts, by the keys they're counted by"""
+        stored_counts = defaultdict(int)
+        for key, count in counts.items():
+            stored_counts[self._stored_key(key)] += count
+        return stored_counts
+
+    def _add(self, query, delta, **lookup):
+        """
+        Add delta to the count of the counter selected by query, creating it
+        from lookup if it doesn't exist
+        """
+        if query.update(count=F('count') + delta):
+            return
+        _, created = XModuleContentCounter.objects.get_or_create(defaults={'count': delta}, **lookup)
+        if not created:
+            query.update(count=F('count') + delta)
+
+    def increment(self, definition_id, field_name, deltas):
+        """
+        Add the dict of deltas to the counts of their keys, and return the new
+        counts of those keys
+        """
+        shard = random.randint(self.ROLLUP_SHARD, self.SHARDS)
+        for key, delta in self._stored_counts(deltas).items():
+            lookup = dict(definition_id=definition_id, field_name=field_name, key=key, shard=shard)
+            self._add(XModuleContentCounter.objects.filter(**lookup), delta, **lookup)
+        return self.counts(definition_id, field_name, deltas.keys())
+
+    def counts(self, definition_id, field_name, keys=None):
+        """
+        Return a dict of the counts of keys, or of all keys if keys is None
+        """
+        query = self._query(definition_id, field_name)
+        if keys is not None:
+            keys = list(keys)
+            query = query.filter(key__in=set(self._stored_key(key) for key in keys))
+        counts = dict(query.values_list('key').annotate(total=Sum('count')))
+        if keys is None:
+            return counts
+        return dict((key, counts.get(self._stored_key(key), 0)) for key in keys)
+
+    def top(self, definition_id, field_name, amount):
+        """
+        Return a dict of the `amount` highest non-zero counts, and the total of
+        all counts. These are cached for settings.CONTENT_COUNTERS_CACHE_TIMEOUT
+        seconds.
+        """
+        cache_key = u'content_counters.top.{0}.{1}.{2}'.format(definition_id, field_name, amount)
+        cache_timeout = getattr(settings, 'CONTENT_COUNTERS_CACHE_TIMEOUT', 5)
+        if cache_timeout:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        query = self._query(definition_id, field_name)
+        totals = query.values('key').annotate(total=Sum('count')).filter(total__gt=0).order_by('-total')
+        top = dict((row['key'], row['total']) for row in totals[:amount])
+        total = query.aggregate(total=Sum('count'))['total'] or 0
+
+        if cache_timeout:
+            cache.set(cache_key, (top, total), cache_timeout)
+        return top, total
+
+    def seed(self, definition_id, field_name, counts):
+        """
+        Add the dict of counts, that were kept in the field itself before, unless
+        they were added already
+        """
+        counters = [
+            XModuleContentCounter(
+                definition_id=definition_id, field_name=field_name, key=key, shard=self.SEED_SHARD, count=count
+            )
+            for key, count in self._stored_counts(counts).items() if count
+        ]
+        if not counters:
+            return
+        sid = transaction.savepoint()
+        try:
+            XModuleContentCounter.objects.bulk_create(counters)
+            transaction.savepoint_commit(sid)
+        except IntegrityError:
+            # Another request seeded them first
+            transaction.savepoint_rollback(sid)
+
+    def rollup(self, definition_id=None):
+        """
+        Move the counts of the shards of each key into one row, and delete the
+        emptied rows. Counts that are incremented meanwhile are kept. Returns
+        the number of keys that were rolled up.
+        """
+        query = XModuleContentCounter.objects.filter(shard__gt=self.ROLLUP_SHARD)
+        if definition_id is not None:
+            query = query.filter(definition_id=definition_id)
+        groups = query.values('definition_id', 'field_name', 'key').annotate(shards=Count('id'))
+
+        for group in groups:
+            del group['shards']
+            with transaction.commit_on_success():
+                moved = 0
+                for pk, count in query.filter(**group).values_list('pk', 'count'):
+                    if count:
+                        XModuleContentCounter.objects.filter(pk=pk).update(count=F('count') - count)
+                        moved += count
+                query.filter(count=0, **group).delete()
+                lookup = dict(group, shard=self.ROLLUP_SHARD)
+                if moved:
+                    self._add(XModuleContentCounter.objects.filter(**lookup), moved, **lookup)
+        return len(groups)
 
 
 LmsUsage = namedtuple('LmsUsage', 'id, def_id')
@@ -14,7 +14,7 @@ ASSUMPTIONS: modules have unique IDs, even across different module_types
 """
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
 
 
@@ -90,16 +90,42 @@ class StudentModuleHistory(models.Model):
     grade = models.FloatField(null=True, blank=True)
     max_grade = models.FloatField(null=True, blank=True)
 
+    @classmethod
+    def for_student_module(cls, student_module):
+        """
+        Return an (unsaved) history entry of the current state of student_module
+        """
+        return cls(student_module=student_module,
+                   version=None,
+                   created=student_module.modified,
+                   state=student_module.state,
+                   grade=student_module.grade,
+                   max_grade=student_module.max_grade)
+
+    @staticmethod
+    def history_values(student_module):
+        """
+        The values of student_module that a save has to change to be recorded
+        """
+        return (student_module.state, student_module.grade, student_module.max_grade)
+
+    @receiver(post_init, sender=StudentModule)
+    def remember_history_values(sender, instance, **kwargs):
+        # The last history entry of a StudentModule that was loaded from the
+        # database has the values it was loaded with
+        if instance.pk is not None:
+            instance._history_values = StudentModuleHistory.history_values(instance)
+
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):
         if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
-            history_entry = StudentModuleHistory(student_module=instance,
-                                                 version=None,
-                                                 created=instance.modified,
-                                                 state=instance.state,
-                                                 grade=instance.grade,
-                                                 max_grade=instance.max_grade)
-            history_entry.save()
+            values = StudentModuleHistory.history_values(instance)
+            if values == getattr(instance, '_history_values', None):
+                return
+            # Imported here because courseware.history imports these models
+            from courseware.history import record_history
+            record_history(StudentModuleHistory.for_student_module(instance))
+            instance._history_values = values
 
 
 class XModuleContentField(models.Model):
@@ -133,6 +159,42 @@ class XModuleContentField(models.Model):
         return unicode(repr(self))
 
 
+class XModuleContentCounter(models.Model):
+    """
+    One shard of a count shared by all students, kept for a key of a
+    Scope.content field, such as the votes for one answer of a poll. The
+    count of a key is the sum of its shards, so that students who increment it
+    at the same time mostly update different rows.
+    """
+
+    class Meta:
+        unique_together = (('definition_id', 'field_name', 'key', 'shard'),)
+
+    # The definition id for the module
+    definition_id = models.CharField(max_length=255, db_index=True)
+
+    # The name of the field
+    field_name = models.CharField(max_length=64)
+
+    # The key that is counted, e.g. a poll answer id or a word
+    key = models.CharField(max_length=255)
+
+    shard = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    def __repr__(self):
+        return 'XModuleContentCounter<%r>' % ({
+            'field_name': self.field_name,
+            'definition_id': self.definition_id,
+            'key': self.key,
+            'shard': self.shard,
+            'count': self.count,
+        },)
+
+    def __unicode__(self):
+        return unicode(repr(self))
+
+
 class XModuleSettingsField(models.Model):
     """
     Stores data set in the Scope.settings scope by an xmodule field
@@ -228,6 +290,33 @@ class XModuleStudentInfoField(models.Model):
         return unicode(repr(self))
 
 
+class StudentSectionScore(models.Model):
+    """
+    The raw problem scores of a student in one graded section of a course, as
+    computed by courseware.grades. They are reused for as long as `signature`
+    (a digest of the section's problems and of the student's grades on them)
+    is unchanged, and `expires` (when access to a problem may change) hasn't
+    passed.
+    """
+    class Meta:
+        unique_together = (('student', 'course_id', 'section_key'),)
+
+    student = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+    # location url of the section
+    section_key = models.CharField(max_length=255, db_column='section_id')
+
+    signature = models.CharField(max_length=32)
+    expires = models.DateTimeField(null=True, blank=True)
+    # list of [correct, total, graded, display_name], stored as JSON
+    scores = models.TextField(default='[]')
+
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __unicode__(self):
+        return "[StudentSectionScore] %s: %s %s = %s" % (self.student, self.course_id, self.section_key, self.scores)
+
+
 class OfflineComputedGrade(models.Model):
     """
     Table of grades computed offline for a given user and course.
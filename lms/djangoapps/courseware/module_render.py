@@ -15,6 +15,7 @@ from django.views.decorators.csrf import csrf_exempt
 from requests.auth import HTTPBasicAuth
 from statsd import statsd
 
+from capa.safe_exec import SafeExecCache
 from capa.xqueue_interface import XQueueInterface
 from mitxmako.shortcuts import render_to_string
 from xblock.runtime import DbModel
@@ -25,7 +26,7 @@ from xmodule.modulestore import Location
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.x_module import ModuleSystem
-from xmodule_modifiers import replace_course_urls, replace_jump_to_id_urls, replace_static_urls, add_histogram, wrap_xmodule, save_module  # pylint: disable=F0401
+from xmodule_modifiers import replace_urls, add_histogram, wrap_xmodule, save_module, cache_html  # pylint: disable=F0401
 
 import static_replace
 from psychometrics.psychoanalyze import make_psychometrics_data_update_handler
@@ -33,7 +34,7 @@ from student.models import unique_id_for_user
 
 from courseware.access import has_access
 from courseware.masquerade import setup_masquerade
-from courseware.model_data import LmsKeyValueStore, LmsUsage, ModelDataCache
+from courseware.model_data import ContentCounters, LmsKeyValueStore, LmsUsage, ModelDataCache
 from xblock.runtime import KeyValueStore
 from xblock.core import Scope
 from courseware.models import StudentModule
@@ -42,6 +43,17 @@ from util.json_request import JsonResponse
 
 log = logging.getLogger(__name__)
 
+# The results of sandboxed problem code, cached in this process in front of
+# the django cache
+SAFE_EXEC_CACHE = SafeExecCache(cache)
+
+# The scopes of the module's data that modx_dispatch loads up front. The
+# student's preferences and info are loaded if the module uses them.
+DISPATCH_SCOPES = (Scope.user_state, Scope.settings, Scope.content)
+
+# Keeps the counts that all students of a module add to, such as poll votes
+CONTENT_COUNTERS = ContentCounters()
+
 
 if settings.XQUEUE_INTERFACE.get('basic_auth') is not None:
     requests_auth = HTTPBasicAuth(*settings.XQUEUE_INTERFACE['basic_auth'])
@@ -321,7 +333,8 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
         student_module.grade = event.get('value')
         student_module.max_grade = event.get('max_value')
         # Save all changes to the underlying KeyValueStore
-        student_module.save()
+        model_data_cache.mark_dirty(key)
+        model_data_cache.save_unless_deferred()
 
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
@@ -377,8 +390,9 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
         course_id=course_id,
         open_ended_grading_interface=open_ended_grading_interface,
         s3_interface=s3_interface,
-        cache=cache,
+        cache=SAFE_EXEC_CACHE,
         can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
+        content_counters=CONTENT_COUNTERS,
     )
 
     # pass position specified in URL to module through ModuleSystem
@@ -415,30 +429,31 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
     if wrap_xmodule_display is True:
         _get_html = wrap_xmodule(module.get_html, module, 'xmodule_display.html')
 
-    module.get_html = replace_static_urls(
-        _get_html,
-        getattr(descriptor, 'data_dir', None),
-        course_id=course_id,
-        static_asset_path=static_asset_path or descriptor.lms.static_asset_path
-    )
-
-    # Allow URLs of the form '/course/' refer to the root of multicourse directory
-    #   hierarchy of this course
-    module.get_html = replace_course_urls(module.get_html, course_id)
-
-    # this will rewrite intra-courseware links
-    # that use the shorthand /jump_to_id/<id>. This is very helpful
-    # for studio authored courses (compared to the /course/... format) since it is
-    # is durable with respect to moves and the author doesn't need to
-    # know the hierarchy
+    # Rewrite /static/ urls to the course's assets, allow URLs of the form
+    # '/course/' refer to the root of multicourse directory hierarchy of this
+    # course, and rewrite intra-courseware links that use the shorthand
+    # /jump_to_id/<id>. That is very helpful for studio authored courses
+    # (compared to the /course/... format) since it is durable with respect to
+    # moves and the author doesn't need to know the hierarchy
     # NOTE: module_id is empty string here. The 'module_id' will get assigned in the replacement
     # function, we just need to specify something to get the reverse() to work
-    module.get_html = replace_jump_to_id_urls(
-        module.get_html,
+    module.get_html = replace_urls(
+        _get_html,
+        getattr(descriptor, 'data_dir', None),
         course_id,
-        reverse('jump_to_id', kwargs={'course_id': course_id, 'module_id': ''})
+        static_asset_path=static_asset_path or descriptor.lms.static_asset_path,
+        jump_to_id_base_url=reverse('jump_to_id', kwargs={'course_id': course_id, 'module_id': ''})
     )
 
+    # Modules that show the same html to every student only need to render it
+    # once for each version of their content
+    if getattr(module, 'user_state_independent', False):
+        module.get_html = cache_html(
+            module.get_html,
+            cache,
+            html_cache_key(descriptor, course_id, wrap_xmodule_display, static_asset_path)
+        )
+
     if settings.MITX_FEATURES.get('DISPLAY_HISTOGRAMS_TO_STAFF'):
         if has_access(user, module, 'staff', course_id):
             module.get_html = add_histogram(module.get_html, module, user)
@@ -448,6 +463,20 @@ def get_module_for_descriptor_internal(user, descriptor, model_data_cache, cours
     return module
 
 
+def html_cache_key(descriptor, course_id, wrap_xmodule_display, static_asset_path):
+    """
+    Return the key to cache the html of a user_state_independent module of
+    descriptor under, when rendered in course_id with the given options.
+    """
+    return u'xmodule_html:{0}:{1}:{2}:{3}:{4}'.format(
+        course_id,
+        descriptor.location.url(),
+        descriptor.content_version(),
+        bool(wrap_xmodule_display),
+        static_asset_path or descriptor.lms.static_asset_path,
+    )
+
+
 def find_target_student_module(request, user_id, course_id, mod_id):
     """
     Retrieve target StudentModule
@@ -554,10 +583,16 @@ def modx_dispatch(request, dispatch, location, course_id):
         )
         raise Http404
 
+    # The ajax call is handled by this one module: only load the data it
+    # uses up front, and the data of any other modules it touches when it
+    # is used.
     model_data_cache = ModelDataCache.cache_for_descriptor_descendents(
         course_id,
         request.user,
-        descriptor
+        descriptor,
+        depth=0,
+        scopes=DISPATCH_SCOPES,
+        defer_writes=True,
     )
 
     instance = get_module(request.user, request, location, model_data_cache, course_id, grade_bucket_type='ajax')
@@ -572,6 +607,8 @@ def modx_dispatch(request, dispatch, location, course_id):
         ajax_return = instance.handle_ajax(dispatch, data)
         # Save any fields that have changed to the underlying KeyValueStore
         instance.save()
+        # and write them, with any grade changes, to the database
+        model_data_cache.save()
 
     # If we can't find the module, respond with a 404
     except NotFoundError:
@@ -582,6 +619,8 @@ def modx_dispatch(request, dispatch, location, course_id):
     except ProcessingError as err:
         log.warning("Module encountered an error while processing AJAX call",
                     exc_info=True)
+        # Keep any grade changes that were published before the error
+        model_data_cache.save()
         return JsonResponse(object={'success': err.args[0]}, status=200)
 
     # If any other error occurred, re-raise it to trigger a 500 response
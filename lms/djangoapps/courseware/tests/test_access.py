@@ -1,10 +1,11 @@
 from mock import Mock
 
+from django.contrib.auth.models import User
 from django.test import TestCase
 
 from xmodule.modulestore import Location
 import courseware.access as access
-from .factories import CourseEnrollmentAllowedFactory
+from .factories import CourseEnrollmentAllowedFactory, UserFactory, GroupFactory
 import datetime
 from django.utils.timezone import UTC
 
@@ -58,6 +59,26 @@ class AccessTestCase(TestCase):
         self.assertFalse(access._has_access_to_location(u, location,
                                                         'instructor', None))
 
+    def test_user_groups_are_looked_up_once(self):
+        location = Location('i4x://edX/toy/course/2012_Fall')
+        user = UserFactory.create()
+
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                self.assertFalse(access._has_access_to_location(user, location, 'staff', None))
+
+        # Changes to the user's groups are seen straight away
+        GroupFactory.create(name='staff_edX/toy/2012_Fall').user_set.add(user)
+        self.assertTrue(access._has_access_to_location(user, location, 'staff', None))
+
+    def test_prefetched_user_groups_are_used(self):
+        location = Location('i4x://edX/toy/course/2012_Fall')
+        GroupFactory.create(name='staff_edX/toy/2012_Fall').user_set.add(UserFactory.create())
+        user = User.objects.prefetch_related('groups').get(groups__name='staff_edX/toy/2012_Fall')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(access._has_access_to_location(user, location, 'staff', None))
+
     def test__has_access_string(self):
         u = Mock(is_staff=True)
         self.assertFalse(access._has_access_string(u, 'not_global', 'staff', None))
@@ -0,0 +1,64 @@
+"""
+Tests for courseware.history
+"""
+from django.test import TestCase
+
+from courseware.history import HistoryBatch, record_history, write_history
+from courseware.models import StudentModule, StudentModuleHistory
+from courseware.tests.factories import StudentModuleFactory
+
+
+class WriteHistoryTest(TestCase):
+    """
+    Test that history entries are written all at once, without unchanged ones
+    """
+    def setUp(self):
+        self.student_module = StudentModuleFactory(state='{"a": 1}')
+
+    def entry(self, state, grade=None):
+        """An unsaved history entry of self.student_module"""
+        self.student_module.state = state
+        self.student_module.grade = grade
+        return StudentModuleHistory.for_student_module(self.student_module)
+
+    def history(self):
+        """The (state, grade) of the history entries, oldest first"""
+        return list(StudentModuleHistory.objects.filter(
+            student_module=self.student_module
+        ).order_by('id').values_list('state', 'grade'))
+
+    def test_unchanged_saves_are_left_out(self):
+        student_module = StudentModule.objects.get(pk=self.student_module.pk)
+        student_module.save()
+        student_module.state = '{"a": 2}'
+        student_module.save()
+        student_module.save()
+        student_module.grade = 1
+        student_module.save()
+        self.assertEqual(
+            [('{"a": 1}', None), ('{"a": 2}', None), ('{"a": 2}', 1)],
+            self.history()
+        )
+
+    def test_one_insert(self):
+        # Only the insert: no earlier entries are looked up
+        with self.assertNumQueries(1):
+            write_history([self.entry('{"a": 2}'), self.entry('{"a": 3}')])
+
+    def test_batch(self):
+        with HistoryBatch():
+            record_history(self.entry('{"a": 2}'))
+            with HistoryBatch():
+                record_history(self.entry('{"a": 3}'))
+            self.assertEqual([], self.history())
+        self.assertEqual([('{"a": 2}', None), ('{"a": 3}', None)], self.history())
+
+    def test_batch_with_exception(self):
+        with self.assertRaises(ValueError):
+            with HistoryBatch():
+                record_history(self.entry('{"a": 2}'))
+                raise ValueError()
+        self.assertEqual([('{"a": 2}', None)], self.history())
+        # The next entry isn't held back by the failed batch
+        record_history(self.entry('{"a": 3}'))
+        self.assertEqual([('{"a": 2}', None), ('{"a": 3}', None)], self.history())
@@ -6,9 +6,10 @@ from mock import Mock, patch
 from functools import partial
 
 from courseware.model_data import LmsKeyValueStore, InvalidWriteError
-from courseware.model_data import InvalidScopeError, ModelDataCache
+from courseware.model_data import InvalidScopeError, ModelDataCache, ContentCounters
 from courseware.models import StudentModule, XModuleContentField, XModuleSettingsField
 from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
+from courseware.models import StudentModuleHistory, XModuleContentCounter
 
 from student.tests.factories import UserFactory
 from courseware.tests.factories import StudentModuleFactory as cmfStudentModuleFactory
@@ -217,6 +218,140 @@ class TestMissingStudentModule(TestCase):
         self.assertFalse(self.kvs.has(user_state_key('a_field')))
 
 
+class TestLazyLoading(TestCase):
+    """
+    Test that data that wasn't loaded up front is loaded when it's used
+    """
+    def setUp(self):
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value'}))
+        self.user = student_module.student
+        ContentFactory.create()
+        self.descriptor = mock_descriptor([
+            mock_field(Scope.user_state, 'a_field'),
+            mock_field(Scope.content, 'existing_field'),
+        ])
+
+    def test_scopes(self):
+        with self.assertNumQueries(1):
+            mdc = ModelDataCache([self.descriptor], course_id, self.user, scopes=(Scope.user_state,))
+        kvs = LmsKeyValueStore({}, mdc)
+        with self.assertNumQueries(0):
+            self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+        with self.assertNumQueries(1):
+            self.assertEquals('old_value', kvs.get(content_key('existing_field')))
+        # Fields that don't exist are only looked for once
+        with self.assertNumQueries(1):
+            self.assertFalse(kvs.has(content_key('missing_field')))
+            self.assertFalse(kvs.has(content_key('missing_field')))
+
+    def test_other_descriptors(self):
+        mdc = ModelDataCache([], course_id, self.user)
+        kvs = LmsKeyValueStore({}, mdc)
+        with self.assertNumQueries(1):
+            self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+            self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+        with self.assertNumQueries(1):
+            other_key = LmsKeyValueStore.Key(Scope.user_state, 'user', location('other_id'), 'a_field')
+            self.assertRaises(KeyError, kvs.get, other_key)
+
+
+class TestDeferredWrites(TestCase):
+    """
+    Test that a ModelDataCache with defer_writes only writes changes when it's saved
+    """
+    def setUp(self):
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value'}))
+        self.user = student_module.student
+        self.mdc = ModelDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, 'a_field')])], course_id, self.user, defer_writes=True
+        )
+        self.kvs = LmsKeyValueStore({}, self.mdc)
+
+    def test_one_update_per_student_module(self):
+        with self.assertNumQueries(0):
+            self.kvs.set(user_state_key('a_field'), 'new_value')
+            self.kvs.set_many({user_state_key('b_field'): 'b_value', user_state_key('c_field'): 'c_value'})
+            self.assertEquals('new_value', self.kvs.get(user_state_key('a_field')))
+        self.assertEquals({'a_field': 'a_value'}, json.loads(StudentModule.objects.get().state))
+
+        # One update, and the history entry
+        with self.assertNumQueries(2):
+            self.mdc.save()
+        self.assertEquals(
+            {'a_field': 'new_value', 'b_field': 'b_value', 'c_field': 'c_value'},
+            json.loads(StudentModule.objects.get().state)
+        )
+
+        # Nothing is left to save
+        with self.assertNumQueries(0):
+            self.mdc.save()
+
+    def test_new_student_modules(self):
+        other_key = LmsKeyValueStore.Key(Scope.user_state, 'user', location('other_id'), 'a_field')
+        # Looking for the missing StudentModule
+        with self.assertNumQueries(1):
+            self.kvs.set(other_key, 'other_value')
+        # The insert, fetching the new primary key, and the history entry
+        with self.assertNumQueries(3):
+            self.mdc.save()
+
+        student_module = StudentModule.objects.get(module_state_key=location('other_id').url())
+        self.assertEquals({'a_field': 'other_value'}, json.loads(student_module.state))
+        self.assertEquals(1, StudentModuleHistory.objects.filter(student_module=student_module).count())
+
+
+class TestContentCounters(TestCase):
+    """
+    Test the shared counts of Scope.content fields
+    """
+    def setUp(self):
+        self.counters = ContentCounters()
+        self.definition_id = location('def_id').url()
+
+    def increment(self, deltas):
+        """Increment the counts of the 'votes' field"""
+        return self.counters.increment(self.definition_id, 'votes', deltas)
+
+    def test_increment(self):
+        with patch('courseware.model_data.random.randint', side_effect=[1, 2, 2]):
+            self.assertEquals({'yes': 1}, self.increment({'yes': 1}))
+            self.assertEquals({'yes': 2, 'no': 1}, self.increment({'yes': 1, 'no': 1}))
+            self.assertEquals({'no': 0}, self.increment({'no': -1}))
+        self.assertEquals(3, XModuleContentCounter.objects.count())
+        self.assertEquals({'yes': 2, 'no': 0}, self.counters.counts(self.definition_id, 'votes'))
+        # Keys that aren't counted are left out of the top
+        self.assertEquals(({'yes': 2}, 2), self.counters.top(self.definition_id, 'votes', 10))
+
+    def test_long_keys(self):
+        long_key = 'a' * 300
+        other_long_key = long_key + 'b'
+        self.assertEquals({long_key: 1}, self.increment({long_key: 1}))
+        self.assertEquals(
+            {long_key: 3, other_long_key: 3},
+            self.increment({long_key: 1, other_long_key: 1})
+        )
+        self.assertEquals(
+            {'a' * ContentCounters.KEY_MAX_LENGTH: 3},
+            self.counters.counts(self.definition_id, 'votes')
+        )
+
+    def test_seed_once(self):
+        self.increment({'yes': 1})
+        for _ in range(2):
+            self.counters.seed(self.definition_id, 'votes', {'yes': 2, 'no': 0})
+        self.assertEquals({'yes': 3}, self.counters.counts(self.definition_id, 'votes'))
+
+    def test_rollup(self):
+        for shard in range(2, 6):
+            with patch('courseware.model_data.random.randint', return_value=shard):
+                self.increment({'yes': 1})
+        self.assertEquals(1, self.counters.rollup())
+        self.assertEquals(
+            [(ContentCounters.ROLLUP_SHARD, 4)],
+            list(XModuleContentCounter.objects.values_list('shard', 'count'))
+        )
+
+
 class StorageTestBase(object):
     """
     A base class for that gets subclassed when testing each of the scopes.
@@ -11,7 +11,7 @@ from django.test import TestCase
 from django.test.client import RequestFactory
 from django.test.utils import override_settings
 
-from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.django import modulestore, editable_modulestore
 from xmodule.modulestore.tests.factories import ItemFactory, CourseFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 import courseware.module_render as render
@@ -399,6 +399,37 @@ class TestHtmlModifiers(ModuleStoreTestCase):
             result_fragment.content
         )
 
+    def test_user_state_independent_html_is_cached(self):
+        module = render.get_module(
+            self.user,
+            self.request,
+            self.location,
+            self.model_data_cache,
+            self.course.id,
+        )
+        html = module.get_html()
+
+        with patch('xmodule.html_module.HtmlModule.get_html', Mock(return_value='changed')):
+            module = render.get_module(
+                self.user,
+                self.request,
+                self.location,
+                self.model_data_cache,
+                self.course.id,
+            )
+            self.assertEqual(html, module.get_html())
+
+            # a new version of the content is rendered again
+            editable_modulestore('direct').update_item(self.location, '<p>New content</p>')
+            module = render.get_module(
+                self.user,
+                self.request,
+                self.location,
+                self.model_data_cache,
+                self.course.id,
+            )
+            self.assertIn('changed', module.get_html())
+
     @patch('courseware.module_render.has_access', Mock(return_value=True))
     def test_histogram(self):
         module = render.get_module(
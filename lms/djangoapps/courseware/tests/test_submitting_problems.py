@@ -4,14 +4,17 @@
 import json
 from textwrap import dedent
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
 from django.test.client import RequestFactory
 from django.core.urlresolvers import reverse
 from django.test.utils import override_settings
+from mock import Mock
 
 # Need access to internal func to put users in the right group
 from courseware import grades
+from courseware.access import course_beta_test_group_name
 from courseware.model_data import ModelDataCache
+from courseware.models import StudentSectionScore
 
 from xmodule.modulestore.django import modulestore, editable_modulestore
 
@@ -550,6 +553,96 @@ class TestCourseGrader(TestSubmittingProblems):
         self.assertEqual(self.earned_hw_scores(), [1.0, 2.0, 2.0])  # Order matters
         self.assertEqual(self.score_for_hw('homework3'), [1.0, 1.0])
 
+    def test_section_scores_cache(self):
+        """
+        Test that section scores are saved, and only recomputed for sections that change.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+        self.check_grade_percent(0.75)
+
+        rows = StudentSectionScore.objects.filter(student=self.student_user, course_id=self.course.id)
+        self.assertEqual(
+            sorted(row.section_key for row in rows),
+            sorted(section.location.url() for section in (self.homework1, self.homework2, self.homework3))
+        )
+        homework2_row = rows.get(section_key=self.homework2.location.url())
+
+        # answering a problem in homework1 only changes its section scores
+        self.submit_question_answer(self.hw1_names[1], {'2_1': 'Correct'})
+        self.check_grade_percent(1.0)
+        self.assertEqual(self.earned_hw_scores(), [2.0, 2.0, 0])
+        self.assertEqual(
+            StudentSectionScore.objects.get(pk=homework2_row.pk).modified,
+            homework2_row.modified
+        )
+
+    def test_section_scores_cache_groups(self):
+        """
+        Test that section scores are recomputed when the student's groups change,
+        since they decide which problems the student can access.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+        self.check_grade_percent(0.75)
+        homework2_key = self.homework2.location.url()
+        signature = StudentSectionScore.objects.get(
+            student=self.student_user, course_id=self.course.id, section_key=homework2_key
+        ).signature
+
+        group, _ = Group.objects.get_or_create(name=course_beta_test_group_name(self.course.location))
+        self.student_user.groups.add(group)
+        self.check_grade_percent(0.75)
+        self.assertNotEqual(
+            StudentSectionScore.objects.get(
+                student=self.student_user, course_id=self.course.id, section_key=homework2_key
+            ).signature,
+            signature
+        )
+
+    def test_missing_max_score_not_cached(self):
+        """
+        Test that the max score of a problem that fails to load isn't cached,
+        so that it's computed again when the problem loads.
+        """
+        self.homework = self.add_graded_section_to_course('homework')
+        problem = self.add_dropdown_to_section(self.homework.location, 'p1', 1)
+        model_data_cache = ModelDataCache([problem], self.course.id, self.student_user)
+        max_scores = {}
+
+        # An error module has no max score
+        error_module = Mock()
+        error_module.max_score.return_value = None
+        score = grades.get_score(
+            self.course.id, self.student_user, problem, lambda descriptor: error_module, model_data_cache, max_scores
+        )
+        self.assertEqual(score, (None, None))
+        self.assertEqual(max_scores, {})
+
+    def test_iterate_grades_for(self):
+        """
+        Test that grading students in bulk gives the same results as grading them one at a time.
+        """
+        self.dropping_setup()
+        self.dropping_homework_stage1()
+
+        # a second student, who hasn't attempted anything
+        self.create_account('u2', 'view2@test.com', self.password)
+        other_user = User.objects.get(email='view2@test.com')
+
+        fake_request = self.factory.get(reverse('progress',
+                                        kwargs={'course_id': self.course.id}))
+        students = [self.student_user, other_user]
+        gradesets = list(grades.iterate_grades_for(self.course, students, fake_request,
+                                                   keep_raw_scores=True, chunk_size=1))
+
+        self.assertEqual([student for student, _ in gradesets], students)
+        for student, gradeset in gradesets:
+            expected = grades.grade(student, fake_request, self.course, keep_raw_scores=True)
+            self.assertEqual(gradeset, expected)
+        self.assertEqual(gradesets[0][1]['percent'], 0.75)
+        self.assertEqual(gradesets[1][1]['percent'], 0)
+
 
 class TestPythonGradedResponse(TestSubmittingProblems):
     """
@@ -25,13 +25,14 @@ from courseware.masquerade import setup_masquerade
 from courseware.model_data import ModelDataCache
 from .module_render import toc_for_course, get_module_for_descriptor, get_module
 from courseware.models import StudentModule, StudentModuleHistory
+from courseware.history import write_history
 from course_modes.models import CourseMode
 
 from django_comment_client.utils import get_discussion_title
 
 from student.models import UserTestGroup, CourseEnrollment
 from util.cache import cache, cache_if_anonymous
-from xmodule.modulestore import Location
+from xmodule.modulestore import Location, SETTINGS_FIELDS
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import InvalidLocationError, ItemNotFoundError, NoPathToItem
 from xmodule.modulestore.search import path_to_location
@@ -297,7 +298,9 @@ def index(request, course_id, chapter=None, section=None,
     """
     user = User.objects.prefetch_related("groups").get(id=request.user.id)
     request.user = user	# keep just one instance of User
-    course = get_course_with_access(user, course_id, 'load', depth=2)
+    # The table of contents only needs the settings of the chapters and
+    # sections; the active section is loaded in full below.
+    course = get_course_with_access(user, course_id, 'load', depth=2, fields=SETTINGS_FIELDS)
     staff_access = has_access(user, course, 'staff')
     registered = registered_for_course(course, user)
     if not registered:
@@ -745,9 +748,10 @@ def submission_history(request, course_id, student_username, location):
         student_module=student_module
     ).order_by('-id')
 
-    # If no history records exist, let's force a save to get history started.
+    # If no history records exist, let's record the current state to get
+    # history started.
     if not history_entries:
-        student_module.save()
+        write_history([StudentModuleHistory.for_student_module(student_module)])
         history_entries = StudentModuleHistory.objects.filter(
             student_module=student_module
         ).order_by('-id')
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+import comment_client as cc
+from comment_client import utils
+
+
+@patch('comment_client.utils.requests.Session.request')
+class PerformRequestTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_session_is_reused(self, mock_request):
+        self.assertIs(utils.get_session(), utils.get_session())
+
+    def test_uncached_get(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1"}'
+        for _ in range(2):
+            self.assertEqual(utils.perform_request('get', 'http://cs/users/1', {}), {'id': '1'})
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_cached_get(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1"}'
+        for _ in range(2):
+            response = utils.perform_request('get', 'http://cs/users/1', {'complete': True}, cache_timeout=30)
+            self.assertEqual(response, {'id': '1'})
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Other params aren't served from the cache
+        utils.perform_request('get', 'http://cs/users/1', {'complete': False}, cache_timeout=30)
+        self.assertEqual(mock_request.call_count, 2)
+
+        utils.clear_cached_request('http://cs/users/1', {'complete': True})
+        utils.perform_request('get', 'http://cs/users/1', {'complete': True}, cache_timeout=30)
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_errors_are_not_cached(self, mock_request):
+        mock_request.return_value.status_code = 500
+        mock_request.return_value.text = u'oops'
+        for _ in range(2):
+            with self.assertRaises(cc.CommentClientError):
+                utils.perform_request('get', 'http://cs/users/1', {}, cache_timeout=30)
+        self.assertEqual(mock_request.call_count, 2)
+
+
+@patch('comment_client.utils.requests.Session.request')
+@patch.object(cc.User, 'cache_timeout', 30)
+class UserCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_retrieve_is_cached(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1", "upvoted_ids": []}'
+        for _ in range(2):
+            cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        self.assertEqual(mock_request.call_count, 1)
+
+    def test_follow_clears_cache(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1", "upvoted_ids": []}'
+        user = cc.User(id='1', course_id='MITx/999/Robot_Super_Course')
+        user.retrieve()
+        user.follow(cc.Commentable(id='a_commentable'))
+        cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        # The first get, the follow, and the second get
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_create_thread_clears_author_cache(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1", "user_id": "1", "course_id": "MITx/999/Robot_Super_Course"}'
+        cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        cc.Thread(user_id='1', course_id='MITx/999/Robot_Super_Course', title='Title', body='Body').save()
+        cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        # The first get, the post, and the second get
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_create_comment_clears_author_cache(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.text = u'{"id": "1", "user_id": "1", "course_id": "MITx/999/Robot_Super_Course"}'
+        cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        cc.Comment(user_id='1', course_id='MITx/999/Robot_Super_Course', thread_id='1', body='Body').save()
+        cc.User(id='1', course_id='MITx/999/Robot_Super_Course').retrieve()
+        self.assertEqual(mock_request.call_count, 3)
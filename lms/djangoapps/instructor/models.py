@@ -0,0 +1,19 @@
+"""
+The instructor dashboard has no models of its own. This module connects the
+signal receivers that keep the dashboard's cached data up to date, because
+Django imports the models module of each installed app at startup.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from analytics.distributions import forget_feature_counts
+from student.models import CourseEnrollment
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    """
+    Forget the profile distributions of the course of a changed enrollment
+    """
+    forget_feature_counts(instance.course_id)
@@ -50,12 +50,12 @@ def offline_grade_calculation(course_id):
     print "%d enrolled students" % len(enrolled_students)
     course = get_course_by_id(course_id)
 
-    for student in enrolled_students:
-        request = DummyRequest()
-        request.user = student
-        request.session = {}
+    # Only used if modules have to be instantiated while grading
+    request = DummyRequest()
+    request.user = None
+    request.session = {}
 
-        gradeset = grades.grade(student, request, course, keep_raw_scores=True)
+    for student, gradeset in grades.iterate_grades_for(course, enrolled_students, request, keep_raw_scores=True):
         gs = enc.encode(gradeset)
         ocg, created = models.OfflineComputedGrade.objects.get_or_create(user=student, course_id=course_id)
         ocg.gradeset = gs
@@ -1010,22 +1010,22 @@ def get_student_grade_summary_data(request, course, course_id, get_grades=True,
         courseenrollment__is_active=1,
     ).prefetch_related("groups").order_by('username')
 
+    if get_grades and not use_offline:
+        # Grade all of the students in bulk, rather than one at a time
+        student_gradesets = grades.iterate_grades_for(course, enrolled_students, request, keep_raw_scores=get_raw_scores)
+    elif get_grades:
+        student_gradesets = (
+            (student, student_grades(student, request, course, keep_raw_scores=get_raw_scores, use_offline=use_offline))
+            for student in enrolled_students
+        )
+    else:
+        student_gradesets = ((student, None) for student in enrolled_students)
+
     header = ['ID', 'Username', 'Full Name', 'edX email', 'External email']
     assignments = []
-    if get_grades and enrolled_students.count() > 0:
-        # just to construct the header
-        gradeset = student_grades(enrolled_students[0], request, course, keep_raw_scores=get_raw_scores, use_offline=use_offline)
-        # log.debug('student {0} gradeset {1}'.format(enrolled_students[0], gradeset))
-        if get_raw_scores:
-            assignments += [score.section for score in gradeset['raw_scores']]
-        else:
-            assignments += [x['label'] for x in gradeset['section_breakdown']]
-    header += assignments
-
-    datatable = {'header': header, 'assignments': assignments, 'students': enrolled_students}
     data = []
 
-    for student in enrolled_students:
+    for student, gradeset in student_gradesets:
         datarow = [student.id, student.username, student.profile.name, student.email]
         try:
             datarow.append(student.externalauthmap.external_email)
@@ -1033,8 +1033,13 @@ def get_student_grade_summary_data(request, course, course_id, get_grades=True,
             datarow.append('')
 
         if get_grades:
-            gradeset = student_grades(student, request, course, keep_raw_scores=get_raw_scores, use_offline=use_offline)
             log.debug('student={0}, gradeset={1}'.format(student, gradeset))
+            if not data:
+                # the first student's gradeset is used to construct the header
+                if get_raw_scores:
+                    assignments += [score.section for score in gradeset['raw_scores']]
+                else:
+                    assignments += [x['label'] for x in gradeset['section_breakdown']]
             if get_raw_scores:
                 # TODO (ichuang) encode Score as dict instead of as list, so score[0] -> score['earned']
                 sgrades = [(getattr(score, 'earned', '') or score[0]) for score in gradeset['raw_scores']]
@@ -1044,7 +1049,9 @@ def get_student_grade_summary_data(request, course, course_id, get_grades=True,
             student.grades = sgrades  	# store in student object
 
         data.append(datarow)
-    datatable['data'] = data
+
+    header += assignments
+    datatable = {'header': header, 'assignments': assignments, 'students': enrolled_students, 'data': data}
     return datatable
 
 #-----------------------------------------------------------------------------
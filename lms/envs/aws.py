@@ -164,6 +164,13 @@ VIRTUAL_UNIVERSITIES = ENV_TOKENS.get('VIRTUAL_UNIVERSITIES', [])
 META_UNIVERSITIES = ENV_TOKENS.get('META_UNIVERSITIES', {})
 COMMENTS_SERVICE_URL = ENV_TOKENS.get("COMMENTS_SERVICE_URL", '')
 COMMENTS_SERVICE_KEY = ENV_TOKENS.get("COMMENTS_SERVICE_KEY", '')
+if "COMMENTS_SERVICE_POOL_SIZE" in ENV_TOKENS:
+    COMMENTS_SERVICE_POOL_SIZE = ENV_TOKENS["COMMENTS_SERVICE_POOL_SIZE"]
+if "COMMENTS_SERVICE_CACHE_TIMEOUT" in ENV_TOKENS:
+    COMMENTS_SERVICE_CACHE_TIMEOUT = ENV_TOKENS["COMMENTS_SERVICE_CACHE_TIMEOUT"]
+if "ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT" in ENV_TOKENS:
+    ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT = ENV_TOKENS["ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT"]
+DATABASE_FOR_ANALYTICS = ENV_TOKENS.get("DATABASE_FOR_ANALYTICS", DATABASE_FOR_ANALYTICS)
 CERT_QUEUE = ENV_TOKENS.get("CERT_QUEUE", 'test-pull')
 ZENDESK_URL = ENV_TOKENS.get("ZENDESK_URL")
 FEEDBACK_SUBMISSION_EMAIL = ENV_TOKENS.get("FEEDBACK_SUBMISSION_EMAIL")
@@ -207,6 +214,8 @@ XQUEUE_INTERFACE = AUTH_TOKENS['XQUEUE_INTERFACE']
 # use the one from common.py
 MODULESTORE = AUTH_TOKENS.get('MODULESTORE', MODULESTORE)
 CONTENTSTORE = AUTH_TOKENS.get('CONTENTSTORE', CONTENTSTORE)
+STATIC_CONTENT_DISK_CACHE = ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE', STATIC_CONTENT_DISK_CACHE)
+TRACKING_LOG_WRITER = ENV_TOKENS.get('TRACKING_LOG_WRITER', TRACKING_LOG_WRITER)
 
 OPEN_ENDED_GRADING_INTERFACE = AUTH_TOKENS.get('OPEN_ENDED_GRADING_INTERFACE',
                                                OPEN_ENDED_GRADING_INTERFACE)
@@ -267,6 +267,28 @@ DEV_CONTENT = True
 TRACK_MAX_EVENT = 10000
 DEBUG_TRACK_LOG = False
 
+# Tracking events are written by a background thread, in batches of at most
+# BATCH_SIZE, within FLUSH_INTERVAL seconds. Once QUEUE_SIZE events are waiting
+# to be written, more are dropped. If None, events are written during requests.
+TRACKING_LOG_WRITER = {
+    'QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1,
+}
+
+# How many seconds the top counts that all students of a module add to, such as
+# the words of a word cloud, are cached for
+CONTENT_COUNTERS_CACHE_TIMEOUT = 5
+
+# How many seconds the profile distributions of a course, shown on the
+# instructor dashboard, are cached for. They're counted again sooner if an
+# enrollment in the course changes.
+ANALYTICS_DISTRIBUTIONS_CACHE_TIMEOUT = 300
+
+# The database that the profile distributions are counted from, e.g. a read
+# replica of the default one
+DATABASE_FOR_ANALYTICS = 'default'
+
 MITX_ROOT_URL = ''
 
 LOGIN_REDIRECT_URL = MITX_ROOT_URL + '/accounts/login'
@@ -313,6 +335,10 @@ MODULESTORE = {
 }
 CONTENTSTORE = None
 
+# Keep large static assets that are served out of the contentstore on local
+# disk as well, e.g. {'DIRECTORY': '/tmp/asset_cache', 'MAX_SIZE': 1024 ** 3}
+STATIC_CONTENT_DISK_CACHE = None
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -326,6 +352,15 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # Run jailed code in a pool of warm sandbox processes rather than a new
+    # one each time (see capa.safe_exec.pool).  A size of 0 means no pool.
+    'pool': {
+        # How many sandbox processes per server process?
+        'size': 0,
+        # How many executions before a sandbox process is replaced?
+        'max_uses': 100,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
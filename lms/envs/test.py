@@ -34,6 +34,15 @@ MITX_FEATURES['ENABLE_INSTRUCTOR_BETA_DASHBOARD'] = True
 
 MITX_FEATURES['ENABLE_SHOPPING_CART'] = True
 
+# Write tracking events during requests, so tests can check them
+TRACKING_LOG_WRITER = None
+
+# Don't cache comments service responses, which tests mock differently
+COMMENTS_SERVICE_CACHE_TIMEOUT = 0
+
+# Show the counts of polls and word clouds as soon as they change
+CONTENT_COUNTERS_CACHE_TIMEOUT = 0
+
 # Need wiki for courseware views to work. TODO (vshnayder): shouldn't need it.
 WIKI_ENABLED = True
 
@@ -1,6 +1,7 @@
 from .utils import CommentClientError, perform_request
 
 from .thread import Thread, _url_for_flag_abuse_thread, _url_for_unflag_abuse_thread
+from .user import User
 import models
 import settings
 
@@ -24,6 +25,11 @@ class Comment(models.Model):
     base_url = "{prefix}/comments".format(prefix=settings.PREFIX)
     type = 'comment'
 
+    @classmethod
+    def after_save(cls, instance):
+        # The author's cached threads_count and comments_count have changed
+        User(id=instance.attributes.get('user_id'), course_id=instance.attributes.get('course_id')).clear_cached_info()
+
     @property
     def thread(self):
         return Thread(id=self.thread_id, type='thread')
@@ -6,3 +6,4 @@ class Commentable(models.Model):
 
     base_url = "{prefix}/commentables".format(prefix=settings.PREFIX)
     type = 'commentable'
+    cache_timeout = settings.CACHE_TIMEOUT
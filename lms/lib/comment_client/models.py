@@ -8,6 +8,8 @@ class Model(object):
     initializable_fields = ['id']
     base_url = None
     default_retrieve_params = {}
+    # How long retrieved instances are cached for, if they're cached at all
+    cache_timeout = None
 
     DEFAULT_ACTIONS_WITH_ID = ['get', 'put', 'delete']
     DEFAULT_ACTIONS_WITHOUT_ID = ['get_all', 'post']
@@ -62,7 +64,7 @@ class Model(object):
 
     def _retrieve(self, *args, **kwargs):
         url = self.url(action='get', params=self.attributes)
-        response = perform_request('get', url, self.default_retrieve_params)
+        response = perform_request('get', url, dict(self.default_retrieve_params), cache_timeout=self.cache_timeout)
         self.update_attributes(**response)
 
     @classmethod
@@ -11,3 +11,16 @@ if hasattr(settings, "COMMENTS_SERVICE_KEY"):
     API_KEY = settings.COMMENTS_SERVICE_KEY
 else:
     API_KEY = "PUT_YOUR_API_KEY_HERE"
+
+# How many connections to the comments service each process keeps open
+if hasattr(settings, "COMMENTS_SERVICE_POOL_SIZE"):
+    POOL_SIZE = settings.COMMENTS_SERVICE_POOL_SIZE
+else:
+    POOL_SIZE = 10
+
+# How many seconds users and commentables fetched from the comments service
+# are cached for. If 0, they aren't cached.
+if hasattr(settings, "COMMENTS_SERVICE_CACHE_TIMEOUT"):
+    CACHE_TIMEOUT = settings.COMMENTS_SERVICE_CACHE_TIMEOUT
+else:
+    CACHE_TIMEOUT = 30
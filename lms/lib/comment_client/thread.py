@@ -1,5 +1,6 @@
 from .utils import merge_dict, strip_blank, strip_none, extract, perform_request
 from .utils import CommentClientError
+from .user import User
 import models
 import settings
 
@@ -25,6 +26,11 @@ class Thread(models.Model):
     default_retrieve_params = {'recursive': False}
     type = 'thread'
 
+    @classmethod
+    def after_save(cls, instance):
+        # The author's cached threads_count and comments_count have changed
+        User(id=instance.attributes.get('user_id'), course_id=instance.attributes.get('course_id')).clear_cached_info()
+
     @classmethod
     def search(cls, query_params, *args, **kwargs):
 
@@ -1,4 +1,4 @@
-from .utils import merge_dict, perform_request, CommentClientError
+from .utils import merge_dict, perform_request, clear_cached_request, CommentClientError
 
 import models
 import settings
@@ -19,6 +19,7 @@ class User(models.Model):
     base_url = "{prefix}/users".format(prefix=settings.PREFIX)
     default_retrieve_params = {'complete': True}
     type = 'user'
+    cache_timeout = settings.CACHE_TIMEOUT
 
     @classmethod
     def from_django_user(cls, user):
@@ -27,13 +28,19 @@ class User(models.Model):
                    username=user.username,
                    email=user.email)
 
+    @classmethod
+    def after_save(cls, instance):
+        instance.clear_cached_info()
+
     def follow(self, source):
         params = {'source_type': source.type, 'source_id': source.id}
         response = perform_request('post', _url_for_subscription(self.id), params)
+        self.clear_cached_info()
 
     def unfollow(self, source):
         params = {'source_type': source.type, 'source_id': source.id}
         response = perform_request('delete', _url_for_subscription(self.id), params)
+        self.clear_cached_info()
 
     def vote(self, voteable, value):
         if voteable.type == 'thread':
@@ -45,6 +52,7 @@ class User(models.Model):
         params = {'user_id': self.id, 'value': value}
         request = perform_request('put', url, params)
         voteable.update_attributes(request)
+        self.clear_cached_info()
 
     def unvote(self, voteable):
         if voteable.type == 'thread':
@@ -56,6 +64,7 @@ class User(models.Model):
         params = {'user_id': self.id}
         request = perform_request('delete', url, params)
         voteable.update_attributes(request)
+        self.clear_cached_info()
 
     def active_threads(self, query_params={}):
         if not self.course_id:
@@ -77,12 +86,28 @@ class User(models.Model):
 
     def _retrieve(self, *args, **kwargs):
         url = self.url(action='get', params=self.attributes)
-        retrieve_params = self.default_retrieve_params
-        if self.attributes.get('course_id'):
-            retrieve_params['course_id'] = self.course_id
-        response = perform_request('get', url, retrieve_params)
+        retrieve_params = self._retrieve_params(self.attributes.get('course_id'))
+        response = perform_request('get', url, retrieve_params, cache_timeout=self.cache_timeout)
         self.update_attributes(**response)
 
+    def _retrieve_params(self, course_id):
+        retrieve_params = dict(self.default_retrieve_params)
+        if course_id:
+            retrieve_params['course_id'] = course_id
+        return retrieve_params
+
+    def clear_cached_info(self):
+        """
+        Forget the cached info of this user, after changing it. Info that was
+        retrieved for another course than this user's isn't cleared, and expires
+        after cache_timeout.
+        """
+        if self.id is None:
+            return
+        url = self.url(action='get', params=self.attributes)
+        for course_id in set([None, self.attributes.get('course_id')]):
+            clear_cached_request(url, self._retrieve_params(course_id))
+
 
 def _url_for_vote_comment(comment_id):
     return "{prefix}/comments/{comment_id}/votes".format(prefix=settings.PREFIX, comment_id=comment_id)
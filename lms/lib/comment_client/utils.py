@@ -1,11 +1,17 @@
 from dogapi import dog_stats_api
+from django.core.cache import cache
+import hashlib
 import json
 import logging
+import os
 import requests
 import settings
 
 log = logging.getLogger(__name__)
 
+# The requests session of each process, by pid
+_SESSIONS = {}
+
 
 def strip_none(dic):
     return dict([(k, v) for k, v in dic.iteritems() if v is not None])
@@ -28,16 +34,64 @@ def merge_dict(dic1, dic2):
     return dict(dic1.items() + dic2.items())
 
 
+def get_session():
+    """
+    Return the requests session of this process, which keeps a pool of up to
+    settings.POOL_SIZE connections to the comments service open
+    """
+    session = _SESSIONS.get(os.getpid())
+    if session is None:
+        # A forked process can't share its parent's connections
+        _SESSIONS.clear()
+        session = requests.session(config={
+            'keep_alive': True,
+            'pool_connections': 1,
+            'pool_maxsize': settings.POOL_SIZE,
+        })
+        _SESSIONS[os.getpid()] = session
+    return session
+
+
+def request_cache_key(url, params):
+    """
+    Return the key that the response to a get of url with params is cached with
+    """
+    params = json.dumps(sorted((params or {}).items()))
+    return 'comment_client.{0}'.format(hashlib.md5(url + params).hexdigest())
+
+
+def clear_cached_request(url, params=None):
+    """
+    Forget the cached response to a get of url with params, if there is one
+    """
+    cache.delete(request_cache_key(url, params))
+
+
 def perform_request(method, url, data_or_params=None, *args, **kwargs):
+    """
+    Call the comments service, and return the response, parsed as json unless
+    raw is true.
+
+    If cache_timeout is given, the response to a get is cached for that many
+    seconds.
+    """
     if data_or_params is None:
         data_or_params = {}
+
+    cache_key = None
+    if method == 'get' and kwargs.get('cache_timeout'):
+        cache_key = request_cache_key(url, data_or_params)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     data_or_params['api_key'] = settings.API_KEY
     try:
         with dog_stats_api.timer('comment_client.request.time'):
             if method in ['post', 'put', 'patch']:
-                response = requests.request(method, url, data=data_or_params, timeout=5)
+                response = get_session().request(method, url, data=data_or_params, timeout=5)
             else:
-                response = requests.request(method, url, params=data_or_params, timeout=5)
+                response = get_session().request(method, url, params=data_or_params, timeout=5)
     except Exception as err:
         # remove API key if it is in the params
         if 'api_key' in data_or_params:
@@ -57,9 +111,12 @@ def perform_request(method, url, data_or_params=None, *args, **kwargs):
         raise CommentClientUnknownError(response.text)
     else:
         if kwargs.get("raw", False):
-            return response.text
+            result = response.text
         else:
-            return json.loads(response.text)
+            result = json.loads(response.text)
+        if cache_key is not None:
+            cache.set(cache_key, result, kwargs['cache_timeout'])
+        return result
 
 
 class CommentClientError(Exception):
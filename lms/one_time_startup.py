@@ -2,6 +2,7 @@ from dogapi import dog_http_api, dog_stats_api
 from django.conf import settings
 from xmodule.modulestore.django import modulestore
 from request_cache.middleware import RequestCache
+from capa.safe_exec import configure_pool, sandbox_command
 
 from django.core.cache import get_cache
 
@@ -13,6 +14,15 @@ for store_name in settings.MODULESTORE:
         'request_cache': RequestCache.get_request_cache()
     })
 
+pool_settings = settings.CODE_JAIL.get('pool', {})
+if settings.CODE_JAIL.get('python_bin') and pool_settings.get('size'):
+    configure_pool(
+        sandbox_command(settings.CODE_JAIL['python_bin'], settings.CODE_JAIL.get('user')),
+        size=pool_settings['size'],
+        max_uses=pool_settings.get('max_uses', 100),
+        limits=settings.CODE_JAIL.get('limits'),
+    )
+
 if hasattr(settings, 'DATADOG_API'):
     dog_http_api.api_key = settings.DATADOG_API
     dog_stats_api.start(api_key=settings.DATADOG_API, statsd=True)